@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pyglet
+from pyglet.image import AbstractImage, Texture, TextureRegion
+from pyglet.image.atlas import AllocatorException, TextureAtlas
+
+
+@dataclass
+class Asset:
+    path: str
+    image: TextureRegion | Texture
+    atlas: TextureAtlas | None
+    references: int = 0
+
+
+class AssetCache:
+    def __init__(self, atlas_size: int = 1024, max_unused: int | None = None):
+        self.atlas_size = atlas_size
+        # Unreferenced assets kept around for the next spawn, None keeps all
+        self.max_unused = max_unused
+        self.assets: dict[str, Asset] = {}
+        self.unused: OrderedDict[str, Asset] = OrderedDict()
+        self.atlases: list[TextureAtlas] = []
+        self.loads = 0
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.assets
+
+    def load(self, path: str) -> Asset:
+        image = pyglet.image.load(path)
+        self.loads += 1
+        region, atlas = self.pack(image)
+        region.anchor_x = image.width // 2
+        region.anchor_y = image.height // 2
+
+        return Asset(path, region, atlas)
+
+    def pack(
+        self, image: AbstractImage
+    ) -> tuple[TextureRegion | Texture, TextureAtlas | None]:
+        if image.width > self.atlas_size or image.height > self.atlas_size:
+            return image.get_texture(), None
+
+        for atlas in self.atlases:
+            try:
+                return atlas.add(image), atlas
+            except AllocatorException:
+                continue
+
+        atlas = TextureAtlas(self.atlas_size, self.atlas_size)
+        self.atlases.append(atlas)
+        return atlas.add(image), atlas
+
+    def acquire(self, path: str) -> TextureRegion | Texture:
+        if not (asset := self.assets.get(path)):
+            asset = self.assets[path] = self.load(path)
+        self.unused.pop(path, None)
+        asset.references += 1
+
+        return asset.image
+
+    def release(self, path: str):
+        asset = self.assets[path]
+        asset.references -= 1
+        if asset.references > 0:
+            return
+
+        self.unused[path] = asset
+        if self.max_unused is not None:
+            while len(self.unused) > self.max_unused:
+                _, evicted = self.unused.popitem(last=False)
+                self.evict(evicted)
+
+    def evict(self, asset: Asset):
+        del self.assets[asset.path]
+        # Atlases can't free single regions, so one is dropped only once
+        # nothing packed into it is cached any more
+        if asset.atlas and not any(
+            other.atlas is asset.atlas for other in self.assets.values()
+        ):
+            self.atlases.remove(asset.atlas)
+
+    def clear(self):
+        self.assets.clear()
+        self.unused.clear()
+        self.atlases.clear()
+
+
+cache = AssetCache()
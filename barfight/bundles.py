@@ -1,7 +1,7 @@
 import pyglet
 from pyglet.math import Vec2
 
-from . import ecs
+from . import assets, ecs
 from .components import (
     Actor,
     Attack,
@@ -26,19 +26,23 @@ from .constants import (
 from .physics import Body, BodyKind, Rectangle
 
 
-def add_player(position: Vec2) -> int:
-    image = pyglet.image.load("assets/player.png")
-    image.anchor_x = image.width // 2
-    image.anchor_y = image.height // 2
+def load_sprite(path: str) -> Sprite:
+    image = assets.cache.acquire(path)
 
-    entity = ecs.create_entity(
+    return Sprite(pyglet.sprite.Sprite(image), Layer.Game, path)
+
+
+def add_player(position: Vec2, sprites: bool = True) -> int:
+    components = [
         Actor(max_speed=120),
         Position(position),
         Velocity(),
-        Sprite(pyglet.sprite.Sprite(image), Layer.Game),
         Health(100, 100),
         Player(),
-    )
+    ]
+    if sprites:
+        components.append(load_sprite("assets/player.png"))
+    entity = ecs.create_entity(*components)
     ecs.add_component(
         entity,
         PhysicsBody(
@@ -54,19 +58,17 @@ def add_player(position: Vec2) -> int:
     return entity
 
 
-def add_enemy(x: float, y: float) -> int:
-    image = pyglet.image.load("assets/player.png")
-    image.anchor_x = image.width // 2
-    image.anchor_y = image.height // 2
-
-    entity = ecs.create_entity(
+def add_enemy(x: float, y: float, sprites: bool = True) -> int:
+    components = [
         Enemy(),
         Position(Vec2(x, y)),
         Velocity(),
-        Sprite(pyglet.sprite.Sprite(image), Layer.Game),
         Health(100, 100),
         Actor(max_speed=200),
-    )
+    ]
+    if sprites:
+        components.append(load_sprite("assets/player.png"))
+    entity = ecs.create_entity(*components)
     ecs.add_component(
         entity,
         PhysicsBody(
@@ -82,16 +84,13 @@ def add_enemy(x: float, y: float) -> int:
     return entity
 
 
-def add_wall(x: float, y: float, width: float, height: float) -> int:
-    image = pyglet.image.load("assets/wall.png")
-    image.anchor_x = image.width // 2
-    image.anchor_y = image.width // 2
-
-    entity = ecs.create_entity(
-        Wall(),
-        Position(Vec2(x, y)),
-        Sprite(pyglet.sprite.Sprite(image), Layer.Game),
-    )
+def add_wall(
+    x: float, y: float, width: float, height: float, sprites: bool = True
+) -> int:
+    components = [Wall(), Position(Vec2(x, y))]
+    if sprites:
+        components.append(load_sprite("assets/wall.png"))
+    entity = ecs.create_entity(*components)
     ecs.add_component(
         entity,
         PhysicsBody(
@@ -108,23 +107,47 @@ def add_wall(x: float, y: float, width: float, height: float) -> int:
     return entity
 
 
-def add_attack(entity: int, min: Vec2, max: Vec2) -> int:
+def add_attack(entity: int, min: Vec2, max: Vec2) -> int | None:
+    if (attack_entity := ecs.pool(Attack).acquire()) is not None:
+        attack, position, physics_body = ecs.try_components(
+            attack_entity, Attack, Position, PhysicsBody
+        )
+        attack.entity = entity
+        attack.cleanup = False
+        attack.active = True
+        physics_body.body.rectangle.min = min
+        physics_body.body.rectangle.max = max
+        physics_body.body.active = True
+        position.position = physics_body.body.rectangle.center
+        # Moves the body in the physics world before the next step
+        ecs.mark_changed(attack_entity, Position)
+
+        return attack_entity
+
+    # Created with the other structural changes at the end of the tick, the
+    # physics system points the body at its entity once it is added
     rect = Rectangle(min, max)
-    entity = ecs.create_entity(
+    ecs.commands().create(
         Attack(entity),
         Position(rect.center),
-    )
-    ecs.add_component(
-        entity,
         PhysicsBody(
-            Body(
-                rect,
-                kind=BodyKind.Sensor,
-                layer=ATTACK_LAYER,
-                mask=ATTACK_MASK,
-                data=entity,
-            )
+            Body(rect, kind=BodyKind.Sensor, layer=ATTACK_LAYER, mask=ATTACK_MASK)
         ),
     )
 
-    return entity
+    return None
+
+
+def remove_attack(entity: int):
+    attack = ecs.get_component(entity, Attack)
+    if not attack.active:
+        return
+
+    attack.active = False
+    # Only attacks made by add_attack can be reused
+    if not (physics_body := ecs.try_component(entity, PhysicsBody)):
+        ecs.commands().delete(entity)
+        return
+
+    physics_body.body.active = False
+    ecs.pool(Attack).release(entity)
@@ -1,103 +1,124 @@
+import argparse
+import json
+from importlib.util import find_spec
+from pathlib import Path
+
 import pyglet
-import pyglet.info
-from pyglet.math import Vec2
-from pyglet.window import Window
-from pyglet.window.key import KeyStateHandler
-from pyglet.window.mouse import MouseStateHandler
-
-from barfight.pathfinding import Grid, Pathfinding
-
-from . import ecs, events
-from .bundles import add_enemy, add_player, add_wall
-from .physics import PhysicsWorld
-from .systems import (
-    AISystem,
-    ActorSystem,
-    AttackSystem,
-    DebugSystem,
-    DrawSystem,
-    HealthSystem,
-    InputSystem,
-    MovementSystem,
-    PhysicsSystem,
-)
-
-
-def main():
-    window = Window(800, 600, "Bar Fight")
-    world = PhysicsWorld(Vec2(-200, -200), Vec2(1000, 800))
-
-    debug_system = DebugSystem()
-    ecs.add_system(debug_system, 100)
-    ecs.add_handlers(debug_system)
-
-    key_state_handler = KeyStateHandler()
-    mouse_state_handler = MouseStateHandler()
-    window.push_handlers(key_state_handler, mouse_state_handler)
-    input_system = InputSystem(key_state_handler, mouse_state_handler)
-    ecs.add_system(input_system)
-    ecs.add_handlers(input_system)
-
-    movement_system = MovementSystem()
-    ecs.add_system(movement_system)
-    ecs.add_handlers(movement_system)
-
-    physics_system = PhysicsSystem(world)
-    ecs.add_system(physics_system)
-    ecs.add_handlers(physics_system)
-
-    draw_system = DrawSystem()
-    ecs.add_system(draw_system)
-    ecs.add_handlers(draw_system)
-
-    # Wire events
-    @window.event
-    def on_draw():
-        window.clear()
-        ecs.dispatch_event(events.DRAW_EVENT, window)
-
-    @window.event
-    def on_key_press(key: int, modifiers: int):
-        ecs.dispatch_event(events.KEY_DOWN_EVENT, key, modifiers)
-
-    @window.event
-    def on_key_release(key: int, modifiers: int):
-        ecs.dispatch_event(events.KEY_UP_EVENT, key, modifiers)
-
-    @window.event
-    def on_mouse_press(x: int, y: int, button: int, modifiers: int):
-        ecs.dispatch_event(events.MOUSE_DOWN_EVENT, x, y, button, modifiers)
-
-    @window.event
-    def on_mouse_release(x: int, y: int, button: int, modifiers: int):
-        ecs.dispatch_event(events.MOUSE_UP_EVENT, x, y, button, modifiers)
-
-    window.push_handlers(input_system.key_handler)
-    pyglet.clock.schedule_interval(ecs.update, interval=1.0 / 60)
-
-    player_system = ActorSystem()
-    ecs.add_system(player_system)
-    ecs.add_handlers(player_system)
-
-    health_system = HealthSystem()
-    ecs.add_system(health_system)
-
-    attack_system = AttackSystem()
-    ecs.add_system(attack_system)
-    ecs.add_handlers(attack_system)
-
-    add_player(Vec2(200, 200))
-    add_wall(400, 200, 100, 100)
-    add_wall(500, 200, 100, 100)
-    add_wall(600, 200, 100, 100)
-    add_wall(700, 200, 100, 100)
-    add_wall(800, 200, 100, 100)
-    add_enemy(200, 300)
-
-    pathfinding = Pathfinding(Grid(world, 5))
-    ai_system = AISystem(pathfinding, window)
-    ecs.add_system(ai_system)
-    ecs.add_handlers(ai_system)
-
-    pyglet.info.dump_gl()
-    pyglet.app.run()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="barfight")
+    subparsers = parser.add_subparsers(dest="command")
+
+    play_parser = subparsers.add_parser("play", help="open a window and play")
+    play_parser.add_argument("--scenario", default="bar")
+    play_parser.add_argument(
+        "--profile", type=Path, help="show system timings and save them as CSV or JSON"
+    )
+    play_parser.add_argument(
+        "--columnar", action="store_true", help="store movement in NumPy arrays"
+    )
+    play_parser.add_argument(
+        "--record", type=Path, help="save the session's input for replaying"
+    )
+
+    headless_parser = subparsers.add_parser(
+        "headless", help="run the simulation without a window"
+    )
+    headless_parser.add_argument("--scenario", default="bar")
+    headless_parser.add_argument("--ticks", type=int, default=600)
+    headless_parser.add_argument(
+        "--rate", type=float, default=0, help="ticks per second, 0 for unlimited"
+    )
+    headless_parser.add_argument(
+        "--profile", type=Path, help="save system timings as CSV or JSON"
+    )
+    headless_parser.add_argument(
+        "--columnar", action="store_true", help="store movement in NumPy arrays"
+    )
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="replay a recorded session without a window and time it"
+    )
+    replay_parser.add_argument("recording", type=Path)
+    replay_parser.add_argument(
+        "--output", type=Path, help="save the tick timing summary as JSON"
+    )
+    replay_parser.add_argument(
+        "--baseline", type=Path, help="compare against timings saved with --output"
+    )
+    replay_parser.add_argument(
+        "--profile", type=Path, help="save system timings as CSV or JSON"
+    )
+    replay_parser.add_argument(
+        "--columnar", action="store_true", help="store movement in NumPy arrays"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command in ("headless", "replay"):
+        # Without a shadow window pyglet never needs a display or GL. This has
+        # to be set before anything imports pyglet.window, so the game modules
+        # are only imported below.
+        pyglet.options["shadow_window"] = False
+
+    from . import ecs
+    from .profiler import Profiler
+    from .scenarios import SCENARIOS
+
+    recording = None
+    if args.command == "replay":
+        from .replay import load
+
+        try:
+            recording = load(args.recording)
+        except (OSError, ValueError) as error:
+            parser.error(f"can't replay {args.recording}: {error}")
+
+    scenario_name = (
+        recording.scenario if recording else getattr(args, "scenario", "bar")
+    )
+    if scenario_name not in SCENARIOS:
+        parser.error(
+            f"unknown scenario {scenario_name!r}, choose from {', '.join(SCENARIOS)}"
+        )
+    scenario = SCENARIOS[scenario_name]
+
+    columnar = getattr(args, "columnar", False)
+    if columnar and not find_spec("numpy"):
+        parser.error("--columnar needs numpy, install barfight[columnar]")
+
+    profiler = None
+    if profile := getattr(args, "profile", None):
+        profiler = Profiler()
+        ecs.set_profiler(profiler)
+
+    if args.command == "headless":
+        from .simulation import run_headless
+
+        run_headless(scenario, args.ticks, args.rate, columnar=columnar)
+    elif recording:
+        from .replay import compare, log_summary, run_replay, summary
+
+        stats = summary(run_replay(recording, columnar))
+        ratios = None
+        if args.baseline:
+            ratios = compare(stats, json.loads(args.baseline.read_text()))
+        log_summary(stats, ratios)
+        if args.output:
+            args.output.write_text(json.dumps(stats, indent=2))
+    else:
+        from .game import play
+
+        recorder = None
+        if record := getattr(args, "record", None):
+            from .replay import Recorder
+
+            recorder = Recorder.open(record, scenario_name)
+        try:
+            play(scenario, profiler, columnar, recorder)
+        finally:
+            if recorder:
+                recorder.close()
+
+    if profiler:
+        profiler.dump(profile)
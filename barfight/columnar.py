@@ -0,0 +1,184 @@
+import numpy as np
+from pyglet.math import Vec2
+
+from . import ecs, events
+from .components import Actor, Position, Velocity
+
+
+class ColumnarPosition(Position):
+    component_type = Position
+
+    def __init__(self, store: "ColumnarStore", row: int):
+        self.store = store
+        self.row: int | None = row
+        # Holds the value once the entity leaves the store
+        self.value = Vec2()
+
+    @property
+    def position(self) -> Vec2:
+        if self.row is None:
+            return self.value
+        x, y = self.store.positions[self.row]
+        return Vec2(float(x), float(y))
+
+    @position.setter
+    def position(self, position: Vec2):
+        if self.row is None:
+            self.value = position
+        else:
+            self.store.positions[self.row] = position
+
+
+class ColumnarVelocity(Velocity):
+    component_type = Velocity
+
+    def __init__(self, store: "ColumnarStore", row: int):
+        self.store = store
+        self.row: int | None = row
+        self.values = (Vec2(), 0.0)
+
+    @property
+    def direction(self) -> Vec2:
+        if self.row is None:
+            return self.values[0]
+        x, y = self.store.directions[self.row]
+        return Vec2(float(x), float(y))
+
+    @direction.setter
+    def direction(self, direction: Vec2):
+        if self.row is None:
+            self.values = (direction, self.values[1])
+        else:
+            self.store.directions[self.row] = direction
+
+    @property
+    def speed(self) -> float:
+        if self.row is None:
+            return self.values[1]
+        return float(self.store.speeds[self.row])
+
+    @speed.setter
+    def speed(self, speed: float):
+        if self.row is None:
+            self.values = (self.values[0], speed)
+        else:
+            self.store.speeds[self.row] = speed
+
+
+class ColumnarStore(events.ComponentAddedProtocol, events.ComponentRemovedProtocol):
+    component_added_types = (Actor, Position, Velocity)
+    component_removed_types = (Actor, Position, Velocity)
+
+    def __init__(self, capacity: int = 1024):
+        self.count = 0
+        self.entities = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros((capacity, 2))
+        self.directions = np.zeros((capacity, 2))
+        self.speeds = np.zeros(capacity)
+        self.rows: dict[int, int] = {}
+        self.proxies: list[tuple[ColumnarPosition, ColumnarVelocity]] = []
+        self.pending: dict[int, None] = {}
+        # Attached entities whose proxies are still queued as commands, with the
+        # components that stay in use until then
+        self.queued: dict[int, tuple[Position, Velocity]] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self.rows
+
+    def grow(self):
+        capacity = len(self.entities) * 2
+        self.entities = np.resize(self.entities, capacity)
+        self.positions = np.resize(self.positions, (capacity, 2))
+        self.directions = np.resize(self.directions, (capacity, 2))
+        self.speeds = np.resize(self.speeds, capacity)
+
+    def attach(self, entity: int):
+        # Swaps the entity's Position and Velocity for proxies into the arrays
+        _, position, velocity = ecs.try_components(entity, Actor, Position, Velocity)
+        if self.count == len(self.entities):
+            self.grow()
+
+        row = self.count
+        self.count += 1
+        self.rows[entity] = row
+        self.entities[row] = entity
+        self.positions[row] = position.position
+        self.directions[row] = velocity.direction
+        self.speeds[row] = velocity.speed
+        proxies = (ColumnarPosition(self, row), ColumnarVelocity(self, row))
+        self.proxies.append(proxies)
+        # Attaching happens while systems run, so the swap is a command too
+        self.queued[entity] = (position, velocity)
+        for proxy in proxies:
+            ecs.commands().add(entity, proxy)
+
+    def detach(self, entity: int):
+        self.queued.pop(entity, None)
+        row = self.rows.pop(entity)
+        position, velocity = self.proxies[row]
+        position.value = position.position
+        velocity.values = (velocity.direction, velocity.speed)
+        position.row = velocity.row = None
+
+        # The last row fills the gap so the arrays stay packed
+        last = self.count - 1
+        moved = self.proxies.pop()
+        if row != last:
+            self.proxies[row] = moved
+            for proxy in moved:
+                proxy.row = row
+            self.entities[row] = self.entities[last]
+            self.positions[row] = self.positions[last]
+            self.directions[row] = self.directions[last]
+            self.speeds[row] = self.speeds[last]
+            self.rows[int(self.entities[row])] = row
+        self.count = last
+
+    def attach_pending(self):
+        # Commands were applied since the last call, every proxy is in place
+        self.queued.clear()
+        pending, self.pending = self.pending, {}
+        for entity in pending:
+            if (
+                ecs.entity_exists(entity)
+                and entity not in self.rows
+                and ecs.try_components(entity, Actor, Position, Velocity)
+            ):
+                self.attach(entity)
+
+    def swapped(self, entity: int, proxy: ColumnarPosition | ColumnarVelocity):
+        # The replaced component may have changed while the proxy was queued
+        if not (replaced := self.queued.get(entity)):
+            return
+        position, velocity = replaced
+        if isinstance(proxy, ColumnarPosition):
+            self.positions[proxy.row] = position.position
+        else:
+            self.directions[proxy.row] = velocity.direction
+            self.speeds[proxy.row] = velocity.speed
+
+    def integrate(self, dt: float) -> np.ndarray:
+        count = self.count
+        step = self.directions[:count] * (self.speeds[:count, np.newaxis] * dt)
+        moved = np.any(step != 0, axis=1)
+        self.positions[:count] += step
+
+        return self.entities[:count][moved]
+
+    def on_component_added(self, entity: int, component: Actor | Position | Velocity):
+        if isinstance(component, (ColumnarPosition, ColumnarVelocity)):
+            if component.row is not None:
+                self.swapped(entity, component)
+                return
+        # A plain component replaced a proxy
+        if entity in self.rows:
+            self.detach(entity)
+        self.pending[entity] = None
+
+    def on_component_removed(self, entity: int, component: Actor | Position | Velocity):
+        self.pending.pop(entity, None)
+        if entity in self.rows:
+            self.detach(entity)
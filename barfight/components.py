@@ -4,6 +4,7 @@ from enum import Enum, IntEnum, auto
 import pyglet
 from pyglet.math import Vec2
 
+from .pathfinding import DStarLite, FlowField
 from .physics import Body
 
 
@@ -40,6 +41,7 @@ class Wall: ...
 class Attack:
     entity: int
     cleanup: bool = False
+    active: bool = True
 
 
 @dataclass
@@ -63,6 +65,7 @@ class Position:
 class Sprite:
     sprite: pyglet.sprite.Sprite
     layer: Layer
+    asset: str | None = None
 
 
 @dataclass
@@ -80,3 +83,20 @@ class Shape:
 class Path:
     goal: Vec2
     path: list[Vec2]
+    # Seconds after the path was given before heading for each waypoint, empty
+    # when any time will do
+    times: list[float] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+@dataclass
+class Flow:
+    goal: Vec2
+    field: FlowField
+
+
+@dataclass
+class Planner:
+    goal: Vec2
+    planner: DStarLite
+    target: int | None = None
@@ -1,39 +1,558 @@
+import sys
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from threading import Lock
+from time import perf_counter_ns
+from types import MethodType
 from typing import Any, Callable, Protocol, Type
+from weakref import WeakMethod, ref
 
 import esper
 
 from . import events
+from .profiler import FRAME, Profiler
+
+_profiler: Profiler | None = None
+_world = "default"
 
 
 class SystemProtocol(Protocol):
     def process(self, *args, **kwargs): ...
 
 
+# Systems can set reads and writes to tuples of the component types, or other
+# shared objects such as Grid, that process and the handlers of the events it
+# dispatches use. Systems that don't are run on their own. Structural changes
+# must go through commands() to run alongside other systems.
+
+
+def free_threaded() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+_executor: ThreadPoolExecutor | None = ThreadPoolExecutor() if free_threaded() else None
+
+
+def _weak(handler: Callable) -> Callable[[], Callable | None]:
+    # Held weakly, the same as esper's handlers
+    if isinstance(handler, MethodType):
+        return WeakMethod(handler)
+    return ref(handler)
+
+
+def _call(name: str, handler: Callable, *args):
+    if _profiler:
+        _profiler.call(f"{name}:{handler.__qualname__}", handler, *args)
+    else:
+        handler(*args)
+
+
+class EventBus:
+    # Handlers published to while they are being flushed get the new events in
+    # another round, up to this many before they wait for the next flush
+    max_rounds = 8
+
+    def __init__(self):
+        self.queues: defaultdict[type, list] = defaultdict(list)
+        self.subscribers: defaultdict[type, list] = defaultdict(list)
+        self.lock = Lock()
+
+    def publish(self, event: Any):
+        with self.lock:
+            self.queues[type(event)].append(event)
+
+    def subscribe(self, event_type: type, handler: Callable[[list], None]):
+        self.subscribers[event_type].append(_weak(handler))
+
+    def unsubscribe(self, event_type: type, handler: Callable[[list], None]):
+        self.subscribers[event_type] = [
+            reference
+            for reference in self.subscribers[event_type]
+            if reference() not in (None, handler)
+        ]
+
+    def flush(self, *event_types: type):
+        for _ in range(self.max_rounds):
+            pending = [
+                event_type
+                for event_type in event_types or list(self.queues)
+                if self.queues.get(event_type)
+            ]
+            if not pending:
+                return
+            for event_type in pending:
+                batch = self.queues.pop(event_type)
+                for reference in list(self.subscribers.get(event_type, [])):
+                    if handler := reference():
+                        _call(event_type.__name__, handler, batch)
+
+
+_buses: dict[str, EventBus] = {}
+
+
+class View:
+    def __init__(self, *component_types: type):
+        self.component_types = component_types
+        self.entities: dict[int, tuple] = {}
+        self.items: list[tuple[int, tuple]] | None = None
+        for entity, components in esper.get_components(*component_types):
+            # Deleted entities stay in esper until the next update
+            if esper.entity_exists(entity):
+                self.entities[entity] = tuple(components)
+
+    def __iter__(self):
+        # Iterates a snapshot, so systems can add and remove components while
+        # looping, the same as with get_components
+        if self.items is None:
+            self.items = list(self.entities.items())
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self.entities
+
+    def refresh(self, entity: int):
+        if components := esper.try_components(entity, *self.component_types):
+            self.entities[entity] = components
+            self.items = None
+        else:
+            self.discard(entity)
+
+    def discard(self, entity: int):
+        if self.entities.pop(entity, None) is not None:
+            self.items = None
+
+
+class ChangeTracker:
+    def __init__(self):
+        self.tick = 0
+        # Changed entities of each component type, oldest change first
+        self.changed: defaultdict[type, dict[int, int]] = defaultdict(dict)
+        self.lock = Lock()
+
+    def mark(self, entity: int, component_type: type):
+        with self.lock:
+            self.tick += 1
+            changed = self.changed[component_type]
+            changed.pop(entity, None)
+            changed[entity] = self.tick
+
+    def mark_many(self, entities: list[int], component_type: type):
+        # One tick for the whole batch, with the loops left to C
+        with self.lock:
+            self.tick += 1
+            changed = self.changed[component_type]
+            deque(map(changed.pop, entities, repeat(None)), maxlen=0)
+            changed.update(dict.fromkeys(entities, self.tick))
+
+    def discard(self, entity: int, component_type: type):
+        if changed := self.changed.get(component_type):
+            changed.pop(entity, None)
+
+    def since(self, component_type: type, tick: int) -> list[int]:
+        entities = []
+        # Newest first, so only the changes being returned are visited
+        for entity, changed_tick in reversed(
+            self.changed.get(component_type, {}).items()
+        ):
+            if changed_tick <= tick:
+                break
+            entities.append(entity)
+        entities.reverse()
+
+        return entities
+
+
+class CommandBuffer:
+    # Like EventBus, commands recorded while applying are applied in further
+    # rounds, up to this many
+    max_rounds = 8
+
+    def __init__(self):
+        self.created: list[tuple[Any, ...]] = []
+        self.deleted: dict[int, None] = {}
+        # Pending component changes by entity, the last one for a type wins
+        self.changes: dict[int, dict[type, tuple[str, Any]]] = {}
+        # Systems in the same stage can record at the same time
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.created) + len(self.deleted) + len(self.changes)
+
+    def create(self, *components: Any):
+        with self.lock:
+            self.created.append(components)
+
+    def delete(self, entity: int):
+        with self.lock:
+            self.deleted[entity] = None
+            self.changes.pop(entity, None)
+
+    def add(self, entity: int, component: Any):
+        with self.lock:
+            if entity in self.deleted:
+                return
+            changes = self.changes.setdefault(entity, {})
+            component_type = type_of(component)
+            previous = changes.get(component_type)
+            # Removing and adding again still tells handlers about the removal
+            kind = "replace" if previous and previous[0] != "add" else "add"
+            changes[component_type] = (kind, component)
+
+    def remove(self, entity: int, component_type: type):
+        with self.lock:
+            if entity in self.deleted:
+                return
+            self.changes.setdefault(entity, {})[component_type] = ("remove", None)
+
+    def apply(self) -> list[int]:
+        created, self.created = self.created, []
+        deleted, self.deleted = self.deleted, {}
+        changes, self.changes = self.changes, {}
+
+        entities = [create_entity(*components) for components in created]
+        for entity, entity_changes in changes.items():
+            if not entity_exists(entity):
+                continue
+            for component_type, (kind, component) in entity_changes.items():
+                if kind != "add" and has_component(entity, component_type):
+                    remove_component(entity, component_type)
+                if kind != "remove":
+                    add_component(entity, component)
+        for entity in deleted:
+            if entity_exists(entity):
+                delete_entity(entity)
+
+        return entities
+
+
+class EntityPool:
+    def __init__(self):
+        self.free: list[int] = []
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+    def acquire(self) -> int | None:
+        # Pooled entities keep their components, the caller resets them
+        with self.lock:
+            while self.free:
+                entity = self.free.pop()
+                if entity_exists(entity):
+                    return entity
+
+        return None
+
+    def release(self, entity: int):
+        with self.lock:
+            self.free.append(entity)
+
+
+def _conflicts(first: SystemProtocol, second: SystemProtocol) -> bool:
+    if getattr(first, "writes", None) is None:
+        return True
+    if getattr(second, "writes", None) is None:
+        return True
+
+    first_reads = {*getattr(first, "reads", ()), *first.writes}
+    second_reads = {*getattr(second, "reads", ()), *second.writes}
+    return bool(first_reads & set(second.writes) or second_reads & set(first.writes))
+
+
+class Scheduler:
+    def __init__(self):
+        self.systems: list[SystemProtocol] = []
+        self.stages: list[list[SystemProtocol]] | None = None
+
+    def add(self, system: SystemProtocol, priority: int):
+        system.priority = priority
+        self.systems.append(system)
+        # Stable, so systems of the same priority keep the order they were added
+        self.systems.sort(key=lambda other: other.priority, reverse=True)
+        self.stages = None
+
+    def remove(self, system_type: type[SystemProtocol]):
+        self.systems = [
+            system for system in self.systems if type(system) is not system_type
+        ]
+        self.stages = None
+
+    def build(self) -> list[list[SystemProtocol]]:
+        # Each system goes in the stage after the last one with a system it
+        # conflicts with, so conflicting systems keep their priority order
+        stages: list[list[SystemProtocol]] = []
+        for system in self.systems:
+            index = 0
+            for i, stage in enumerate(stages):
+                if any(_conflicts(system, other) for other in stage):
+                    index = i + 1
+            if index == len(stages):
+                stages.append([system])
+            else:
+                stages[index].append(system)
+
+        return stages
+
+    def run(self, executor: ThreadPoolExecutor | None, *args, **kwargs):
+        if not executor:
+            for system in self.systems:
+                system.process(*args, **kwargs)
+            return
+
+        if self.stages is None:
+            self.stages = self.build()
+        for stage in self.stages:
+            if len(stage) == 1:
+                stage[0].process(*args, **kwargs)
+                continue
+            futures = [
+                executor.submit(system.process, *args, **kwargs) for system in stage
+            ]
+            for future in futures:
+                future.result()
+
+
+_buffers: dict[str, CommandBuffer] = {}
+_schedulers: dict[str, Scheduler] = {}
+_trackers: dict[str, ChangeTracker] = {}
+# Entity pools of each world, by the component type they are pooled for
+_pools: dict[str, dict[type, EntityPool]] = {}
+
+# Views of each world, and the views that include each component type
+_views: dict[str, dict[tuple[type, ...], View]] = {}
+_views_by_type: dict[str, defaultdict[type, list[View]]] = {}
+_views_lock = Lock()
+# Add and remove handlers of each world, for systems that only want some
+# component types
+_component_added: dict[str, defaultdict[type, list]] = {}
+_component_removed: dict[str, defaultdict[type, list]] = {}
+
+
+def event_bus() -> EventBus:
+    if not (bus := _buses.get(_world)):
+        bus = _buses[_world] = EventBus()
+
+    return bus
+
+
 def switch_world(name: str):
+    global _world
     esper.switch_world(name)
+    _world = name
 
 
 def delete_world(name: str):
     esper.delete_world(name)
+    _buses.pop(name, None)
+    _buffers.pop(name, None)
+    _schedulers.pop(name, None)
+    _trackers.pop(name, None)
+    _pools.pop(name, None)
+    _views.pop(name, None)
+    _views_by_type.pop(name, None)
+    _component_added.pop(name, None)
+    _component_removed.pop(name, None)
+
+
+def scheduler() -> Scheduler:
+    if not (world_scheduler := _schedulers.get(_world)):
+        world_scheduler = _schedulers[_world] = Scheduler()
+
+    return world_scheduler
+
+
+def set_parallel(enabled: bool | None = None, workers: int | None = None):
+    # None runs stages in parallel only on free-threaded builds, where it helps
+    global _executor
+    if _executor:
+        _executor.shutdown()
+    if enabled is None:
+        enabled = free_threaded()
+    _executor = ThreadPoolExecutor(workers) if enabled else None
+
+
+def changes() -> ChangeTracker:
+    if not (tracker := _trackers.get(_world)):
+        tracker = _trackers[_world] = ChangeTracker()
+
+    return tracker
+
+
+def mark_changed(entity: int, component_type: type):
+    # Components are changed in place, so writers mark them for get_changed
+    changes().mark(entity, component_type)
+
+
+def mark_many_changed(entities: list[int], component_type: type):
+    changes().mark_many(entities, component_type)
+
+
+def change_tick() -> int:
+    return changes().tick
+
+
+def get_changed(*component_types: type, since: int) -> list[tuple[int, tuple]]:
+    # Entities with all of the types where any of them changed after the tick
+    tracker = changes()
+    entities = dict.fromkeys(
+        entity
+        for component_type in component_types
+        for entity in tracker.since(component_type, since)
+    )
+    changed = []
+    for entity in entities:
+        if not esper.entity_exists(entity):
+            continue
+        if components := esper.try_components(entity, *component_types):
+            changed.append((entity, tuple(components)))
+
+    return changed
+
+
+def commands() -> CommandBuffer:
+    # Structural changes recorded here are applied together at the end of
+    # ecs.update, so systems can make them while iterating
+    if not (buffer := _buffers.get(_world)):
+        buffer = _buffers[_world] = CommandBuffer()
+
+    return buffer
+
+
+def pool(component_type: type) -> EntityPool:
+    pools = _pools.setdefault(_world, {})
+    if not (entity_pool := pools.get(component_type)):
+        entity_pool = pools[component_type] = EntityPool()
+
+    return entity_pool
+
+
+def apply_commands() -> list[int]:
+    created = []
+    buffer = commands()
+    # Applying can run handlers that record more commands
+    for _ in range(buffer.max_rounds):
+        if not buffer:
+            break
+        created += buffer.apply()
+
+    return created
+
+
+def view(*component_types: type) -> View:
+    views = _views.setdefault(_world, {})
+    if cached := views.get(component_types):
+        return cached
+
+    with _views_lock:
+        if not (cached := views.get(component_types)):
+            cached = views[component_types] = View(*component_types)
+            by_type = _views_by_type.setdefault(_world, defaultdict(list))
+            for component_type in component_types:
+                by_type[component_type].append(cached)
+
+    return cached
+
+
+def _refresh_views(entity: int, component_types):
+    if not (by_type := _views_by_type.get(_world)):
+        return
+
+    refreshed = set()
+    for component_type in component_types:
+        for cached in by_type.get(component_type, ()):
+            if id(cached) not in refreshed:
+                refreshed.add(id(cached))
+                cached.refresh(entity)
+
+
+def set_profiler(profiler: Profiler | None):
+    # Only systems added after this are timed
+    global _profiler
+    _profiler = profiler
 
 
 def add_system(system: SystemProtocol, priority: int = 0):
+    if _profiler:
+        system.process = _profiler.wrap(type(system).__name__, system.process)
     esper.add_processor(system, priority)
+    scheduler().add(system, priority)
 
 
 def remove_system(system_type: type[SystemProtocol]):
     esper.remove_processor(system_type)
+    scheduler().remove(system_type)
+
+
+def type_of(component: Any) -> type:
+    # Stand-ins such as columnar proxies are stored as the type they replace
+    return getattr(type(component), "component_type", type(component))
+
+
+# Unlike the batched event bus these are delivered as they happen. Handlers
+# keep state that must match the store before anything else runs, such as
+# the physics world holding every PhysicsBody, and removal handlers still
+# need the component attached. Typed subscriptions keep the cost to the
+# handlers that asked for the type.
+def _notify(
+    tables: dict[str, defaultdict[type, list]], name: str, entity: int, component: Any
+):
+    dispatch_event(name, entity, component)
+    if not (handlers := tables.get(_world)):
+        return
+    if not (references := handlers.get(type_of(component))):
+        return
+
+    for reference in list(references):
+        if handler := reference():
+            _call(name, handler, entity, component)
+        else:
+            references.remove(reference)
+
+
+def _subscribe_components(
+    tables: dict[str, defaultdict[type, list]],
+    component_types: tuple[type, ...],
+    handler,
+):
+    handlers = tables.setdefault(_world, defaultdict(list))
+    for component_type in component_types:
+        handlers[component_type].append(_weak(handler))
+
+
+def _unsubscribe_components(
+    tables: dict[str, defaultdict[type, list]],
+    component_types: tuple[type, ...],
+    handler,
+):
+    if not (handlers := tables.get(_world)):
+        return
+    for component_type in component_types:
+        handlers[component_type] = [
+            reference
+            for reference in handlers[component_type]
+            if reference() not in (None, handler)
+        ]
 
 
 def add_component(entity: int, component: Any):
-    esper.add_component(entity, component)
-    esper.dispatch_event(events.COMPONENT_ADDED_EVENT, entity, component)
+    component_type = type_of(component)
+    esper.add_component(entity, component, component_type)
+    _refresh_views(entity, (component_type,))
+    changes().mark(entity, component_type)
+    _notify(_component_added, events.COMPONENT_ADDED_EVENT, entity, component)
 
 
 def remove_component(entity: int, component_type: type[Any]):
-    component = esper.get_component(component_type)
-    esper.dispatch_event(events.COMPONENT_REMOVED_EVENT, entity, component)
+    component = esper.component_for_entity(entity, component_type)
+    _notify(_component_removed, events.COMPONENT_REMOVED_EVENT, entity, component)
     esper.remove_component(entity, component_type)
+    _refresh_views(entity, (component_type,))
+    changes().discard(entity, component_type)
 
 
 def get_component(entity: int, component: type[Any]) -> Any:
@@ -44,6 +563,14 @@ def get_components(*component_types: Any) -> list[tuple[int, tuple]]:
     return esper.get_components(*component_types)
 
 
+def get_entities() -> list[int]:
+    return [entity for entity in esper.get_entities() if esper.entity_exists(entity)]
+
+
+def components_for_entity(entity: int) -> tuple[Any, ...]:
+    return esper.components_for_entity(entity)
+
+
 def has_component(entity: int, component: type[Any]) -> bool:
     return esper.has_component(entity, component)
 
@@ -57,17 +584,32 @@ def try_components(entity: int, *components: Any) -> tuple:
 
 
 def create_entity(*components: Any) -> int:
-    entity = esper.create_entity(*components)
+    entity = esper.create_entity()
     for component in components:
-        esper.dispatch_event(events.COMPONENT_ADDED_EVENT, entity, component)
+        esper.add_component(entity, component, type_of(component))
+    _refresh_views(entity, [type_of(component) for component in components])
+    tracker = changes()
+    for component in components:
+        tracker.mark(entity, type_of(component))
+    for component in components:
+        _notify(_component_added, events.COMPONENT_ADDED_EVENT, entity, component)
 
     return entity
 
 
 def delete_entity(entity: int):
-    for component in esper.components_for_entity(entity):
-        esper.dispatch_event(events.COMPONENT_REMOVED_EVENT, entity, component)
+    components = esper.components_for_entity(entity)
+    for component in components:
+        _notify(_component_removed, events.COMPONENT_REMOVED_EVENT, entity, component)
     esper.delete_entity(entity)
+    tracker = changes()
+    for component in components:
+        tracker.discard(entity, type_of(component))
+    # esper only drops the entity on the next update, views drop it now
+    if by_type := _views_by_type.get(_world):
+        for component in components:
+            for cached in by_type.get(type_of(component), ()):
+                cached.discard(entity)
 
 
 def entity_exists(entity: int) -> bool:
@@ -77,14 +619,24 @@ def entity_exists(entity: int) -> bool:
 def add_handlers(system: Any):
     if isinstance(system, events.AIStateProtocol):
         esper.set_handler(events.AI_ATTACK_EVENT, system.on_ai_attack)
-        esper.set_handler(events.AI_DIRECTION_EVENT, system.on_ai_direction)
+        subscribe(events.AIDirection, system.on_ai_direction)
     if isinstance(system, events.CollisionProtocol):
         esper.set_handler(events.COLLISION_EVENT, system.on_collision)
         esper.set_handler(events.SENSOR_EVENT, system.on_sensor)
     if isinstance(system, events.ComponentAddedProtocol):
-        esper.set_handler(events.COMPONENT_ADDED_EVENT, system.on_component_added)
+        if types := getattr(system, "component_added_types", None):
+            _subscribe_components(_component_added, types, system.on_component_added)
+        else:
+            esper.set_handler(events.COMPONENT_ADDED_EVENT, system.on_component_added)
     if isinstance(system, events.ComponentRemovedProtocol):
-        esper.set_handler(events.COMPONENT_REMOVED_EVENT, system.on_component_removed)
+        if types := getattr(system, "component_removed_types", None):
+            _subscribe_components(
+                _component_removed, types, system.on_component_removed
+            )
+        else:
+            esper.set_handler(
+                events.COMPONENT_REMOVED_EVENT, system.on_component_removed
+            )
     if isinstance(system, events.DrawProtocol):
         esper.set_handler(events.DRAW_EVENT, system.on_draw)
     if isinstance(system, events.ExitProtocol):
@@ -97,20 +649,31 @@ def add_handlers(system: Any):
     if isinstance(system, events.PlayerStateProtocol):
         esper.set_handler(events.PLAYER_ATTACK_EVENT, system.on_player_attack)
         esper.set_handler(events.PLAYER_DIRECTION_EVENT, system.on_player_direction)
-    if isinstance(system, events.PositionChangedProtocol):
-        esper.set_handler(events.POSITION_CHANGED_EVENT, system.on_position_changed)
 
 
 def remove_handlers(system: Any):
+    if isinstance(system, events.AIStateProtocol):
+        esper.remove_handler(events.AI_ATTACK_EVENT, system.on_ai_attack)
+        unsubscribe(events.AIDirection, system.on_ai_direction)
     if isinstance(system, events.CollisionProtocol):
         esper.remove_handler(events.COLLISION_EVENT, system.on_collision)
         esper.remove_handler(events.SENSOR_EVENT, system.on_sensor)
     if isinstance(system, events.ComponentAddedProtocol):
-        esper.remove_handler(events.COMPONENT_ADDED_EVENT, system.on_component_added)
+        if types := getattr(system, "component_added_types", None):
+            _unsubscribe_components(_component_added, types, system.on_component_added)
+        else:
+            esper.remove_handler(
+                events.COMPONENT_ADDED_EVENT, system.on_component_added
+            )
     if isinstance(system, events.ComponentRemovedProtocol):
-        esper.remove_handler(
-            events.COMPONENT_REMOVED_EVENT, system.on_component_removed
-        )
+        if types := getattr(system, "component_removed_types", None):
+            _unsubscribe_components(
+                _component_removed, types, system.on_component_removed
+            )
+        else:
+            esper.remove_handler(
+                events.COMPONENT_REMOVED_EVENT, system.on_component_removed
+            )
     if isinstance(system, events.DrawProtocol):
         esper.remove_handler(events.DRAW_EVENT, system.on_draw)
     if isinstance(system, events.ExitProtocol):
@@ -118,11 +681,11 @@ def remove_handlers(system: Any):
     if isinstance(system, events.InputProtocol):
         esper.remove_handler(events.KEY_DOWN_EVENT, system.on_key_down)
         esper.remove_handler(events.KEY_UP_EVENT, system.on_key_up)
+        esper.remove_handler(events.MOUSE_DOWN_EVENT, system.on_mouse_down)
+        esper.remove_handler(events.MOUSE_UP_EVENT, system.on_mouse_up)
     if isinstance(system, events.PlayerStateProtocol):
         esper.remove_handler(events.PLAYER_ATTACK_EVENT, system.on_player_attack)
         esper.remove_handler(events.PLAYER_DIRECTION_EVENT, system.on_player_direction)
-    if isinstance(system, events.PositionChangedProtocol):
-        esper.remove_handler(events.POSITION_CHANGED_EVENT, system.on_position_changed)
 
 
 def set_handler(name: str, func: Callable[..., None]):
@@ -134,8 +697,47 @@ def remove_handler(name: str, func: Callable[..., None]):
 
 
 def dispatch_event(name: str, *args):
-    esper.dispatch_event(name, *args)
+    if not _profiler:
+        esper.dispatch_event(name, *args)
+        return
+
+    # Same as esper.dispatch_event, timing each handler on its own
+    for reference in list(esper.event_registry.get(name, [])):
+        if handler := reference():
+            _call(name, handler, *args)
+
+
+def publish(event: Any):
+    event_bus().publish(event)
+
+
+def subscribe(event_type: type, handler: Callable[[list], None]):
+    event_bus().subscribe(event_type, handler)
+
+
+def unsubscribe(event_type: type, handler: Callable[[list], None]):
+    event_bus().unsubscribe(event_type, handler)
+
+
+def flush_events(*event_types: type):
+    event_bus().flush(*event_types)
+
+
+def process(*args, **kwargs):
+    # The same as esper.process, but independent systems can run in parallel
+    esper.clear_dead_entities()
+    scheduler().run(_executor, *args, **kwargs)
 
 
 def update(*args, **kwargs):
-    esper.process(*args, **kwargs)
+    if not _profiler:
+        process(*args, **kwargs)
+        apply_commands()
+        flush_events()
+        return
+
+    started = perf_counter_ns()
+    process(*args, **kwargs)
+    apply_commands()
+    flush_events()
+    _profiler.record(FRAME, perf_counter_ns() - started)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Any, Protocol, runtime_checkable
 
 from pyglet.math import Vec2
@@ -15,14 +16,25 @@ MOUSE_UP_EVENT = "mouse_up"
 EXIT_EVENT = "exit"
 COLLISION_EVENT = "collision"
 SENSOR_EVENT = "sensor"
-POSITION_CHANGED_EVENT = "position_changed"
 DAMAGE_EVENT = "damage"
 PLAYER_DIRECTION_EVENT = "player_direction"
 PLAYER_ATTACK_EVENT = "player_attack"
-AI_DIRECTION_EVENT = "ai_direction"
 AI_ATTACK_EVENT = "ai_attack"
 
 
+# Queued events, delivered in batches by ecs.flush_events
+
+
+@dataclass(frozen=True, slots=True)
+class AIDirection:
+    entity: int
+    direction: Vec2
+
+
+# Systems can set component_added_types and component_removed_types to a tuple
+# of component types to only be called for those
+
+
 @runtime_checkable
 class ComponentAddedProtocol(Protocol):
     def on_component_added(self, source: int, component: Any): ...
@@ -66,9 +78,4 @@ class PlayerStateProtocol(Protocol):
 @runtime_checkable
 class AIStateProtocol(Protocol):
     def on_ai_attack(self, target: int): ...
-    def on_ai_direction(self, target: int, direction: Vec2): ...
-
-
-@runtime_checkable
-class PositionChangedProtocol(Protocol):
-    def on_position_changed(self, source: int): ...
+    def on_ai_direction(self, directions: list[AIDirection]): ...
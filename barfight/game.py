@@ -0,0 +1,82 @@
+import pyglet
+import pyglet.info
+from pyglet.window import Window
+from pyglet.window.key import KeyStateHandler
+from pyglet.window.mouse import MouseStateHandler
+
+from . import ecs, events
+from .physics import PhysicsWorld
+from .profiler import Profiler, ProfilerOverlay
+from .replay import Recorder
+from .scenarios import Scenario
+from .simulation import add_core_systems, add_navigation_systems
+from .systems import DebugSystem, DrawSystem, InputSystem
+
+
+def play(
+    scenario: Scenario,
+    profiler: Profiler | None = None,
+    columnar: bool = False,
+    recorder: Recorder | None = None,
+):
+    window = Window(800, 600, "Bar Fight")
+    world = PhysicsWorld(scenario.min, scenario.max)
+
+    debug_system = DebugSystem()
+    ecs.add_system(debug_system, 100)
+    ecs.add_handlers(debug_system)
+
+    key_state_handler = KeyStateHandler()
+    mouse_state_handler = MouseStateHandler()
+    window.push_handlers(key_state_handler, mouse_state_handler)
+    input_system = InputSystem(key_state_handler, mouse_state_handler)
+    ecs.add_system(input_system)
+    ecs.add_handlers(input_system)
+
+    add_core_systems(world, columnar)
+
+    if recorder:
+        ecs.add_system(recorder, -100)
+        ecs.add_handlers(recorder)
+
+    draw_system = DrawSystem()
+    ecs.add_system(draw_system)
+    ecs.add_handlers(draw_system)
+
+    overlay = None
+    if profiler:
+        overlay = ProfilerOverlay(profiler, y=window.height - 10)
+        pyglet.clock.schedule_interval(overlay.update, interval=0.5)
+
+    # Wire events
+    @window.event
+    def on_draw():
+        window.clear()
+        ecs.dispatch_event(events.DRAW_EVENT, window)
+        if overlay:
+            overlay.draw()
+
+    @window.event
+    def on_key_press(key: int, modifiers: int):
+        ecs.dispatch_event(events.KEY_DOWN_EVENT, key, modifiers)
+
+    @window.event
+    def on_key_release(key: int, modifiers: int):
+        ecs.dispatch_event(events.KEY_UP_EVENT, key, modifiers)
+
+    @window.event
+    def on_mouse_press(x: int, y: int, button: int, modifiers: int):
+        ecs.dispatch_event(events.MOUSE_DOWN_EVENT, x, y, button, modifiers)
+
+    @window.event
+    def on_mouse_release(x: int, y: int, button: int, modifiers: int):
+        ecs.dispatch_event(events.MOUSE_UP_EVENT, x, y, button, modifiers)
+
+    window.push_handlers(input_system.key_handler)
+    pyglet.clock.schedule_interval(ecs.update, interval=1.0 / 60)
+
+    scenario.populate(True)
+    add_navigation_systems(world, window)
+
+    pyglet.info.dump_gl()
+    pyglet.app.run()
@@ -0,0 +1,183 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from loguru import logger
+
+from .constants import CHARACTER_LAYER
+from .pathfinding import Grid
+from .physics import PhysicsWorld
+
+# File layout, all little-endian:
+#   header   magic, format version, width, height, next label, layout key
+#   table    one (tag, offset, length) entry per section
+#   sections raw layer data, each starting at its table offset
+MAGIC = b"BFNV"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHIII32sH")
+SECTION = struct.Struct("<4sQQ")
+
+OCCUPANCY = b"OCCU"
+CLEARANCE = b"CLRN"
+LABELS = b"LABL"
+
+
+def layout_key(world: PhysicsWorld, radius: float, max_clearance: int = 32) -> bytes:
+    digest = hashlib.sha256()
+    boundary = world.boundary
+    digest.update(
+        struct.pack(
+            "<ddddd",
+            boundary.min.x,
+            boundary.min.y,
+            boundary.max.x,
+            boundary.max.y,
+            radius,
+        )
+    )
+    digest.update(struct.pack("<I", max_clearance))
+
+    # Only bodies that block characters shape the grid
+    rectangles = sorted(
+        (
+            body.rectangle.min.x,
+            body.rectangle.min.y,
+            body.rectangle.max.x,
+            body.rectangle.max.y,
+        )
+        for body in world.query(boundary)
+        if body.mask & CHARACTER_LAYER
+    )
+    for rectangle in rectangles:
+        digest.update(struct.pack("<dddd", *rectangle))
+
+    return digest.digest()
+
+
+def _labels_bytes(labels: array) -> bytes:
+    if sys.byteorder == "little":
+        return labels.tobytes()
+
+    swapped = array(labels.typecode, labels)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def save(grid: Grid, path: Path, key: bytes):
+    sections = [
+        (OCCUPANCY, bytes(grid.occupancy())),
+        (CLEARANCE, grid.clearance.tobytes()),
+        (LABELS, _labels_bytes(grid.labels)),
+    ]
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for tag, data in sections:
+        table.append(SECTION.pack(tag, offset, len(data)))
+        offset += len(data)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(path.suffix + ".tmp")
+    with partial.open("wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                grid.width,
+                grid.height,
+                grid.next_label,
+                key,
+                len(sections),
+            )
+        )
+        file.writelines(table)
+        file.writelines(data for _, data in sections)
+    # Readers never see a half-written file
+    os.replace(partial, path)
+
+
+def load(grid: Grid, path: Path, key: bytes) -> bool:
+    try:
+        file = path.open("rb")
+    except FileNotFoundError:
+        return False
+
+    with file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            return False
+        magic, version, width, height, next_label, stored_key, count = (
+            HEADER.unpack_from(data)
+        )
+        if (
+            magic != MAGIC
+            or version != FORMAT_VERSION
+            or stored_key != key
+            or (width, height) != (grid.width, grid.height)
+        ):
+            return False
+
+        cells = width * height
+        expected = {
+            OCCUPANCY: cells,
+            CLEARANCE: cells,
+            LABELS: cells * grid.labels.itemsize,
+        }
+        sections = {}
+        for i in range(count):
+            tag, offset, length = SECTION.unpack_from(
+                data, HEADER.size + i * SECTION.size
+            )
+            if offset + length > len(data):
+                return False
+            sections[tag] = (offset, length)
+        if any(
+            sections.get(tag, (0, -1))[1] != length for tag, length in expected.items()
+        ):
+            return False
+
+        view = memoryview(data)
+        layers = {}
+        try:
+            layers = {
+                tag: view[offset : offset + length]
+                for tag, (offset, length) in sections.items()
+                if tag in expected
+            }
+            labels = layers[LABELS]
+            if sys.byteorder != "little":
+                swapped = array("I")
+                swapped.frombytes(labels)
+                swapped.byteswap()
+                labels = swapped.tobytes()
+            grid.restore(layers[OCCUPANCY], layers[CLEARANCE], labels, next_label)
+        finally:
+            for layer in layers.values():
+                layer.release()
+            view.release()
+
+    return True
+
+
+def load_or_build(
+    world: PhysicsWorld, radius: float, directory: Path, max_clearance: int = 32
+) -> Grid:
+    key = layout_key(world, radius, max_clearance)
+    path = directory / f"{key.hex()}.nav"
+    grid = Grid(world, radius, max_clearance, build=False)
+    try:
+        if load(grid, path, key):
+            logger.debug("Loaded navigation data from {}", path)
+            return grid
+    except (OSError, ValueError, struct.error):
+        logger.warning("Discarding unreadable navigation data {}", path)
+
+    grid.update_collisions()
+    try:
+        save(grid, path, key)
+    except OSError:
+        logger.warning("Could not save navigation data to {}", path)
+
+    return grid
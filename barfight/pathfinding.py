@@ -1,8 +1,12 @@
 import heapq
-from collections import defaultdict
+from array import array
+from collections import OrderedDict, defaultdict, deque
 from dataclasses import dataclass
-from math import inf
-from typing import Iterator
+from enum import Enum, auto
+from functools import partial
+from math import ceil, inf, sqrt
+from time import perf_counter_ns
+from typing import Callable, Iterator
 
 from pyglet.math import Vec2
 
@@ -10,6 +14,16 @@ from .constants import CHARACTER_LAYER
 from .physics import PhysicsWorld, Rectangle
 
 
+def perimeter(x: int, y: int, radius: int) -> Iterator[tuple[int, int]]:
+    # The 8 * radius cells of the square ring around (x, y)
+    for dx in range(-radius, radius + 1):
+        yield x + dx, y - radius
+        yield x + dx, y + radius
+    for dy in range(-radius + 1, radius):
+        yield x - radius, y + dy
+        yield x + radius, y + dy
+
+
 @dataclass(unsafe_hash=True)
 class Cell:
     rectangle: Rectangle
@@ -17,15 +31,46 @@ class Cell:
 
 
 class Grid:
-    def __init__(self, world: PhysicsWorld, radius: float):
+    def __init__(
+        self,
+        world: PhysicsWorld,
+        radius: float,
+        max_clearance: int = 32,
+        build: bool = True,
+    ):
         self.world = world
         self.radius = radius
+        # Cell (0, 0) sits at the world's minimum corner, so the grid covers
+        # exactly the world and nothing outside it
+        self.origin = world.boundary.min
+        self.max_clearance = min(max_clearance, 255)
+        self.version = 0
+        # Cells changed by each recent version, None when everything changed
+        self.history: deque[tuple[int, list[tuple[int, int]] | None]] = deque(maxlen=64)
         self.grid: list[list[Cell]] = self.create_grid()
-        self.update_collisions()
+        # Chebyshev distance from each cell to the nearest blocked or
+        # out-of-bounds cell, capped at max_clearance. Blocked cells are 0.
+        self.clearance = array("B", bytes(self.width * self.height))
+        # Connected region of each free cell, 0 for blocked cells
+        self.labels = array("I", bytes(4 * self.width * self.height))
+        self.next_label = 1
+        if build:
+            self.update_collisions()
 
     def __getitem__(self, key):
         return self.grid[key]
 
+    @property
+    def width(self) -> int:
+        return len(self.grid)
+
+    @property
+    def height(self) -> int:
+        return len(self.grid[0]) if self.grid else 0
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
     def create_grid(self) -> list[list[Cell]]:
         num_x_cells = int(
             (self.world.boundary.max.x - self.world.boundary.min.x) // (self.radius * 2)
@@ -33,17 +78,13 @@ class Grid:
         num_y_cells = int(
             (self.world.boundary.max.y - self.world.boundary.min.y) // (self.radius * 2)
         )
+        cell_size = self.radius * 2
         grid = []
         for x in range(num_x_cells):
             line = []
             for y in range(num_y_cells):
-                rect = Rectangle(
-                    Vec2(x * (self.radius * 2), y * (self.radius * 2)),
-                    Vec2(
-                        x * (self.radius * 2) + (self.radius * 2),
-                        y * (self.radius * 2) + (self.radius * 2),
-                    ),
-                )
+                corner = self.origin + Vec2(x * cell_size, y * cell_size)
+                rect = Rectangle(corner, corner + Vec2(cell_size, cell_size))
                 cell = Cell(rect)
                 line.append(cell)
             grid.append(line)
@@ -56,10 +97,283 @@ class Grid:
                 cell.colliding = self.world.is_colliding_with(
                     cell.rectangle, CHARACTER_LAYER
                 )
+        self.update_clearance(0, 0, self.width - 1, self.height - 1)
+        self.update_labels()
+        self.version += 1
+        self.history.append((self.version, None))
+
+    def restore(
+        self,
+        occupancy: bytes | memoryview,
+        clearance: bytes | memoryview,
+        labels: bytes | memoryview,
+        next_label: int,
+    ):
+        for x, line in enumerate(self.grid):
+            for y, cell in enumerate(line):
+                cell.colliding = bool(occupancy[x * self.height + y])
+        self.clearance = array("B")
+        self.clearance.frombytes(clearance)
+        self.labels = array("I")
+        self.labels.frombytes(labels)
+        self.next_label = next_label
+        self.version += 1
+        self.history.append((self.version, None))
+
+    def update_area(self, area: Rectangle) -> list[tuple[int, int]]:
+        area_min_x, area_min_y = self.coord_from_position(area.min)
+        area_max_x, area_max_y = self.coord_from_position(area.max)
+        min_x = max(0, area_min_x)
+        min_y = max(0, area_min_y)
+        max_x = min(self.width - 1, area_max_x)
+        max_y = min(self.height - 1, area_max_y)
+
+        changed = []
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                cell = self.grid[x][y]
+                colliding = self.world.is_colliding_with(
+                    cell.rectangle, CHARACTER_LAYER
+                )
+                if colliding != cell.colliding:
+                    cell.colliding = colliding
+                    changed.append((x, y))
+
+        if changed:
+            # Cells further than max_clearance from a change keep their value
+            reach = self.max_clearance
+            self.update_clearance(
+                max(0, min(x for x, _ in changed) - reach),
+                max(0, min(y for _, y in changed) - reach),
+                min(self.width - 1, max(x for x, _ in changed) + reach),
+                min(self.height - 1, max(y for _, y in changed) + reach),
+            )
+            self.update_labels(changed)
+            self.version += 1
+            self.history.append((self.version, changed))
+
+        return changed
+
+    def changes_since(self, version: int) -> list[tuple[int, int]] | None:
+        if version == self.version:
+            return []
+        if not self.history or self.history[0][0] > version + 1:
+            return None
+
+        changes = []
+        for changed_version, changed in self.history:
+            if changed_version <= version:
+                continue
+            if changed is None:
+                return None
+            changes += changed
+
+        return changes
+
+    def update_clearance(self, min_x: int, min_y: int, max_x: int, max_y: int):
+        # Two pass chamfer distance transform over the window. Cells outside
+        # the window are read as they are, out-of-bounds cells count as blocked.
+        height = self.height
+        clearance = self.clearance
+        cap = self.max_clearance
+
+        def value(x: int, y: int) -> int:
+            if 0 <= x < self.width and 0 <= y < height:
+                return clearance[x * height + y]
+            return 0
+
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                if self.grid[x][y].colliding:
+                    clearance[x * height + y] = 0
+                    continue
+                nearest = min(
+                    value(x - 1, y - 1),
+                    value(x - 1, y),
+                    value(x - 1, y + 1),
+                    value(x, y - 1),
+                )
+                clearance[x * height + y] = min(cap, nearest + 1)
+
+        for x in range(max_x, min_x - 1, -1):
+            for y in range(max_y, min_y - 1, -1):
+                index = x * height + y
+                if clearance[index] == 0:
+                    continue
+                nearest = min(
+                    value(x + 1, y + 1),
+                    value(x + 1, y),
+                    value(x + 1, y - 1),
+                    value(x, y + 1),
+                )
+                clearance[index] = min(clearance[index], nearest + 1)
+
+    def update_labels(self, changed: list[tuple[int, int]] | None = None):
+        labels = self.labels
+        height = self.height
+        if changed is None:
+            seeds = [(x, y) for x in range(self.width) for y in range(height)]
+            for i in range(len(labels)):
+                labels[i] = 0
+        else:
+            # Flood from every changed cell and its neighbours so that merged
+            # regions share a label and split regions get their own
+            seeds = []
+            for x, y in changed:
+                labels[x * height + y] = 0
+                seeds += [
+                    (nx, ny)
+                    for nx in range(max(0, x - 1), min(self.width, x + 2))
+                    for ny in range(max(0, y - 1), min(height, y + 2))
+                ]
+
+        relabelled = set()
+        for seed in seeds:
+            x, y = seed
+            if seed in relabelled or self.grid[x][y].colliding:
+                continue
+            label = self.next_label
+            self.next_label += 1
+            relabelled.add(seed)
+            labels[x * height + y] = label
+            frontier = [seed]
+            while frontier:
+                x, y = frontier.pop()
+                for nx in range(max(0, x - 1), min(self.width, x + 2)):
+                    for ny in range(max(0, y - 1), min(height, y + 2)):
+                        neighbour = (nx, ny)
+                        if neighbour in relabelled or self.grid[nx][ny].colliding:
+                            continue
+                        relabelled.add(neighbour)
+                        labels[nx * height + ny] = label
+                        frontier.append(neighbour)
+
+    def label(self, x: int, y: int) -> int:
+        if not self.in_bounds(x, y):
+            return 0
+
+        return self.labels[x * self.height + y]
+
+    def reachable(self, start: tuple[int, int], goal: tuple[int, int]) -> bool:
+        # Searches may start inside a blocked cell, those are not rejected here
+        start_label = self.label(*start)
+        if start_label == 0:
+            return self.label(*goal) != 0 or start == goal
+
+        return start_label == self.label(*goal)
+
+    def snap_goal(
+        self, start: tuple[int, int], goal: tuple[int, int], clearance: int = 0
+    ) -> tuple[int, int] | None:
+        if self.reachable(start, goal) and self.is_clear(*goal, clearance):
+            return goal
+        if not (label := self.label(*start)):
+            return None
+
+        # Grow square rings around the goal until one holds a cell in the
+        # start's region, then take the closest of those
+        goal_x, goal_y = goal
+        for radius in range(1, max(self.width, self.height)):
+            ring = [
+                (x, y)
+                for x, y in perimeter(goal_x, goal_y, radius)
+                if self.label(x, y) == label and self.is_clear(x, y, clearance)
+            ]
+            if ring:
+                return min(
+                    ring, key=lambda c: ((c[0] - goal_x) ** 2 + (c[1] - goal_y) ** 2, c)
+                )
+
+        return None
+
+    def spread_goals(
+        self, goal: tuple[int, int], count: int, spacing: int, clearance: int = 0
+    ) -> list[tuple[int, int]]:
+        # Breadth first from the goal, taking cells far enough from the ones
+        # already taken that agents parked on them do not overlap
+        goals: list[tuple[int, int]] = []
+        if not self.is_clear(*goal, clearance):
+            return goals
+
+        visited = {goal}
+        frontier = deque([goal])
+        while frontier and len(goals) < count:
+            x, y = frontier.popleft()
+            if all(max(abs(x - gx), abs(y - gy)) > spacing for gx, gy in goals):
+                goals.append((x, y))
+            for nx in range(max(0, x - 1), min(self.width, x + 2)):
+                for ny in range(max(0, y - 1), min(self.height, y + 2)):
+                    if (nx, ny) in visited or not self.is_clear(nx, ny, clearance):
+                        continue
+                    visited.add((nx, ny))
+                    frontier.append((nx, ny))
+
+        return goals
+
+    def occupancy(self) -> bytearray:
+        occupancy = bytearray(self.width * self.height)
+        for x, line in enumerate(self.grid):
+            for y, cell in enumerate(line):
+                occupancy[x * self.height + y] = cell.colliding
+
+        return occupancy
+
+    def clearance_for_size(self, size: float) -> int:
+        # Cells needed either side of the centre cell to fit a body of this size
+        return max(0, ceil((size / 2 - self.radius) / (self.radius * 2)))
+
+    def is_clear(self, x: int, y: int, clearance: int = 0) -> bool:
+        if not self.in_bounds(x, y):
+            return False
+        if clearance < self.max_clearance:
+            return self.clearance[x * self.height + y] > clearance
+
+        for nx in range(x - clearance, x + clearance + 1):
+            for ny in range(y - clearance, y + clearance + 1):
+                if not self.in_bounds(nx, ny) or self.grid[nx][ny].colliding:
+                    return False
+
+        return True
+
+    def line_of_sight(
+        self, start: tuple[int, int], end: tuple[int, int], clearance: int = 0
+    ) -> bool:
+        # Supercover traversal between cell centres. When the line passes
+        # exactly through a corner both cells touching it are checked.
+        x, y = start
+        dx, dy = end[0] - x, end[1] - y
+        nx, ny = abs(dx), abs(dy)
+        sx, sy = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+
+        if not self.is_clear(x, y, clearance):
+            return False
+
+        ix = iy = 0
+        while ix < nx or iy < ny:
+            decision = (1 + 2 * ix) * ny - (1 + 2 * iy) * nx
+            if decision == 0:
+                if not self.is_clear(x + sx, y, clearance) or not self.is_clear(
+                    x, y + sy, clearance
+                ):
+                    return False
+                x += sx
+                y += sy
+                ix += 1
+                iy += 1
+            elif decision < 0:
+                x += sx
+                ix += 1
+            else:
+                y += sy
+                iy += 1
+            if not self.is_clear(x, y, clearance):
+                return False
+
+        return True
 
     def coord_from_position(self, position: Vec2) -> tuple[int, int]:
-        x = int(position.x // (self.radius * 2))
-        y = int(position.y // (self.radius * 2))
+        x = int((position.x - self.origin.x) // (self.radius * 2))
+        y = int((position.y - self.origin.y) // (self.radius * 2))
 
         return x, y
 
@@ -72,63 +386,810 @@ class Grid:
         return self.grid[x][y]
 
 
+class PathMode(Enum):
+    AStar = auto()
+    FlowField = auto()
+    Queued = auto()
+    Async = auto()
+    Incremental = auto()
+    Cooperative = auto()
+
+
+class GridSearch:
+    # A* over an 8-connected grid of coordinates, stepped so a search can be
+    # spread over several frames. Ties go to the cell pushed first, so a
+    # search always finds the same path.
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        cell_size: float,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        passable: Callable[[int, int], bool],
+    ):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.start_coord = start
+        self.goal_coord = goal
+        self.passable = passable
+        self.restart()
+
+    def restart(self):
+        self.open_set: list[tuple[float, int, tuple[int, int]]] = [
+            (0, 0, self.start_coord)
+        ]
+        self.g_score: dict[tuple[int, int], int] = {self.start_coord: 0}
+        self.came_from: dict[tuple[int, int], tuple[int, int]] = {}
+        self.pushed = 0
+        self.done = False
+        self.path: list | None = None
+        self.expanded = 0
+
+    def finish(self, path: list | None):
+        self.open_set = []
+        self.done = True
+        self.path = path
+
+    def to_path(self, coords: list[tuple[int, int]]) -> list:
+        return coords
+
+    def step(self):
+        if not self.open_set:
+            self.finish(None)
+            return
+
+        _, _, current = heapq.heappop(self.open_set)
+        self.expanded += 1
+
+        # Goal reached, reconstruct path
+        if current == self.goal_coord:
+            path = []
+            while current in self.came_from:
+                path.append(current)
+                current = self.came_from[current]
+            path.append(self.start_coord)
+            self.finish(self.to_path(list(reversed(path))))
+            return
+
+        x, y = current
+        goal_x, goal_y = self.goal_coord
+        cost = self.g_score[current] + 1
+        for nx in range(max(0, x - 1), min(self.width, x + 2)):
+            for ny in range(max(0, y - 1), min(self.height, y + 2)):
+                neighbour = (nx, ny)
+                if neighbour in self.g_score or not self.passable(nx, ny):
+                    continue
+                self.came_from[neighbour] = current
+                self.g_score[neighbour] = cost
+                self.pushed += 1
+                heuristic = self.cell_size * (abs(nx - goal_x) + abs(ny - goal_y))
+                heapq.heappush(
+                    self.open_set, (cost + heuristic, self.pushed, neighbour)
+                )
+
+    def run(
+        self, deadline: int | None = None, max_expansions: int | None = None
+    ) -> bool:
+        steps = 0
+        stop = None if max_expansions is None else self.expanded + max_expansions
+        while not self.done and self.expanded != stop:
+            self.step()
+            steps += 1
+            # Checking the clock is not free, only do it every few expansions
+            if deadline is not None and steps % 16 == 0:
+                if perf_counter_ns() >= deadline:
+                    break
+
+        return self.done
+
+
+def search_clearance(
+    clearance_map: bytes | memoryview,
+    width: int,
+    height: int,
+    cell_size: float,
+    start: tuple[int, int],
+    goal: tuple[int, int],
+    clearance: int = 0,
+) -> list[tuple[int, int]] | None:
+    # Same search as PathSearch, but over a flat copy of Grid.clearance so it
+    # can run somewhere the Grid and PhysicsWorld are not available
+    def passable(x: int, y: int) -> bool:
+        return clearance_map[x * height + y] > clearance
+
+    search = GridSearch(width, height, cell_size, start, goal, passable)
+    search.run()
+
+    return search.path
+
+
+class FlowField:
+    def __init__(self, grid: Grid, goal: tuple[int, int], clearance: int = 0):
+        self.grid = grid
+        self.goal = goal
+        self.clearance = clearance
+        self.version = grid.version
+        self.width = grid.width
+        self.height = grid.height
+        self.costs: list[float] = [inf] * (self.width * self.height)
+        self.directions: list[Vec2 | None] = [None] * (self.width * self.height)
+        self.integrate()
+
+    def integrate(self):
+        goal_x, goal_y = self.goal
+        goal_index = goal_x * self.height + goal_y
+        self.costs[goal_index] = 0.0
+        open_set = [(0.0, goal_index)]
+
+        while open_set:
+            cost, index = heapq.heappop(open_set)
+            if cost > self.costs[index]:
+                continue
+            x, y = divmod(index, self.height)
+            for nx in range(max(0, x - 1), min(self.width, x + 2)):
+                for ny in range(max(0, y - 1), min(self.height, y + 2)):
+                    if not self.grid.is_clear(nx, ny, self.clearance):
+                        continue
+                    step = 1.0 if nx == x or ny == y else sqrt(2)
+                    neighbour = nx * self.height + ny
+                    if cost + step < self.costs[neighbour]:
+                        self.costs[neighbour] = cost + step
+                        heapq.heappush(open_set, (cost + step, neighbour))
+
+        # Every reached cell points at its cheapest neighbour
+        for index, cost in enumerate(self.costs):
+            if cost == inf:
+                continue
+            if index == goal_index:
+                self.directions[index] = Vec2()
+                continue
+            x, y = divmod(index, self.height)
+            best, best_cost = index, cost
+            for nx in range(max(0, x - 1), min(self.width, x + 2)):
+                for ny in range(max(0, y - 1), min(self.height, y + 2)):
+                    neighbour = nx * self.height + ny
+                    if self.costs[neighbour] < best_cost:
+                        best, best_cost = neighbour, self.costs[neighbour]
+            bx, by = divmod(best, self.height)
+            self.directions[index] = Vec2(bx - x, by - y).normalize()
+
+    def direction(self, position: Vec2) -> Vec2 | None:
+        x, y = self.grid.coord_from_position(position)
+        if not self.grid.in_bounds(x, y):
+            return None
+
+        return self.directions[x * self.height + y]
+
+
+class DStarLite:
+    # Moving Target D* Lite. The search runs forward from the agent, so a
+    # target that moves only shifts the heuristic, which km makes up for,
+    # and the search tree is kept. When the agent moves, the tree is rooted
+    # at its new cell: the part reached through that cell keeps its costs
+    # and only the rest is searched again.
+    def __init__(
+        self,
+        grid: Grid,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        clearance: int = 0,
+    ):
+        self.grid = grid
+        self.clearance = clearance
+        self.start = start
+        self.goal = goal
+        self.expanded = 0
+        self.reset()
+
+    def reset(self):
+        self.version = self.grid.version
+        self.km = 0.0
+        # Costs from the start, plus a constant that grows as the start moves
+        self.g: dict[tuple[int, int], float] = {}
+        self.rhs: dict[tuple[int, int], float] = {self.start: 0.0}
+        # The neighbour each cell's rhs came from, so the tree under a cell
+        # can be found when the start moves onto it
+        self.parent: dict[tuple[int, int], tuple[int, int]] = {}
+        self.open_set: list[tuple[tuple[float, float], tuple[int, int]]] = []
+        self.open_keys: dict[tuple[int, int], tuple[float, float]] = {}
+        self.push(self.start)
+
+    @property
+    def cost_to_goal(self) -> float:
+        return self.g.get(self.goal, inf) - self.rhs[self.start]
+
+    def heuristic(self, a: tuple[int, int], b: tuple[int, int]) -> float:
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return max(dx, dy) + (sqrt(2) - 1) * min(dx, dy)
+
+    def neighbours(self, cell: tuple[int, int]) -> Iterator[tuple[int, int]]:
+        x, y = cell
+        for nx in range(max(0, x - 1), min(self.grid.width, x + 2)):
+            for ny in range(max(0, y - 1), min(self.grid.height, y + 2)):
+                if nx != x or ny != y:
+                    yield nx, ny
+
+    def cost(self, a: tuple[int, int], b: tuple[int, int]) -> float:
+        # Only entering a cell is checked, so an agent pushed into a wall can
+        # still plan its way out
+        if not self.grid.is_clear(*b, self.clearance):
+            return inf
+
+        return 1.0 if a[0] == b[0] or a[1] == b[1] else sqrt(2)
+
+    def key(self, cell: tuple[int, int]) -> tuple[float, float]:
+        best = min(self.g.get(cell, inf), self.rhs.get(cell, inf))
+        return best + self.heuristic(cell, self.goal) + self.km, best
+
+    def push(self, cell: tuple[int, int]):
+        key = self.key(cell)
+        self.open_keys[cell] = key
+        heapq.heappush(self.open_set, (key, cell))
+
+    def update_vertex(self, cell: tuple[int, int]):
+        if cell != self.start:
+            best, parent = inf, None
+            # Every way in costs the same to check, entering this cell
+            if self.grid.is_clear(*cell, self.clearance):
+                x, y = cell
+                for neighbour in self.neighbours(cell):
+                    cost = self.g.get(neighbour, inf)
+                    cost += 1.0 if neighbour[0] == x or neighbour[1] == y else sqrt(2)
+                    if cost < best:
+                        best, parent = cost, neighbour
+            self.rhs[cell] = best
+            if parent is None:
+                self.parent.pop(cell, None)
+            else:
+                self.parent[cell] = parent
+        self.open_keys.pop(cell, None)
+        if self.g.get(cell, inf) != self.rhs.get(cell, inf):
+            self.push(cell)
+
+    def top(self) -> tuple[tuple[float, float], tuple[int, int]] | None:
+        # Entries are removed lazily, skip any that were updated or dropped
+        while self.open_set:
+            key, cell = self.open_set[0]
+            if self.open_keys.get(cell) == key:
+                return key, cell
+            heapq.heappop(self.open_set)
+
+        return None
+
+    def compute_shortest_path(self):
+        while (top := self.top()) and (
+            top[0] < self.key(self.goal)
+            or self.rhs.get(self.goal, inf) != self.g.get(self.goal, inf)
+        ):
+            old_key, cell = top
+            self.expanded += 1
+            if old_key < (new_key := self.key(cell)):
+                self.open_keys[cell] = new_key
+                heapq.heappush(self.open_set, (new_key, cell))
+            elif self.g.get(cell, inf) > self.rhs.get(cell, inf):
+                self.g[cell] = self.rhs[cell]
+                del self.open_keys[cell]
+                for neighbour in self.neighbours(cell):
+                    self.update_vertex(neighbour)
+            else:
+                self.g[cell] = inf
+                self.update_vertex(cell)
+                for neighbour in self.neighbours(cell):
+                    self.update_vertex(neighbour)
+
+    def subtree(self, root: tuple[int, int]) -> set[tuple[int, int]]:
+        children = defaultdict(list)
+        for cell, parent in self.parent.items():
+            children[parent].append(cell)
+
+        cells = {root}
+        frontier = [root]
+        while frontier:
+            for child in children[frontier.pop()]:
+                if child not in cells:
+                    cells.add(child)
+                    frontier.append(child)
+
+        return cells
+
+    def move_to(self, cell: tuple[int, int]):
+        if cell == self.start:
+            return
+        if (root := min(self.g.get(cell, inf), self.rhs.get(cell, inf))) == inf:
+            # Somewhere the search never reached, nothing to keep
+            self.start = cell
+            self.reset()
+            return
+
+        # Costs in the new start's subtree are still right, relative to its
+        # own. It keeps its cost as the root's, so those need no change.
+        self.start = cell
+        self.rhs[cell] = root
+        self.parent.pop(cell, None)
+        kept = self.subtree(cell)
+        dropped = [c for c in self.g.keys() | self.rhs.keys() if c not in kept]
+        for c in dropped:
+            self.g.pop(c, None)
+            self.rhs.pop(c, None)
+            self.parent.pop(c, None)
+            self.open_keys.pop(c, None)
+        # Dropped cells next to the subtree are the new fringe
+        for c in dropped:
+            self.update_vertex(c)
+        self.update_vertex(cell)
+
+    def retarget(self, goal: tuple[int, int]):
+        if goal != self.goal:
+            # Queued keys stay lower bounds, the heuristic of any cell drops
+            # by at most the distance the goal moved
+            self.km += self.heuristic(self.goal, goal)
+            self.goal = goal
+
+    def sync(self):
+        changes = self.grid.changes_since(self.version)
+        if changes is None:
+            self.reset()
+            return
+
+        self.version = self.grid.version
+        # A changed cell alters whether cells within the clearance fit the
+        # agent, and so the cost of entering them from their neighbours
+        reach = self.clearance + 1
+        touched = set()
+        for x, y in changes:
+            touched.update(
+                (nx, ny)
+                for nx in range(max(0, x - reach), min(self.grid.width, x + reach + 1))
+                for ny in range(max(0, y - reach), min(self.grid.height, y + reach + 1))
+            )
+        for cell in touched:
+            self.update_vertex(cell)
+
+    def coords(self) -> list[tuple[int, int]] | None:
+        if self.g.get(self.goal, inf) == inf:
+            return None
+
+        # Walk back from the goal along the cheapest way each cell is entered
+        coords = [self.goal]
+        current = self.goal
+        while current != self.start and len(coords) <= len(self.g):
+            current = min(
+                self.neighbours(current),
+                key=lambda cell: self.g.get(cell, inf) + self.cost(cell, current),
+            )
+            coords.append(current)
+
+        return list(reversed(coords))
+
+    def next_cell(self) -> tuple[int, int] | None:
+        if self.start == self.goal or not (coords := self.coords()):
+            return None
+
+        return coords[1]
+
+    def path(self) -> list[Cell] | None:
+        if not (coords := self.coords()):
+            return None
+
+        return [self.grid[x][y] for x, y in coords]
+
+
+class ReservationTable:
+    def __init__(self, separation: int = 0):
+        # Cells two agents' centres must keep between them, 0 for distinct cells
+        self.separation = separation
+        self.paths: list[list[tuple[int, int]]] = []
+
+    def reserve(self, path: list[tuple[int, int]]):
+        self.paths.append(path)
+
+    def position(self, path: list[tuple[int, int]], time: int) -> tuple[int, int]:
+        # Agents stay parked on their last cell once they arrive
+        return path[min(time, len(path) - 1)]
+
+    def conflicts(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        return max(abs(a[0] - b[0]), abs(a[1] - b[1])) <= self.separation
+
+    def is_free(self, cell: tuple[int, int], time: int) -> bool:
+        return not any(
+            self.conflicts(cell, self.position(path, time)) for path in self.paths
+        )
+
+    def can_move(self, start: tuple[int, int], end: tuple[int, int], time: int) -> bool:
+        if not self.is_free(end, time + 1):
+            return False
+        # Moving takes the whole step, so the cell entered must already be
+        # empty when it starts, not just once it ends
+        if end != start and not self.is_free(end, time):
+            return False
+
+        # Two agents swapping cells pass through each other
+        return not any(
+            self.position(path, time) == end and self.position(path, time + 1) == start
+            for path in self.paths
+        )
+
+    def can_park(self, cell: tuple[int, int], time: int) -> bool:
+        return all(
+            not self.conflicts(cell, self.position(path, later))
+            for path in self.paths
+            for later in range(time, len(path))
+        )
+
+
+PathKey = tuple[tuple[int, int], tuple[int, int], int]
+
+
+class CachedPath:
+    def __init__(self, path: list[Cell], coords: list[tuple[int, int]]):
+        self.path = path
+        self.index = {coord: i for i, coord in enumerate(coords)}
+
+
+class PathSearch(GridSearch):
+    def __init__(
+        self, pathfinding: "Pathfinding", start: Cell, goal: Cell, clearance: int = 0
+    ):
+        self.pathfinding = pathfinding
+        self.start = start
+        self.goal = goal
+        self.clearance = clearance
+        grid = pathfinding.grid
+        super().__init__(
+            grid.width,
+            grid.height,
+            grid.radius * 2,
+            grid.coord_from_cell(start),
+            grid.coord_from_cell(goal),
+            partial(grid.is_clear, clearance=clearance),
+        )
+
+    def restart(self):
+        self.version = self.pathfinding.grid.version
+        super().restart()
+
+    def to_path(self, coords: list[tuple[int, int]]) -> list[Cell]:
+        grid = self.pathfinding.grid
+        return [grid[x][y] for x, y in coords]
+
+
+class PathRequest:
+    def __init__(self, key: PathKey, search: PathSearch | None):
+        self.key = key
+        self.search = search
+        self.waiters: dict[int, Vec2] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.search is None or self.search.done
+
+    @property
+    def path(self) -> list[Cell] | None:
+        return self.search.path if self.search else None
+
+
 class Pathfinding:
-    def __init__(self, grid: Grid):
+    def __init__(
+        self,
+        grid: Grid,
+        cache_size: int = 128,
+        flow_field_cache_size: int = 8,
+        smoothing: bool = False,
+    ):
         self.grid = grid
+        self.smoothing = smoothing
+        self.cache_size = cache_size
+        self.flow_field_cache_size = flow_field_cache_size
+        self.flow_fields: OrderedDict[tuple[tuple[int, int], int, int], FlowField] = (
+            OrderedDict()
+        )
+        self.cache: OrderedDict[tuple[PathKey, int], CachedPath] = OrderedDict()
+        self.cache_version = grid.version
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.unreachable = 0
+        # Nodes expanded by every search run to completion
+        self.expanded = 0
+        self.queue: deque[PathRequest] = deque()
+        self.requests: dict[PathKey, PathRequest] = {}
+        self.finished: list[PathRequest] = []
+
+    @property
+    def cache_hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.cache_version = self.grid.version
+
+    def path_key(self, start: Vec2, end: Vec2, size: float = 0) -> PathKey:
+        return (
+            self.grid.coord_from_position(start),
+            self.grid.coord_from_position(end),
+            self.grid.clearance_for_size(size),
+        )
+
+    def resolve_goal(self, path_key: PathKey, snap: bool = False) -> PathKey | None:
+        start, goal, clearance = path_key
+        if self.grid.reachable(start, goal):
+            return path_key
+        self.unreachable += 1
+        if snap and (snapped := self.grid.snap_goal(start, goal, clearance)):
+            return start, snapped, clearance
+
+        return None
+
+    def goal_position(self, path: list[Cell], end: Vec2) -> Vec2:
+        # A snapped path ends short of where it was asked to go
+        if self.grid.coord_from_cell(path[-1]) == self.grid.coord_from_position(end):
+            return end
 
-    def neighbours(self, cell: Cell) -> Iterator[Cell]:
+        return path[-1].rectangle.center
+
+    def cached_path(self, path_key: PathKey) -> list[Cell] | None:
+        if self.cache_version != self.grid.version:
+            self.clear_cache()
+
+        key = (path_key, self.grid.version)
+        if cached := self.cache.get(key):
+            self.cache.move_to_end(key)
+            return list(cached.path)
+
+        # Any cached path to the same goal that passes through the start cell
+        # can serve the request with its remaining suffix
+        start, goal, clearance = path_key
+        for key, cached in reversed(self.cache.items()):
+            if key[0][1:] != (goal, clearance):
+                continue
+            if (index := cached.index.get(start)) is not None:
+                self.cache.move_to_end(key)
+                return cached.path[index:]
+
+        return None
+
+    def cache_path(self, path_key: PathKey, path: list[Cell]):
+        if self.cache_size <= 0:
+            return
+
+        coords = [self.grid.coord_from_cell(cell) for cell in path]
+        self.cache[(path_key, self.grid.version)] = CachedPath(list(path), coords)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def planner(self, start: Vec2, end: Vec2, size: float = 0) -> DStarLite | None:
+        if not (key := self.resolve_goal(self.path_key(start, end, size), snap=True)):
+            return None
+
+        planner = DStarLite(self.grid, *key)
+        planner.compute_shortest_path()
+
+        return planner
+
+    def space_time_search(
+        self,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        table: ReservationTable,
+        clearance: int = 0,
+        max_expansions: int = 20000,
+    ) -> list[tuple[int, int]] | None:
+        # A* over (cell, time step). Waiting in place is a move, and every
+        # move takes one step, so Chebyshev distance is the heuristic.
+        def heuristic(cell: tuple[int, int]) -> int:
+            return max(abs(cell[0] - goal[0]), abs(cell[1] - goal[1]))
+
+        open_set = [(heuristic(start), 0, start)]
+        came_from: dict[tuple[tuple[int, int], int], tuple[int, int]] = {}
+        closed = set()
+        expanded = 0
+
+        while open_set and expanded < max_expansions:
+            _, time, current = heapq.heappop(open_set)
+            if (current, time) in closed:
+                continue
+            closed.add((current, time))
+            expanded += 1
+
+            if current == goal and table.can_park(current, time):
+                path = [current]
+                while time > 0:
+                    current = came_from[(current, time)]
+                    time -= 1
+                    path.append(current)
+                return list(reversed(path))
+
+            x, y = current
+            for nx in range(max(0, x - 1), min(self.grid.width, x + 2)):
+                for ny in range(max(0, y - 1), min(self.grid.height, y + 2)):
+                    neighbour = (nx, ny)
+                    if (neighbour, time + 1) in closed:
+                        continue
+                    if neighbour != current and not self.grid.is_clear(
+                        nx, ny, clearance
+                    ):
+                        continue
+                    if not table.can_move(current, neighbour, time):
+                        continue
+                    came_from[(neighbour, time + 1)] = current
+                    heapq.heappush(
+                        open_set, (time + 1 + heuristic(neighbour), time + 1, neighbour)
+                    )
+
+        return None
+
+    def find_group_paths(
+        self, starts: list[Vec2], end: Vec2, size: float = 0
+    ) -> list[list[Cell] | None]:
+        clearance = self.grid.clearance_for_size(size)
+        coords = [self.grid.coord_from_position(start) for start in starts]
+        paths: list[list[Cell] | None] = [None] * len(starts)
+        if not coords:
+            return paths
+
+        key = self.resolve_goal(
+            (coords[0], self.grid.coord_from_position(end), clearance), snap=True
+        )
+        if not key:
+            return paths
+
+        # Closest agents take the goal cells nearest the destination
+        table = ReservationTable(separation=clearance * 2)
+        goals = self.grid.spread_goals(key[1], len(starts), table.separation, clearance)
+        order = sorted(range(len(starts)), key=lambda i: starts[i].distance(end))
+        for i, goal in zip(order, goals):
+            if not self.grid.reachable(coords[i], goal):
+                continue
+            if path := self.space_time_search(coords[i], goal, table, clearance):
+                table.reserve(path)
+                paths[i] = [self.grid[x][y] for x, y in path]
+
+        return paths
+
+    def flow_field(self, end: Vec2, size: float = 0) -> FlowField | None:
+        goal = self.grid.coord_from_position(end)
+        clearance = self.grid.clearance_for_size(size)
+        if not self.grid.is_clear(*goal, clearance):
+            return None
+
+        key = (goal, clearance, self.grid.version)
+        if field := self.flow_fields.get(key):
+            self.flow_fields.move_to_end(key)
+            return field
+
+        for stale in [k for k in self.flow_fields if k[2] != self.grid.version]:
+            del self.flow_fields[stale]
+
+        field = FlowField(self.grid, goal, clearance)
+        self.flow_fields[key] = field
+        while len(self.flow_fields) > self.flow_field_cache_size:
+            self.flow_fields.popitem(last=False)
+
+        return field
+
+    def neighbours(self, cell: Cell, clearance: int = 0) -> Iterator[Cell]:
         x, y = self.grid.coord_from_cell(cell)
-        for nx in range(max(0, x - 1), min(len(self.grid.grid), x + 2)):
-            for ny in range(max(0, y - 1), min(len(self.grid[nx]), y + 2)):
+        for nx in range(max(0, x - 1), min(self.grid.width, x + 2)):
+            for ny in range(max(0, y - 1), min(self.grid.height, y + 2)):
                 if nx == x and ny == y:
                     continue
-                try:
-                    cell = self.grid[nx][ny]
-                    if not cell.colliding:
-                        yield cell
-                except IndexError:
-                    continue
+                if self.grid.is_clear(nx, ny, clearance):
+                    yield self.grid[nx][ny]
 
-    def heuristic(self, cell: Cell, goal: Cell) -> float:
-        return abs(cell.rectangle.center.x - goal.rectangle.center.x) + abs(
-            cell.rectangle.center.y - goal.rectangle.center.y
-        )
+    def smooth(self, path: list[Cell], clearance: int = 0) -> list[Cell]:
+        if len(path) < 3:
+            return list(path)
+
+        coords = [self.grid.coord_from_cell(cell) for cell in path]
+        smoothed = [path[0]]
+        anchor = coords[0]
+        for i in range(1, len(path) - 1):
+            if not self.grid.line_of_sight(anchor, coords[i + 1], clearance):
+                smoothed.append(path[i])
+                anchor = coords[i]
+        smoothed.append(path[-1])
+
+        return smoothed
+
+    def waypoints(self, path: list[Cell], size: float = 0) -> list[Vec2]:
+        if self.smoothing:
+            path = self.smooth(path, self.grid.clearance_for_size(size))
 
-    def find_path(self, start: Vec2, end: Vec2) -> list[Cell] | None:
-        start_cell = self.grid.cell_from_position(start)
-        goal_cell = self.grid.cell_from_position(end)
-        open_set: list[tuple[int, Cell]] = []
-        heapq.heappush(open_set, (0, id(start_cell), start_cell))
+        return [cell.rectangle.center for cell in path]
 
-        g_score = defaultdict(lambda: inf, {start_cell: 0.0})
-        f_score = defaultdict(
-            lambda: inf, {start_cell: self.heuristic(start_cell, goal_cell)}
+    def find_path(
+        self, start: Vec2, end: Vec2, size: float = 0, snap: bool = False
+    ) -> list[Cell] | None:
+        if not (key := self.resolve_goal(self.path_key(start, end, size), snap)):
+            return None
+        if (path := self.cached_path(key)) is not None:
+            self.cache_hits += 1
+            return path
+        self.cache_misses += 1
+
+        if path := self.search(key):
+            self.cache_path(key, path)
+
+        return path
+
+    def search(self, path_key: PathKey) -> list[Cell] | None:
+        (start_x, start_y), (goal_x, goal_y), clearance = path_key
+        search = PathSearch(
+            self, self.grid[start_x][start_y], self.grid[goal_x][goal_y], clearance
         )
+        search.run()
+        self.expanded += search.expanded
 
-        came_from: dict[Cell, Cell] = {}
+        return search.path
 
-        while open_set:
-            _, _, current = heapq.heappop(open_set)
+    def request_path(
+        self, start: Vec2, end: Vec2, entity: int, size: float = 0, snap: bool = False
+    ) -> PathRequest:
+        requested = self.path_key(start, end, size)
+        if not (key := self.resolve_goal(requested, snap)):
+            request = PathRequest(requested, None)
+            request.waiters[entity] = end
+            self.finished.append(request)
+            return request
 
-            # Goal reached, reconstruct path
-            if current == goal_cell:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start_cell)
-                return list(reversed(path))
+        # Identical requests share one search
+        if request := self.requests.get(key):
+            request.waiters[entity] = end
+            return request
 
-            for neighbour in self.neighbours(current):
-                cost = g_score[current] + 1
-                if neighbour not in g_score:
-                    came_from[neighbour] = current
-                    g_score[neighbour] = cost
-                    f_score[neighbour] = cost + self.heuristic(neighbour, goal_cell)
+        (start_x, start_y), (goal_x, goal_y), clearance = key
+        request = PathRequest(
+            key,
+            PathSearch(
+                self, self.grid[start_x][start_y], self.grid[goal_x][goal_y], clearance
+            ),
+        )
+        request.waiters[entity] = end
+        if (path := self.cached_path(key)) is not None:
+            self.cache_hits += 1
+            request.search.finish(path)
+            self.finished.append(request)
+        else:
+            self.cache_misses += 1
+            self.requests[key] = request
+            self.queue.append(request)
 
-                    if all(neighbour != item[2] for item in open_set):
-                        heapq.heappush(
-                            open_set, (f_score[neighbour], id(neighbour), neighbour)
-                        )
+        return request
 
-        return None
+    def advance(
+        self, budget_us: int, max_expansions: int | None = None
+    ) -> list[PathRequest]:
+        # Counting expansions instead of time delivers paths on the same tick
+        # however fast the machine is, which replays rely on
+        if max_expansions is None:
+            deadline = perf_counter_ns() + budget_us * 1000
+        else:
+            deadline = None
+        remaining = max_expansions
+        finished, self.finished = self.finished, []
+
+        while self.queue:
+            if deadline is not None and perf_counter_ns() >= deadline:
+                break
+            if remaining is not None and remaining <= 0:
+                break
+            request = self.queue[0]
+            if request.search.version != self.grid.version:
+                request.search.restart()
+            expanded = request.search.expanded
+            done = request.search.run(deadline, remaining)
+            if remaining is not None:
+                remaining -= request.search.expanded - expanded
+            if not done:
+                break
+
+            self.queue.popleft()
+            del self.requests[request.key]
+            self.expanded += request.search.expanded
+            if request.path:
+                self.cache_path(request.key, request.path)
+            finished.append(request)
+
+        return finished
@@ -0,0 +1,136 @@
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+
+from loguru import logger
+from pyglet.math import Vec2
+
+from .pathfinding import Cell, Grid, search_clearance
+
+# Clearance segments attached in this worker process, by name. A new grid version is
+# published under a new name, so workers attach once per version instead of receiving
+# the grid with every request.
+_segments: OrderedDict[str, SharedMemory] = OrderedDict()
+_max_segments = 4
+
+
+def _attach(name: str) -> SharedMemory:
+    if segment := _segments.get(name):
+        _segments.move_to_end(name)
+        return segment
+
+    segment = SharedMemory(name)
+    _segments[name] = segment
+    while len(_segments) > _max_segments:
+        _, stale = _segments.popitem(last=False)
+        stale.close()
+
+    return segment
+
+
+def _search(
+    name: str,
+    width: int,
+    height: int,
+    cell_size: float,
+    start: tuple[int, int],
+    goal: tuple[int, int],
+    clearance: int,
+) -> list[tuple[int, int]] | None:
+    segment = _attach(name)
+    clearance_map = segment.buf[: width * height]
+    try:
+        return search_clearance(
+            clearance_map, width, height, cell_size, start, goal, clearance
+        )
+    finally:
+        clearance_map.release()
+
+
+class PathService:
+    def __init__(self, grid: Grid, workers: int = 2):
+        self.grid = grid
+        self.lock = Lock()
+        self.segments: dict[int, SharedMemory] = {}
+        self.pending: defaultdict[int, int] = defaultdict(int)
+        # Publish before the pool starts so workers share our resource tracker
+        self.publish()
+        self.executor = ProcessPoolExecutor(workers)
+
+    def publish(self) -> SharedMemory:
+        version = self.grid.version
+        with self.lock:
+            if segment := self.segments.get(version):
+                return segment
+
+        clearance = self.grid.clearance.tobytes()
+        segment = SharedMemory(create=True, size=max(1, len(clearance)))
+        segment.buf[: len(clearance)] = clearance
+        logger.debug(f"Published grid version {version} as {segment.name}")
+
+        with self.lock:
+            self.segments[version] = segment
+            self._release_stale()
+
+        return segment
+
+    def _release_stale(self):
+        for version in list(self.segments):
+            if version == self.grid.version or self.pending[version]:
+                continue
+            segment = self.segments.pop(version)
+            segment.close()
+            segment.unlink()
+            del self.pending[version]
+
+    def _finished(self, version: int, _: Future):
+        with self.lock:
+            self.pending[version] -= 1
+            self._release_stale()
+
+    def submit(
+        self, start: Vec2, end: Vec2, size: float = 0, snap: bool = False
+    ) -> Future:
+        start_coord = self.grid.coord_from_position(start)
+        goal_coord = self.grid.coord_from_position(end)
+        clearance = self.grid.clearance_for_size(size)
+        if not self.grid.reachable(start_coord, goal_coord):
+            if snap:
+                goal_coord = self.grid.snap_goal(start_coord, goal_coord, clearance)
+            if not snap or goal_coord is None:
+                future = Future()
+                future.set_result(None)
+                return future
+
+        segment = self.publish()
+        version = self.grid.version
+        with self.lock:
+            self.pending[version] += 1
+
+        future = self.executor.submit(
+            _search,
+            segment.name,
+            self.grid.width,
+            self.grid.height,
+            self.grid.radius * 2,
+            start_coord,
+            goal_coord,
+            clearance,
+        )
+        future.add_done_callback(partial(self._finished, version))
+
+        return future
+
+    def cells(self, coords: list[tuple[int, int]]) -> list[Cell]:
+        return [self.grid[x][y] for x, y in coords]
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        with self.lock:
+            for segment in self.segments.values():
+                segment.close()
+                segment.unlink()
+            self.segments.clear()
+            self.pending.clear()
@@ -128,6 +128,9 @@ class Body:
     layer: int = 0b1
     mask: int = 0b1111111111111111
     data: Any = None
+    # Inactive bodies stay in the world but are left out of queries and
+    # collisions, so pooled bodies can be reused without reinserting them
+    active: bool = True
 
     def __hash__(self):
         return hash(id(self))
@@ -194,25 +197,37 @@ class QuadTree:
             self.bodies.append(body)
             return True
 
-    def remove(self, body: Body):
-        self.bodies.remove(body)
-        if self.is_divided:
-            self.bottom_left.remove(body)
-            self.bottom_right.remove(body)
-            self.top_left.remove(body)
-            self.top_right.remove(body)
-
-            if not all(
-                self.bottom_left.bodies,
-                self.bottom_right.bodies,
-                self.top_left.bodies,
-                self.top_right.bodies,
-            ):
+    def remove(self, body: Body) -> bool:
+        # Bodies may have moved since they were inserted, so every node that
+        # could hold one is searched rather than only those containing it
+        for i, other in enumerate(self.bodies):
+            if other is body:
+                del self.bodies[i]
+                removed = True
+                break
+        else:
+            removed = self.is_divided and (
+                self.bottom_left.remove(body)
+                or self.bottom_right.remove(body)
+                or self.top_left.remove(body)
+                or self.top_right.remove(body)
+            )
+
+        if removed and self.is_divided:
+            children = (
+                self.bottom_left,
+                self.bottom_right,
+                self.top_left,
+                self.top_right,
+            )
+            if not any(child.bodies or child.is_divided for child in children):
                 self.bottom_left = self.bottom_right = self.top_left = (
                     self.top_right
                 ) = None
                 self.is_divided = False
 
+        return removed
+
     def subdivide(self):
         left_x = self.boundary.min.x
         middle_x = self.boundary.min.x + (self.boundary.max.x - self.boundary.min.x) / 2
@@ -254,7 +269,11 @@ class QuadTree:
         if not self.boundary.overlaps(area):
             return []
 
-        bodies = [body for body in self.bodies if body.rectangle.overlaps(area)]
+        bodies = [
+            body
+            for body in self.bodies
+            if body.active and body.rectangle.overlaps(area)
+        ]
 
         if self.is_divided:
             bodies += (
@@ -279,6 +298,8 @@ class QuadTree:
         self, point: Point, best_distance: float = inf, closest: Body | None = None
     ) -> tuple[float, Body]:
         for body in self.bodies:
+            if not body.active:
+                continue
             if point.layer & body.mask == 0 and body.layer & point.mask == 0:
                 continue
             distance = point.position.distance(body.rectangle.center)
@@ -295,7 +316,7 @@ class QuadTree:
 
     def collisions(self, parent_bodies: list[Body]) -> list[tuple[Body, Body]]:
         colliding = []
-        bodies = self.bodies + parent_bodies
+        bodies = [body for body in self.bodies if body.active] + parent_bodies
 
         for first_body in bodies:
             for second_body in bodies:
@@ -349,8 +370,8 @@ class PhysicsWorld:
         if not self.root.insert(body):
             raise ValueError("Not within the boundary")
 
-    def remove(self, body: Body):
-        self.root.remove(body)
+    def remove(self, body: Body) -> bool:
+        return self.root.remove(body)
 
     def clear(self):
         self.root = QuadTree(Rectangle(self.min, self.max), self.max_depth)
@@ -400,7 +421,7 @@ class PhysicsWorld:
         for target, collisions in colliding.items():
             self.resolve(target, collisions)
 
-        self.active_collisions = new_collisions
+        self.active_collisions = set(new_collisions)
 
     def query(self, area: Rectangle) -> list[Body]:
         return self.root.query(area)
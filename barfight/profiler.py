@@ -0,0 +1,128 @@
+import csv
+import json
+from collections import deque
+from functools import wraps
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Callable
+
+from pyglet.text import Label
+
+FRAME = "frame"
+
+
+def rank(ordered: list[int], q: float) -> int:
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class Histogram:
+    def __init__(self, window: int = 600):
+        self.samples: deque[int] = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, ns: int):
+        self.samples.append(ns)
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+
+        return rank(sorted(self.samples), q)
+
+    def summary(self) -> dict[str, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+
+        return {
+            "count": self.count,
+            "mean_ms": sum(ordered) / len(ordered) / 1e6,
+            "p50_ms": rank(ordered, 50) / 1e6,
+            "p95_ms": rank(ordered, 95) / 1e6,
+            "p99_ms": rank(ordered, 99) / 1e6,
+            "max_ms": ordered[-1] / 1e6,
+        }
+
+
+class Profiler:
+    def __init__(self, window: int = 600):
+        self.window = window
+        self.histograms: dict[str, Histogram] = {}
+
+    def record(self, name: str, ns: int):
+        if not (histogram := self.histograms.get(name)):
+            histogram = self.histograms[name] = Histogram(self.window)
+        histogram.add(ns)
+
+    def call(self, name: str, func: Callable, *args, **kwargs):
+        started = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(name, perf_counter_ns() - started)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        @wraps(func)
+        def timed(*args, **kwargs):
+            return self.call(name, func, *args, **kwargs)
+
+        return timed
+
+    def percentile(self, name: str, q: float) -> float:
+        if not (histogram := self.histograms.get(name)):
+            return 0.0
+
+        return histogram.percentile(q) / 1e6
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            name: histogram.summary()
+            for name, histogram in sorted(self.histograms.items())
+        }
+
+    def slowest(self, count: int = 5, q: float = 95) -> list[tuple[str, float]]:
+        timings = [
+            (name, histogram.percentile(q) / 1e6)
+            for name, histogram in self.histograms.items()
+            if name != FRAME
+        ]
+        return sorted(timings, key=lambda timing: timing[1], reverse=True)[:count]
+
+    def dump(self, path: Path):
+        stats = self.stats()
+        if path.suffix == ".csv":
+            columns = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+            with path.open("w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["name", *columns])
+                for name, summary in stats.items():
+                    writer.writerow([name, *(summary.get(c, "") for c in columns)])
+        else:
+            path.write_text(json.dumps(stats, indent=2))
+
+
+class ProfilerOverlay:
+    def __init__(self, profiler: Profiler, x: float = 10, y: float = 590):
+        self.profiler = profiler
+        self.label = Label(
+            "",
+            x=x,
+            y=y,
+            width=400,
+            multiline=True,
+            anchor_y="top",
+            font_size=10,
+            color=(255, 255, 0, 255),
+        )
+
+    def update(self, *_):
+        lines = [
+            f"frame p50 {self.profiler.percentile(FRAME, 50):.2f}ms "
+            f"p99 {self.profiler.percentile(FRAME, 99):.2f}ms"
+        ]
+        lines += [f"{name} p95 {ms:.2f}ms" for name, ms in self.profiler.slowest()]
+        self.label.text = "\n".join(lines)
+
+    def draw(self):
+        self.label.draw()
@@ -0,0 +1,195 @@
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter_ns
+from typing import BinaryIO
+
+from loguru import logger
+from pyglet.math import Vec2
+from pyglet.window.key import KeyStateHandler
+from pyglet.window.mouse import MouseStateHandler
+
+from . import ecs, events
+from .events import InputProtocol, PlayerStateProtocol
+from .profiler import Histogram
+from .scenarios import SCENARIOS
+from .simulation import build_headless
+from .systems import InputSystem
+
+# Layout, all little-endian:
+#   header   magic, format version, scenario name length, scenario name
+#   records  a kind byte followed by its values, in the order they happened.
+#            Window input arrives between ticks, a direction record comes
+#            right before the tick it was used in and only when it changed.
+MAGIC = b"BFRP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH")
+KIND = struct.Struct("<B")
+
+TICK = 0
+DIRECTION = 1
+KEY_DOWN = 2
+KEY_UP = 3
+MOUSE_DOWN = 4
+MOUSE_UP = 5
+
+RECORDS = {
+    TICK: struct.Struct("<d"),
+    DIRECTION: struct.Struct("<dd"),
+    KEY_DOWN: struct.Struct("<ii"),
+    KEY_UP: struct.Struct("<ii"),
+    MOUSE_DOWN: struct.Struct("<iiii"),
+    MOUSE_UP: struct.Struct("<iiii"),
+}
+# Path searches expanded per replayed tick. A time budget would deliver paths
+# on different ticks depending on how fast the machine is
+REPLAY_EXPANSIONS = 500
+
+WINDOW_EVENTS = {
+    KEY_DOWN: events.KEY_DOWN_EVENT,
+    KEY_UP: events.KEY_UP_EVENT,
+    MOUSE_DOWN: events.MOUSE_DOWN_EVENT,
+    MOUSE_UP: events.MOUSE_UP_EVENT,
+}
+
+
+@dataclass
+class Recording:
+    scenario: str
+    records: list[tuple[int, tuple]] = field(default_factory=list)
+
+    @property
+    def ticks(self) -> int:
+        return sum(1 for kind, _ in self.records if kind == TICK)
+
+
+class Recorder(ecs.SystemProtocol, InputProtocol, PlayerStateProtocol):
+    # Added with the lowest priority, so each tick is written once every
+    # system has run and the direction InputSystem sent is known
+    def __init__(self, file: BinaryIO, scenario: str):
+        self.file = file
+        self.direction = Vec2()
+        self.recorded = Vec2()
+        name = scenario.encode()
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(name)) + name)
+
+    @classmethod
+    def open(cls, path: Path, scenario: str) -> "Recorder":
+        return cls(path.open("wb"), scenario)
+
+    def write(self, kind: int, *values):
+        self.file.write(KIND.pack(kind) + RECORDS[kind].pack(*values))
+
+    def process(self, dt: float):
+        if self.direction != self.recorded:
+            self.write(DIRECTION, *self.direction)
+            self.recorded = self.direction
+        self.write(TICK, dt)
+        # A crash loses at most the tick in progress
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def on_key_down(self, symbol: int, modifiers: int):
+        self.write(KEY_DOWN, symbol, modifiers)
+
+    def on_key_up(self, symbol: int, modifiers: int):
+        self.write(KEY_UP, symbol, modifiers)
+
+    def on_mouse_down(self, x: int, y: int, button: int, modifiers: int):
+        self.write(MOUSE_DOWN, x, y, button, modifiers)
+
+    def on_mouse_up(self, x: int, y: int, button: int, modifiers: int):
+        self.write(MOUSE_UP, x, y, button, modifiers)
+
+    def on_player_attack(self): ...
+
+    def on_player_direction(self, direction: Vec2):
+        self.direction = direction
+
+
+def load(path: Path) -> Recording:
+    data = path.read_bytes()
+    try:
+        magic, version, length = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Not a recording") from None
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a recording of this version")
+
+    offset = HEADER.size
+    recording = Recording(data[offset : offset + length].decode())
+    offset += length
+    while offset < len(data):
+        (kind,) = KIND.unpack_from(data, offset)
+        if not (record := RECORDS.get(kind)):
+            raise ValueError(f"Unknown record kind {kind} at byte {offset}")
+        offset += KIND.size
+        try:
+            values = record.unpack_from(data, offset)
+        except struct.error:
+            raise ValueError(f"Recording is truncated at byte {offset}") from None
+        offset += record.size
+        recording.records.append((kind, values))
+
+    return recording
+
+
+def run_replay(
+    recording: Recording,
+    columnar: bool = False,
+    max_expansions: int = REPLAY_EXPANSIONS,
+) -> list[int]:
+    build_headless(SCENARIOS[recording.scenario], columnar, max_expansions)
+    # Only for its key handlers, the recorded directions replace its process
+    input_system = InputSystem(KeyStateHandler(), MouseStateHandler())
+    ecs.add_handlers(input_system)
+
+    direction = Vec2()
+    timings = []
+    for kind, values in recording.records:
+        if kind == TICK:
+            (dt,) = values
+            started = perf_counter_ns()
+            ecs.dispatch_event(events.PLAYER_DIRECTION_EVENT, direction)
+            ecs.update(dt)
+            timings.append(perf_counter_ns() - started)
+        elif kind == DIRECTION:
+            direction = Vec2(*values)
+        else:
+            ecs.dispatch_event(WINDOW_EVENTS[kind], *values)
+    ecs.remove_handlers(input_system)
+
+    return timings
+
+
+def summary(timings: list[int]) -> dict[str, float]:
+    histogram = Histogram(len(timings) or 1)
+    for ns in timings:
+        histogram.add(ns)
+
+    return histogram.summary()
+
+
+def compare(current: dict[str, float], baseline: dict[str, float]) -> dict[str, float]:
+    return {
+        name: current[name] / baseline[name]
+        for name in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+        if baseline.get(name)
+    }
+
+
+def log_summary(stats: dict[str, float], ratios: dict[str, float] | None = None):
+    logger.info(
+        "Replayed {} ticks: mean {:.3f}ms p50 {:.3f}ms p95 {:.3f}ms p99 {:.3f}ms "
+        "max {:.3f}ms",
+        stats["count"],
+        stats.get("mean_ms", 0),
+        stats.get("p50_ms", 0),
+        stats.get("p95_ms", 0),
+        stats.get("p99_ms", 0),
+        stats.get("max_ms", 0),
+    )
+    for name, ratio in (ratios or {}).items():
+        logger.info("{} {:.2f}x the baseline", name, ratio)
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from random import Random
+from typing import Callable
+
+from pyglet.math import Vec2
+
+from . import ecs, events
+from .bundles import add_enemy, add_player, add_wall
+from .components import Player, Position
+
+
+@dataclass
+class Scenario:
+    min: Vec2
+    max: Vec2
+    populate: Callable[[bool], None]
+    # Called every tick by the headless runner to stand in for player input
+    tick: Callable[[int], None] | None = None
+
+
+def add_bar(sprites: bool):
+    add_player(Vec2(200, 200), sprites)
+    add_wall(400, 200, 100, 100, sprites)
+    add_wall(500, 200, 100, 100, sprites)
+    add_wall(600, 200, 100, 100, sprites)
+    add_wall(700, 200, 100, 100, sprites)
+    add_wall(800, 200, 100, 100, sprites)
+    add_enemy(200, 300, sprites)
+
+
+def add_crowd(sprites: bool):
+    add_bar(sprites)
+    rng = Random(0)
+    for _ in range(40):
+        add_enemy(rng.uniform(-100, 900), rng.uniform(350, 700), sprites)
+
+
+def chase_player(tick: int):
+    if tick % 120:
+        return
+
+    for _, (_, position) in ecs.get_components(Player, Position):
+        ecs.dispatch_event(
+            events.MOUSE_DOWN_EVENT,
+            int(position.position.x),
+            int(position.position.y),
+            0,
+            0,
+        )
+
+
+SCENARIOS = {
+    "bar": Scenario(Vec2(-200, -200), Vec2(1000, 800), add_bar),
+    "crowd": Scenario(Vec2(-200, -200), Vec2(1000, 800), add_crowd, chase_player),
+}
@@ -0,0 +1,110 @@
+from pathlib import Path
+from time import perf_counter, sleep
+
+from loguru import logger
+from pyglet.window import Window
+
+from . import ecs, navcache
+from .pathfinding import PathMode, Pathfinding
+from .physics import PhysicsWorld
+from .scenarios import Scenario
+from .systems import (
+    AISystem,
+    ActorSystem,
+    AttackSystem,
+    HealthSystem,
+    MovementSystem,
+    NavigationSystem,
+    PathRequestSystem,
+    PhysicsSystem,
+)
+
+
+def add_core_systems(world: PhysicsWorld, columnar: bool = False):
+    store = None
+    if columnar:
+        # Needs the optional numpy dependency
+        from .columnar import ColumnarStore
+
+        store = ColumnarStore()
+        ecs.add_handlers(store)
+
+    movement_system = MovementSystem(store)
+    ecs.add_system(movement_system)
+    ecs.add_handlers(movement_system)
+
+    physics_system = PhysicsSystem(world)
+    ecs.add_system(physics_system)
+    ecs.add_handlers(physics_system)
+
+    player_system = ActorSystem()
+    ecs.add_system(player_system)
+    ecs.add_handlers(player_system)
+
+    health_system = HealthSystem()
+    ecs.add_system(health_system)
+
+    attack_system = AttackSystem()
+    ecs.add_system(attack_system)
+    ecs.add_handlers(attack_system)
+
+
+def add_navigation_systems(
+    world: PhysicsWorld,
+    window: Window | None = None,
+    max_expansions: int | None = None,
+):
+    # Built from the bodies already in the world, so add these after populating
+    grid = navcache.load_or_build(world, 5, Path(".navcache"))
+    navigation_system = NavigationSystem(grid)
+    ecs.add_system(navigation_system)
+    ecs.add_handlers(navigation_system)
+
+    pathfinding = Pathfinding(grid, smoothing=True)
+    ai_system = AISystem(pathfinding, window, PathMode.Queued)
+    ecs.add_system(ai_system)
+    ecs.add_handlers(ai_system)
+
+    path_request_system = PathRequestSystem(pathfinding, max_expansions=max_expansions)
+    ecs.add_system(path_request_system)
+
+
+def build_headless(
+    scenario: Scenario, columnar: bool = False, max_expansions: int | None = None
+) -> PhysicsWorld:
+    world = PhysicsWorld(scenario.min, scenario.max)
+    add_core_systems(world, columnar)
+    scenario.populate(False)
+    add_navigation_systems(world, max_expansions=max_expansions)
+
+    return world
+
+
+def run_headless(
+    scenario: Scenario,
+    ticks: int,
+    rate: float = 0,
+    dt: float = 1 / 60,
+    columnar: bool = False,
+):
+    build_headless(scenario, columnar)
+
+    # A rate of 0 steps as fast as possible, otherwise ticks are paced in real time
+    interval = 1 / rate if rate > 0 else 0
+    started = perf_counter()
+    for tick in range(ticks):
+        if scenario.tick:
+            scenario.tick(tick)
+        ecs.update(dt)
+        if interval:
+            if (delay := started + (tick + 1) * interval - perf_counter()) > 0:
+                sleep(delay)
+    elapsed = perf_counter() - started
+
+    logger.info(
+        "Ran {} ticks in {:.3f}s ({:.1f} ticks/s)",
+        ticks,
+        elapsed,
+        ticks / elapsed if elapsed else 0,
+    )
+    return elapsed
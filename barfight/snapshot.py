@@ -0,0 +1,356 @@
+import itertools
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from pyglet.math import Vec2
+
+from . import ecs
+from .bundles import load_sprite
+from .components import (
+    Actor,
+    ActorState,
+    Attack,
+    Enemy,
+    Health,
+    Layer,
+    Path,
+    PhysicsBody,
+    Player,
+    Position,
+    Sprite,
+    Velocity,
+    Wall,
+)
+from .physics import Body, BodyKind, Rectangle
+
+# Layout, all little-endian:
+#   header    magic, format version, kind, tick, base tick, entity count
+#   entities  entity, set count, removed count, then each set component as
+#             (tag, length, payload) and each removed component as its tag
+#   deleted   count, then the entities deleted since the base, deltas only
+MAGIC = b"BFSN"
+FORMAT_VERSION = 2
+FULL = 0
+DELTA = 1
+HEADER = struct.Struct("<4sHBQQI")
+ENTITY = struct.Struct("<IBB")
+COMPONENT = struct.Struct("<BI")
+COUNT = struct.Struct("<I")
+TAG = struct.Struct("<B")
+
+VEC2 = struct.Struct("<dd")
+ACTOR = struct.Struct("<idddBd")
+VELOCITY = struct.Struct("<ddd")
+HEALTH = struct.Struct("<ii")
+ATTACK = struct.Struct("<I??")
+BODY = struct.Struct("<ddddBII?I")
+PATH = struct.Struct("<ddI")
+SCHEDULE = struct.Struct("<dI")
+SPRITE = struct.Struct("<B")
+
+STATES = list(ActorState)
+KINDS = list(BodyKind)
+
+Remap = Callable[[int], int]
+
+_ticks = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class Codec:
+    tag: int
+    component_type: type
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes, Remap], Any]
+
+
+@dataclass
+class Snapshot:
+    # Numbers captures in order, deltas name the tick of their base
+    tick: int
+    # Encoded components of each entity, by codec tag
+    entities: dict[int, dict[int, bytes]] = field(default_factory=dict)
+
+
+def encode_actor(actor: Actor) -> bytes:
+    return ACTOR.pack(
+        actor.max_speed,
+        actor.direction.x,
+        actor.direction.y,
+        actor.facing,
+        STATES.index(actor.state),
+        actor.cooldown,
+    )
+
+
+def decode_actor(payload: bytes, remap: Remap) -> Actor:
+    max_speed, x, y, facing, state, cooldown = ACTOR.unpack(payload)
+    return Actor(max_speed, Vec2(x, y), facing, STATES[state], cooldown)
+
+
+def encode_body(physics_body: PhysicsBody) -> bytes:
+    body = physics_body.body
+    return BODY.pack(
+        body.rectangle.min.x,
+        body.rectangle.min.y,
+        body.rectangle.max.x,
+        body.rectangle.max.y,
+        KINDS.index(body.kind),
+        body.layer,
+        body.mask,
+        body.active,
+        body.data or 0,
+    )
+
+
+def decode_body(payload: bytes, remap: Remap) -> PhysicsBody:
+    min_x, min_y, max_x, max_y, kind, layer, mask, active, data = BODY.unpack(payload)
+    return PhysicsBody(
+        Body(
+            Rectangle(Vec2(min_x, min_y), Vec2(max_x, max_y)),
+            KINDS[kind],
+            layer,
+            mask,
+            remap(data) if data else None,
+            active,
+        )
+    )
+
+
+def encode_path(path: Path) -> bytes:
+    points = [coordinate for point in path.path for coordinate in point]
+    return b"".join(
+        [
+            PATH.pack(path.goal.x, path.goal.y, len(path.path)),
+            struct.pack(f"<{len(points)}d", *points),
+            SCHEDULE.pack(path.elapsed, len(path.times)),
+            struct.pack(f"<{len(path.times)}d", *path.times),
+        ]
+    )
+
+
+def decode_path(payload: bytes, remap: Remap) -> Path:
+    x, y, count = PATH.unpack_from(payload)
+    offset = PATH.size
+    points = struct.unpack_from(f"<{count * 2}d", payload, offset)
+    offset += 16 * count
+    elapsed, scheduled = SCHEDULE.unpack_from(payload, offset)
+    times = struct.unpack_from(f"<{scheduled}d", payload, offset + SCHEDULE.size)
+    return Path(
+        Vec2(x, y),
+        [Vec2(*points[i : i + 2]) for i in range(0, len(points), 2)],
+        list(times),
+        elapsed,
+    )
+
+
+def encode_sprite(sprite: Sprite) -> bytes:
+    return SPRITE.pack(sprite.layer) + sprite.asset.encode()
+
+
+def decode_sprite(payload: bytes, remap: Remap) -> Sprite:
+    (layer,) = SPRITE.unpack_from(payload)
+    sprite = load_sprite(payload[SPRITE.size :].decode())
+    sprite.layer = Layer(layer)
+    return sprite
+
+
+def encode_position(position: Position) -> bytes:
+    return VEC2.pack(position.position.x, position.position.y)
+
+
+def decode_position(payload: bytes, remap: Remap) -> Position:
+    return Position(Vec2(*VEC2.unpack(payload)))
+
+
+def encode_velocity(velocity: Velocity) -> bytes:
+    return VELOCITY.pack(velocity.direction.x, velocity.direction.y, velocity.speed)
+
+
+def decode_velocity(payload: bytes, remap: Remap) -> Velocity:
+    x, y, speed = VELOCITY.unpack(payload)
+    return Velocity(Vec2(x, y), speed)
+
+
+def encode_health(health: Health) -> bytes:
+    return HEALTH.pack(health.current, health.maximum)
+
+
+def decode_health(payload: bytes, remap: Remap) -> Health:
+    return Health(*HEALTH.unpack(payload))
+
+
+def encode_attack(attack: Attack) -> bytes:
+    return ATTACK.pack(attack.entity, attack.cleanup, attack.active)
+
+
+def decode_attack(payload: bytes, remap: Remap) -> Attack:
+    entity, cleanup, active = ATTACK.unpack(payload)
+    return Attack(remap(entity), cleanup, active)
+
+
+def encode_marker(component: Any) -> bytes:
+    return b""
+
+
+# Tags are part of the format, so only ever add new ones
+CODECS = [
+    Codec(1, Actor, encode_actor, decode_actor),
+    Codec(2, Position, encode_position, decode_position),
+    Codec(3, Velocity, encode_velocity, decode_velocity),
+    Codec(4, Health, encode_health, decode_health),
+    Codec(5, Attack, encode_attack, decode_attack),
+    Codec(6, Player, encode_marker, lambda payload, remap: Player()),
+    Codec(7, Enemy, encode_marker, lambda payload, remap: Enemy()),
+    Codec(8, Wall, encode_marker, lambda payload, remap: Wall()),
+    Codec(9, PhysicsBody, encode_body, decode_body),
+    Codec(10, Path, encode_path, decode_path),
+    Codec(11, Sprite, encode_sprite, decode_sprite),
+]
+CODECS_BY_TYPE = {codec.component_type: codec for codec in CODECS}
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS}
+
+
+def capture() -> Snapshot:
+    # Components without a codec, such as Shape or navigation plans, are left
+    # out and rebuilt by their systems
+    snapshot = Snapshot(next(_ticks))
+    for entity in ecs.get_entities():
+        payloads = {}
+        for component in ecs.components_for_entity(entity):
+            if codec := CODECS_BY_TYPE.get(ecs.type_of(component)):
+                if codec.component_type is Sprite and not component.asset:
+                    continue
+                payloads[codec.tag] = codec.encode(component)
+        snapshot.entities[entity] = payloads
+
+    return snapshot
+
+
+def _write_entity(
+    parts: list[bytes], entity: int, payloads: dict[int, bytes], removed=()
+):
+    parts.append(ENTITY.pack(entity, len(payloads), len(removed)))
+    for tag, payload in payloads.items():
+        parts.append(COMPONENT.pack(tag, len(payload)))
+        parts.append(payload)
+    for tag in removed:
+        parts.append(TAG.pack(tag))
+
+
+def encode(snapshot: Snapshot) -> bytes:
+    parts = [
+        HEADER.pack(
+            MAGIC, FORMAT_VERSION, FULL, snapshot.tick, 0, len(snapshot.entities)
+        )
+    ]
+    for entity, payloads in snapshot.entities.items():
+        _write_entity(parts, entity, payloads)
+
+    return b"".join(parts)
+
+
+def encode_delta(base: Snapshot, snapshot: Snapshot) -> bytes:
+    parts = []
+    count = 0
+    for entity, payloads in snapshot.entities.items():
+        previous = base.entities.get(entity, {})
+        changed = {
+            tag: payload
+            for tag, payload in payloads.items()
+            if previous.get(tag) != payload
+        }
+        removed = [tag for tag in previous if tag not in payloads]
+        if changed or removed or entity not in base.entities:
+            _write_entity(parts, entity, changed, removed)
+            count += 1
+    deleted = [entity for entity in base.entities if entity not in snapshot.entities]
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, DELTA, snapshot.tick, base.tick, count)
+    return b"".join(
+        [
+            header,
+            *parts,
+            COUNT.pack(len(deleted)),
+            struct.pack(f"<{len(deleted)}I", *deleted),
+        ]
+    )
+
+
+def _read(
+    data: bytes, entities: dict[int, dict[int, bytes]], count: int, offset: int
+) -> int:
+    for _ in range(count):
+        entity, set_count, removed_count = ENTITY.unpack_from(data, offset)
+        offset += ENTITY.size
+        payloads = entities.setdefault(entity, {})
+        for _ in range(set_count):
+            tag, length = COMPONENT.unpack_from(data, offset)
+            offset += COMPONENT.size
+            payloads[tag] = data[offset : offset + length]
+            offset += length
+        for _ in range(removed_count):
+            (tag,) = TAG.unpack_from(data, offset)
+            offset += TAG.size
+            payloads.pop(tag, None)
+
+    return offset
+
+
+def _header(data: bytes, kind: int) -> tuple[int, int, int]:
+    magic, version, found, tick, base_tick, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a snapshot of this version")
+    if found != kind:
+        raise ValueError("Expected a full snapshot" if kind == FULL else "Not a delta")
+
+    return tick, base_tick, count
+
+
+def decode(data: bytes) -> Snapshot:
+    tick, _, count = _header(data, FULL)
+    snapshot = Snapshot(tick)
+    _read(data, snapshot.entities, count, HEADER.size)
+
+    return snapshot
+
+
+def apply_delta(base: Snapshot, data: bytes) -> Snapshot:
+    tick, base_tick, count = _header(data, DELTA)
+    if base_tick != base.tick:
+        raise ValueError(f"Delta is against tick {base_tick}, not {base.tick}")
+
+    snapshot = Snapshot(
+        tick, {entity: dict(payloads) for entity, payloads in base.entities.items()}
+    )
+    offset = _read(data, snapshot.entities, count, HEADER.size)
+    (deleted,) = COUNT.unpack_from(data, offset)
+    for entity in struct.unpack_from(f"<{deleted}I", data, offset + COUNT.size):
+        snapshot.entities.pop(entity, None)
+
+    return snapshot
+
+
+def restore(snapshot: Snapshot) -> dict[int, int]:
+    # Replaces every entity in the current world. esper never reuses ids, so
+    # restored entities get new ones, returned by their id in the snapshot.
+    for entity in ecs.get_entities():
+        ecs.delete_entity(entity)
+
+    entities = {entity: ecs.create_entity() for entity in snapshot.entities}
+
+    def remap(entity: int) -> int:
+        return entities.get(entity, entity)
+
+    for entity, payloads in snapshot.entities.items():
+        for tag, payload in payloads.items():
+            component = CODECS_BY_TAG[tag].decode(payload, remap)
+            ecs.add_component(entities[entity], component)
+
+    # Inactive attacks were pooled, and the pool held their old ids
+    for entity, (attack,) in ecs.view(Attack):
+        if not attack.active:
+            ecs.pool(Attack).release(entity)
+
+    return entities
@@ -1,4 +1,6 @@
-from typing import Any
+from concurrent.futures import Future
+from math import sqrt
+from typing import TYPE_CHECKING
 
 import pyglet
 from loguru import logger
@@ -6,17 +8,20 @@ from pyglet.graphics import Batch, Group
 from pyglet.math import Vec2
 from pyglet.window import Window, key, mouse
 
-from . import ecs, events
-from .bundles import add_attack
+from . import assets, ecs, events
+from .assets import AssetCache
+from .bundles import add_attack, remove_attack
 from .components import (
     Actor,
     ActorState,
     Attack,
     Enemy,
+    Flow,
     Health,
     Layer,
     Path,
     PhysicsBody,
+    Planner,
     Player,
     Position,
     Shape,
@@ -24,6 +29,7 @@ from .components import (
     Velocity,
 )
 from .events import (
+    AIDirection,
     AIStateProtocol,
     CollisionProtocol,
     ComponentAddedProtocol,
@@ -32,17 +38,26 @@ from .events import (
     InputProtocol,
     PlayerStateProtocol,
 )
-from .pathfinding import Pathfinding
-from .physics import Arbiter, Body, PhysicsWorld
+from .pathfinding import Grid, PathMode, Pathfinding
+from .pathservice import PathService
+from .physics import Arbiter, Body, BodyKind, PhysicsWorld, Rectangle
+
+if TYPE_CHECKING:
+    from .columnar import ColumnarStore
 
 # region Attack
 
 
 class AttackSystem(ecs.SystemProtocol, CollisionProtocol):
+    reads = ()
+    writes = (Attack, PhysicsBody)
+
     def process(self, *args, **kwargs):
-        for entity, (attack,) in ecs.get_components(Attack):
+        for entity, (attack,) in ecs.view(Attack):
+            if not attack.active:
+                continue
             if attack.cleanup:
-                ecs.delete_entity(entity)
+                remove_attack(entity)
             else:
                 attack.cleanup = True
 
@@ -51,7 +66,7 @@ class AttackSystem(ecs.SystemProtocol, CollisionProtocol):
     def on_sensor(self, arbiter: Arbiter):
         health = ecs.try_component(arbiter.first_body.data, Health)
         attack = ecs.try_component(arbiter.second_body.data, Attack)
-        if not health and not attack:
+        if not health or not attack or not attack.active:
             return
 
         if attack.entity == arbiter.first_body.data:
@@ -62,7 +77,7 @@ class AttackSystem(ecs.SystemProtocol, CollisionProtocol):
             "Entity {} hit {}", arbiter.first_body.data, arbiter.second_body.data
         )
 
-        ecs.delete_entity(arbiter.second_body.data)
+        remove_attack(arbiter.second_body.data)
 
 
 # endregion
@@ -77,6 +92,9 @@ class DebugSystem(
     ComponentRemovedProtocol,
     CollisionProtocol,
 ):
+    component_added_types = (PhysicsBody,)
+    component_removed_types = (PhysicsBody,)
+
     def process(self, *args): ...
 
     def on_collision(self, arbiter: Arbiter):
@@ -118,20 +136,18 @@ class DebugSystem(
             rbody=rbody,
         )
 
-    def on_component_added(self, entity: int, component: Any):
-        if isinstance(component, PhysicsBody):
-            shape = pyglet.shapes.Box(
-                component.body.rectangle.min.x,
-                component.body.rectangle.min.y,
-                component.body.rectangle.max.x - component.body.rectangle.min.x,
-                component.body.rectangle.max.y - component.body.rectangle.min.y,
-                color=(50, 25, 255),
-            )
-            ecs.add_component(entity, Shape(shape, Layer.Debug))
+    def on_component_added(self, entity: int, component: PhysicsBody):
+        shape = pyglet.shapes.Box(
+            component.body.rectangle.min.x,
+            component.body.rectangle.min.y,
+            component.body.rectangle.max.x - component.body.rectangle.min.x,
+            component.body.rectangle.max.y - component.body.rectangle.min.y,
+            color=(50, 25, 255),
+        )
+        ecs.add_component(entity, Shape(shape, Layer.Debug))
 
-    def on_component_removed(self, entity: int, component: Any):
-        if isinstance(component, PhysicsBody):
-            ecs.remove_component(entity, Shape)
+    def on_component_removed(self, entity: int, component: PhysicsBody):
+        ecs.remove_component(entity, Shape)
 
 
 # endregion
@@ -139,23 +155,34 @@ class DebugSystem(
 # region Draw
 
 
-class DrawSystem(ecs.SystemProtocol, DrawProtocol, ComponentAddedProtocol):
-    def __init__(self):
+class DrawSystem(
+    ecs.SystemProtocol, DrawProtocol, ComponentAddedProtocol, ComponentRemovedProtocol
+):
+    component_added_types = (Sprite, Shape)
+    component_removed_types = (Sprite,)
+
+    def __init__(self, asset_cache: AssetCache = assets.cache):
+        self.asset_cache = asset_cache
         self.game_layer = Group(Layer.Game)
         self.debug_layer = Group(Layer.Debug)
         self.batch = Batch()
+        self.drawn = 0
 
     def process(self, *_): ...
 
     def on_draw(self, window: Window):
-        for _, (position, sprite) in ecs.get_components(Position, Sprite):
+        for _, (position, sprite) in ecs.get_changed(
+            Position, Sprite, since=self.drawn
+        ):
             sprite.sprite.update(x=position.position.x, y=position.position.y)
+        self.drawn = ecs.change_tick()
         for _, (physics_body, shape) in ecs.get_components(PhysicsBody, Shape):
             shape.shape.x = physics_body.body.rectangle.min.x
             shape.shape.y = physics_body.body.rectangle.min.y
+            shape.shape.visible = physics_body.body.active
         self.batch.draw()
 
-    def on_component_added(self, entity: int, component: ecs.Any):
+    def on_component_added(self, entity: int, component: Sprite | Shape):
         if isinstance(component, Sprite):
             component.sprite.batch = self.batch
             match component.layer:
@@ -171,6 +198,11 @@ class DrawSystem(ecs.SystemProtocol, DrawProtocol, ComponentAddedProtocol):
                 case Layer.Debug:
                     component.shape.group = self.debug_layer
 
+    def on_component_removed(self, entity: int, component: Sprite):
+        component.sprite.delete()
+        if component.asset:
+            self.asset_cache.release(component.asset)
+
 
 # endregion
 
@@ -178,11 +210,14 @@ class DrawSystem(ecs.SystemProtocol, DrawProtocol, ComponentAddedProtocol):
 
 
 class HealthSystem(ecs.SystemProtocol):
+    reads = (Health,)
+    writes = ()
+
     def process(self, *args, **kwargs):
         for entity, (health,) in ecs.get_components(Health):
             if health.current <= 0:
                 logger.debug("Entity {} died", entity)
-                ecs.delete_entity(entity)
+                ecs.commands().delete(entity)
 
 
 # endregion
@@ -222,14 +257,33 @@ class InputSystem(ecs.SystemProtocol, InputProtocol):
 
 
 class MovementSystem(ecs.SystemProtocol):
+    reads = (Actor, Velocity)
+    writes = (Position,)
+
+    def __init__(self, store: "ColumnarStore | None" = None):
+        self.store = store
+
     def process(self, dt: float):
-        for entity, (_, position, velocity) in ecs.get_components(
-            Actor, Position, Velocity
-        ):
+        actors = ecs.view(Actor, Position, Velocity)
+        if self.store is not None:
+            self.store.attach_pending()
+            moved = self.store.integrate(dt)
+            ecs.mark_many_changed(moved.tolist(), Position)
+            # Actors are only left outside the store until their proxies are in
+            if len(actors) == len(self.store) and not self.store.queued:
+                return
+
+        for entity, (_, position, velocity) in actors:
+            if (
+                self.store is not None
+                and entity in self.store
+                and entity not in self.store.queued
+            ):
+                continue
             change = velocity.direction * velocity.speed * dt
             if change != Vec2(0, 0):
-                position.position += velocity.direction * velocity.speed * dt
-                ecs.dispatch_event(events.POSITION_CHANGED_EVENT, entity)
+                position.position += change
+                ecs.mark_changed(entity, Position)
 
 
 # endregion
@@ -241,36 +295,42 @@ class PhysicsSystem(
     ecs.SystemProtocol,
     events.ComponentAddedProtocol,
     events.ComponentRemovedProtocol,
-    events.PositionChangedProtocol,
 ):
+    component_added_types = (PhysicsBody,)
+    component_removed_types = (PhysicsBody,)
+
     def __init__(self, world: PhysicsWorld):
         self.world = world
         self.world.on_collision_callback = self.on_physics_collision
         self.world.position_change_callback = self.on_physics_position_change
         self.world.on_sensor_callback = self.on_physics_sensor
+        self.synced = ecs.change_tick()
 
     def process(self, dt: float):
-        self.world.step()
-
-    def on_component_added(self, entity: int, component: Any):
-        if isinstance(component, PhysicsBody):
-            self.world.insert(component.body)
-
-    def on_component_removed(self, entity: int, component: Any):
-        if isinstance(component, PhysicsBody):
-            self.world.remove(component.body)
-
-    def on_position_changed(self, entity: int):
-        position, physics_body = ecs.try_components(entity, Position, PhysicsBody)
-        if position and physics_body:
+        # Bodies have to follow this frame's movement before stepping
+        for _, (position, physics_body) in ecs.get_changed(
+            Position, PhysicsBody, since=self.synced
+        ):
             physics_body.body.rectangle.center = position.position
             self.world.remove(physics_body.body)
             self.world.insert(physics_body.body)
+        self.world.step()
+        # Positions changed by the step already match their bodies
+        self.synced = ecs.change_tick()
+
+    def on_component_added(self, entity: int, component: PhysicsBody):
+        if component.body.data is None:
+            component.body.data = entity
+        self.world.insert(component.body)
+
+    def on_component_removed(self, entity: int, component: PhysicsBody):
+        self.world.remove(component.body)
 
     def on_physics_position_change(self, body: Body):
         position = ecs.get_component(body.data, Position)
         physics_body = ecs.get_component(body.data, PhysicsBody)
         position.position = physics_body.body.rectangle.center
+        ecs.mark_changed(body.data, Position)
 
     def on_physics_collision(self, arbiter: Arbiter):
         logger.debug(
@@ -282,16 +342,102 @@ class PhysicsSystem(
         ecs.dispatch_event(events.SENSOR_EVENT, arbiter)
 
 
+# endregion
+
+# region Navigation
+
+
+class NavigationSystem(
+    ecs.SystemProtocol,
+    ComponentAddedProtocol,
+    ComponentRemovedProtocol,
+):
+    component_added_types = (PhysicsBody,)
+    component_removed_types = (PhysicsBody,)
+    reads = ()
+    writes = (Grid,)
+
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.dirty: list[Rectangle] = []
+
+    def process(self, *_):
+        # Static bodies are only in the physics world once every handler has
+        # run, so the grid is refreshed here rather than in the handlers
+        dirty, self.dirty = self.dirty, []
+        for area in dirty:
+            if changed := self.grid.update_area(area):
+                logger.debug(
+                    f"Navigation grid version {self.grid.version}, "
+                    f"{len(changed)} cells changed"
+                )
+
+    def on_component_added(self, entity: int, component: PhysicsBody):
+        if component.body.kind == BodyKind.Static:
+            rectangle = component.body.rectangle
+            self.dirty.append(Rectangle(rectangle.min, rectangle.max))
+
+    def on_component_removed(self, entity: int, component: PhysicsBody):
+        self.on_component_added(entity, component)
+
+
+# endregion
+
+# region Pathfinding
+
+
+def agent_size(entity: int) -> float:
+    if physics_body := ecs.try_component(entity, PhysicsBody):
+        rectangle = physics_body.body.rectangle
+        return max(rectangle.width, rectangle.height)
+
+    return 0
+
+
+class PathRequestSystem(ecs.SystemProtocol):
+    reads = (Path, Grid)
+    writes = (Pathfinding,)
+
+    def __init__(
+        self,
+        pathfinding: Pathfinding,
+        budget_us: int = 2000,
+        max_expansions: int | None = None,
+    ):
+        self.pathfinding = pathfinding
+        self.budget_us = budget_us
+        # When set, replaces the time budget so paths arrive on the same tick
+        # from run to run
+        self.max_expansions = max_expansions
+
+    def process(self, *_):
+        for request in self.pathfinding.advance(self.budget_us, self.max_expansions):
+            if not request.path:
+                continue
+            for entity, destination in request.waiters.items():
+                if not ecs.entity_exists(entity) or ecs.has_component(entity, Path):
+                    continue
+                positions = self.pathfinding.waypoints(request.path, agent_size(entity))
+                goal = self.pathfinding.goal_position(request.path, destination)
+                ecs.commands().add(entity, Path(goal, positions))
+                logger.debug(f"Path delivered to enemy {entity} {positions}")
+
+
 # endregion
 
 # region Actor
 
 
 class ActorSystem(ecs.SystemProtocol, PlayerStateProtocol, AIStateProtocol):
+    reads = (Position,)
+    writes = (Actor, Velocity)
+    # Its handlers run in the stage of whichever system dispatches to them, so
+    # those systems declare this access too. Attacking reuses pooled hitboxes.
+    handler_reads = (Player, Enemy, PhysicsBody)
+    handler_writes = (Actor, Velocity, Attack, PhysicsBody, Position)
+
     def process(self, dt: float):
-        for _, (actor, position, velocity) in ecs.get_components(
-            Actor, Position, Velocity
-        ):
+        for _, (actor, position, velocity) in ecs.view(Actor, Position, Velocity):
             match actor.state:
                 case ActorState.Idle:
                     self.idle(actor, position, velocity)
@@ -373,18 +519,19 @@ class ActorSystem(ecs.SystemProtocol, PlayerStateProtocol, AIStateProtocol):
                 add_attack(entity, attack_min, attack_max)
 
     def on_player_direction(self, direction: Vec2):
-        for _, (actor, _) in ecs.get_components(Actor, Player):
+        for _, (actor, _) in ecs.view(Actor, Player):
             actor.direction = direction
 
     def on_player_attack(self):
-        for entity, (actor, velocity, physics_body, _) in ecs.get_components(
+        for entity, (actor, velocity, physics_body, _) in ecs.view(
             Actor, Velocity, PhysicsBody, Player
         ):
             self._actor_attack(entity, actor, velocity, physics_body)
 
-    def on_ai_direction(self, target: int, direction: Vec2):
-        actor = ecs.get_component(target, Actor)
-        actor.direction = direction
+    def on_ai_direction(self, directions: list[AIDirection]):
+        for event in directions:
+            if actor := ecs.try_component(event.entity, Actor):
+                actor.direction = event.direction
 
     def on_ai_attack(self, target: int):
         if components := ecs.try_components(
@@ -400,47 +547,255 @@ class ActorSystem(ecs.SystemProtocol, PlayerStateProtocol, AIStateProtocol):
 
 
 class AISystem(ecs.SystemProtocol, AIStateProtocol, InputProtocol):
-    def __init__(self, pathfinding: Pathfinding, window: Window):
+    # Directions are published to the event bus and applied once every system
+    # has run. AI attacks are still dispatched to ActorSystem's handlers as
+    # they happen, so their access is declared here.
+    reads = (Enemy, Grid, *ActorSystem.handler_reads)
+    writes = (Path, Flow, Planner, Pathfinding, *ActorSystem.handler_writes)
+
+    def __init__(
+        self,
+        pathfinding: Pathfinding,
+        window: Window | None = None,
+        mode: PathMode = PathMode.AStar,
+        path_service: PathService | None = None,
+    ):
+        if mode == PathMode.Async and path_service is None:
+            raise ValueError("PathMode.Async needs a path service")
         self.pathfinding = pathfinding
         self.window = window
+        self.mode = mode
+        self.path_service = path_service
+        self.pending: dict[int, tuple[Vec2, Future]] = {}
 
     def process(self, dt: float):
-        for entity, (_, position, path, actor) in ecs.get_components(
+        self.poll_path_service()
+
+        for entity, (_, position, path, actor) in ecs.view(
             Enemy, Position, Path, Actor
         ):
             actor_move_distance = actor.max_speed * dt
+            if path.times:
+                path.elapsed += dt
             if path.path:
                 next_path = path.path[0]
-                if next_path.distance(position.position) < actor_move_distance:
+                if path.times and path.elapsed < path.times[0]:
+                    # Waiting keeps to the slot reserved for this agent
+                    ecs.publish(AIDirection(entity, Vec2()))
+                elif next_path.distance(position.position) < actor_move_distance:
                     path.path.pop(0)
+                    if path.times:
+                        path.times.pop(0)
                 else:
                     direction = (next_path - position.position).normalize()
-                    ecs.dispatch_event(events.AI_DIRECTION_EVENT, entity, direction)
+                    ecs.publish(AIDirection(entity, direction))
             else:
-                if path.goal.distance(position.position) < actor_move_distance:
-                    position.position = path.goal
-                    ecs.dispatch_event(events.AI_DIRECTION_EVENT, entity, Vec2())
-                    ecs.remove_component(entity, Path)
+                if self._arrive(entity, position, path.goal, actor_move_distance):
+                    ecs.commands().remove(entity, Path)
+
+        for entity, (_, position, flow, actor) in ecs.view(
+            Enemy, Position, Flow, Actor
+        ):
+            if flow.field.version != self.pathfinding.grid.version:
+                if field := self.pathfinding.flow_field(flow.goal, agent_size(entity)):
+                    flow.field = field
                 else:
-                    direction = (path.goal - position.position).normalize()
-                    ecs.dispatch_event(events.AI_DIRECTION_EVENT, entity, direction)
+                    self._stop(entity, Flow)
+                    continue
+
+            actor_move_distance = actor.max_speed * dt
+            coord = self.pathfinding.grid.coord_from_position(position.position)
+            if coord == flow.field.goal:
+                if self._arrive(entity, position, flow.goal, actor_move_distance):
+                    ecs.commands().remove(entity, Flow)
+            elif direction := flow.field.direction(position.position):
+                ecs.publish(AIDirection(entity, direction))
+            else:
+                self._stop(entity, Flow)
+
+        for entity, (_, position, planner, actor) in ecs.view(
+            Enemy, Position, Planner, Actor
+        ):
+            self.follow_planner(dt, entity, position, planner, actor)
+
+    def follow_planner(
+        self, dt: float, entity: int, position: Position, planner: Planner, actor: Actor
+    ):
+        grid = self.pathfinding.grid
+        search = planner.planner
+        coord = grid.coord_from_position(position.position)
+        if planner.target is not None:
+            if not (target := ecs.try_component(planner.target, Position)):
+                self._stop(entity, Planner)
+                return
+            planner.goal = target.position
+            # Retargeting keeps the search, so the goal follows the target
+            # every time it crosses into another cell
+            goal = grid.coord_from_position(target.position)
+            if goal != search.goal:
+                if snapped := grid.snap_goal(coord, goal, search.clearance):
+                    search.retarget(snapped)
+
+        search.sync()
+        search.move_to(coord)
+        search.compute_shortest_path()
+
+        actor_move_distance = actor.max_speed * dt
+        if coord == search.goal and planner.target is None:
+            if self._arrive(entity, position, planner.goal, actor_move_distance):
+                ecs.commands().remove(entity, Planner)
+        elif coord == search.goal:
+            # Keep closing in on a moving target without snapping onto it
+            direction = Vec2()
+            if planner.goal.distance(position.position) >= actor_move_distance:
+                direction = (planner.goal - position.position).normalize()
+            ecs.publish(AIDirection(entity, direction))
+        elif next_cell := search.next_cell():
+            x, y = next_cell
+            direction = (grid[x][y].rectangle.center - position.position).normalize()
+            ecs.publish(AIDirection(entity, direction))
+        else:
+            self._stop(entity, Planner)
+
+    def _arrive(
+        self, entity: int, position: Position, goal: Vec2, move_distance: float
+    ) -> bool:
+        if goal.distance(position.position) < move_distance:
+            position.position = goal
+            ecs.mark_changed(entity, Position)
+            ecs.publish(AIDirection(entity, Vec2()))
+            return True
+
+        direction = (goal - position.position).normalize()
+        ecs.publish(AIDirection(entity, direction))
+        return False
+
+    def _stop(self, entity: int, component_type: type):
+        ecs.publish(AIDirection(entity, Vec2()))
+        ecs.commands().remove(entity, component_type)
 
     def on_mouse_down(self, x: int, y: int, button: int, modifiers: int):
         logger.debug("Mouse event")
-        vx, vy, _, _ = self.window.viewport
+        # Headless runs have no window, so clicks are in world coordinates
+        vx, vy, _, _ = self.window.viewport if self.window else (0, 0, 0, 0)
         destination = Vec2(vx + x, vy + y)
-        for entity, (_, _, position) in ecs.get_components(Enemy, Actor, Position):
-            if ecs.has_component(entity, Path):
-                continue
+        match self.mode:
+            case PathMode.AStar:
+                self.find_paths(destination)
+            case PathMode.FlowField:
+                self.follow_flow_field(destination)
+            case PathMode.Queued:
+                self.request_paths(destination)
+            case PathMode.Async:
+                self.submit_paths(destination)
+            case PathMode.Incremental if button == mouse.RIGHT:
+                for player, _ in ecs.get_components(Player, Position):
+                    self.chase(player)
+            case PathMode.Incremental:
+                self.plan_paths(destination)
+            case PathMode.Cooperative:
+                self.find_group_paths(destination)
+
+    def _idle_enemies(self) -> list[tuple[int, Position]]:
+        return [
+            (entity, position)
+            for entity, (_, _, position) in ecs.view(Enemy, Actor, Position)
+            if not ecs.has_component(entity, Path)
+            and not ecs.has_component(entity, Flow)
+            and not ecs.has_component(entity, Planner)
+            and entity not in self.pending
+        ]
+
+    def find_paths(self, destination: Vec2):
+        for entity, position in self._idle_enemies():
             start = position.position
-            if path := self.pathfinding.find_path(start, destination):
-                positions = [cell.rectangle.center for cell in path]
-                ecs.add_component(entity, Path(destination, positions))
+            if path := self.pathfinding.find_path(
+                start, destination, agent_size(entity), snap=True
+            ):
+                positions = self.pathfinding.waypoints(path, agent_size(entity))
+                goal = self.pathfinding.goal_position(path, destination)
+                ecs.commands().add(entity, Path(goal, positions))
                 logger.debug(f"Path created for enemy {entity} {positions}")
 
-    def on_ai_direction(self, target: int, direction: Vec2):
-        velocity = ecs.get_component(target, Velocity)
-        velocity.direction = direction
+    def request_paths(self, destination: Vec2):
+        for entity, position in self._idle_enemies():
+            self.pathfinding.request_path(
+                position.position, destination, entity, agent_size(entity), snap=True
+            )
+
+    def find_group_paths(self, destination: Vec2):
+        if not (enemies := self._idle_enemies()):
+            return
+        size = max(agent_size(entity) for entity, _ in enemies)
+        paths = self.pathfinding.find_group_paths(
+            [position.position for _, position in enemies], destination, size
+        )
+        # Paths step in time together, one step long enough for the slowest
+        # agent to cross a cell diagonally
+        speed = min(ecs.get_component(entity, Actor).max_speed for entity, _ in enemies)
+        step = self.pathfinding.grid.radius * 2 * sqrt(2) / speed
+        for (entity, _), path in zip(enemies, paths):
+            if not path:
+                continue
+            # Waits stay in as repeated waypoints, each held until its time
+            positions = [cell.rectangle.center for cell in path]
+            times = [max(0, i - 1) * step for i in range(len(positions))]
+            ecs.commands().add(entity, Path(positions[-1], positions, times))
+            logger.debug(f"Group path created for enemy {entity} {positions}")
+
+    def plan_paths(self, destination: Vec2, target: int | None = None):
+        grid = self.pathfinding.grid
+        for entity, position in self._idle_enemies():
+            size = agent_size(entity)
+            if planner := self.pathfinding.planner(
+                position.position, destination, size
+            ):
+                goal = destination
+                if grid.coord_from_position(destination) != planner.goal:
+                    x, y = planner.goal
+                    goal = grid[x][y].rectangle.center
+                ecs.add_component(entity, Planner(goal, planner, target))
+
+    def chase(self, target: int):
+        if position := ecs.try_component(target, Position):
+            self.plan_paths(position.position, target)
+
+    def submit_paths(self, destination: Vec2):
+        for entity, position in self._idle_enemies():
+            future = self.path_service.submit(
+                position.position, destination, agent_size(entity), snap=True
+            )
+            self.pending[entity] = (destination, future)
+
+    def poll_path_service(self):
+        for entity, (destination, future) in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[entity]
+            if future.cancelled() or not ecs.entity_exists(entity):
+                continue
+            if error := future.exception():
+                logger.error(f"Pathfinding for enemy {entity} failed: {error}")
+                continue
+            if coords := future.result():
+                path = self.path_service.cells(coords)
+                positions = self.pathfinding.waypoints(path, agent_size(entity))
+                goal = self.pathfinding.goal_position(path, destination)
+                ecs.commands().add(entity, Path(goal, positions))
+                logger.debug(f"Path delivered to enemy {entity} {positions}")
+
+    def follow_flow_field(self, destination: Vec2):
+        for entity, position in self._idle_enemies():
+            field = self.pathfinding.flow_field(destination, agent_size(entity))
+            if not field or field.direction(position.position) is None:
+                continue
+            ecs.add_component(entity, Flow(destination, field))
+            logger.debug(f"Flow field assigned to enemy {entity}")
+
+    def on_ai_direction(self, directions: list[AIDirection]):
+        for event in directions:
+            if velocity := ecs.try_component(event.entity, Velocity):
+                velocity.direction = event.direction
 
 
 # endregion
@@ -0,0 +1,17 @@
+import platform
+from statistics import quantiles
+
+
+def percentile(samples: list[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+
+    return quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+    }
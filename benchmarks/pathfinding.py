@@ -0,0 +1,222 @@
+import argparse
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from random import Random
+from statistics import mean
+from time import perf_counter
+
+from pyglet.math import Vec2
+
+from barfight.pathfinding import Grid, Pathfinding
+from barfight.physics import Body, BodyKind, PhysicsWorld, Rectangle
+
+from .common import environment, percentile
+
+# Cells are one world unit across
+RADIUS = 0.5
+
+
+def arena(size: int, rng: Random) -> list[list[bool]]:
+    blocked = [[False] * size for _ in range(size)]
+    for _ in range(size * size // 40):
+        x, y = rng.randrange(size), rng.randrange(size)
+        width, height = rng.randint(1, 3), rng.randint(1, 3)
+        for bx in range(x, min(size, x + width)):
+            for by in range(y, min(size, y + height)):
+                blocked[bx][by] = True
+
+    return blocked
+
+
+def rooms(size: int, rng: Random) -> list[list[bool]]:
+    blocked = [[False] * size for _ in range(size)]
+    room = 10
+    for wall in range(room, size, room):
+        for i in range(size):
+            blocked[wall][i] = True
+            blocked[i][wall] = True
+    # One corridor through every wall segment between neighbouring rooms
+    for wall in range(room, size, room):
+        for start in range(0, size, room):
+            end = min(size, start + room)
+            if end - start < 3:
+                continue
+            door = rng.randrange(start + 1, end - 1)
+            blocked[wall][door] = False
+            blocked[door][wall] = False
+
+    return blocked
+
+
+def maze(size: int, rng: Random) -> list[list[bool]]:
+    blocked = [[True] * size for _ in range(size)]
+    cells = (size - 1) // 2
+    visited = {(0, 0)}
+    stack = [(0, 0)]
+    blocked[1][1] = False
+    while stack:
+        x, y = stack[-1]
+        neighbours = [
+            (x + dx, y + dy)
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+            if 0 <= x + dx < cells
+            and 0 <= y + dy < cells
+            and (x + dx, y + dy) not in visited
+        ]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(neighbours)
+        visited.add((nx, ny))
+        stack.append((nx, ny))
+        blocked[x + nx + 1][y + ny + 1] = False
+        blocked[nx * 2 + 1][ny * 2 + 1] = False
+
+    return blocked
+
+
+GENERATORS = {"arena": arena, "rooms": rooms, "maze": maze}
+
+
+def build_world(blocked: list[list[bool]]) -> PhysicsWorld:
+    size = len(blocked)
+    world = PhysicsWorld(Vec2(0, 0), Vec2(size, size))
+    # One body per vertical run of blocked cells keeps the body count sane
+    for x, column in enumerate(blocked):
+        y = 0
+        while y < size:
+            if not column[y]:
+                y += 1
+                continue
+            start = y
+            while y < size and column[y]:
+                y += 1
+            world.insert(
+                Body(Rectangle(Vec2(x, start), Vec2(x + 1, y)), BodyKind.Static)
+            )
+
+    return world
+
+
+def pick_queries(grid: Grid, count: int, rng: Random) -> list[tuple[Vec2, Vec2]]:
+    free = [
+        (x, y)
+        for x in range(grid.width)
+        for y in range(grid.height)
+        if not grid[x][y].colliding
+    ]
+    queries = []
+    for _ in range(count * 20):
+        if len(queries) == count:
+            break
+        start, goal = rng.choice(free), rng.choice(free)
+        if start != goal and grid.reachable(start, goal):
+            queries.append(
+                (
+                    grid[start[0]][start[1]].rectangle.center,
+                    grid[goal[0]][goal[1]].rectangle.center,
+                )
+            )
+
+    return queries
+
+
+def run_case(generator: str, size: int, queries: int, seed: int, repeat: int) -> dict:
+    rng = Random(f"{generator}-{size}-{seed}")
+    world = build_world(GENERATORS[generator](size, rng))
+
+    construction = []
+    for _ in range(repeat):
+        started = perf_counter()
+        grid = Grid(world, RADIUS)
+        construction.append(perf_counter() - started)
+
+    collisions = []
+    for _ in range(repeat):
+        started = perf_counter()
+        grid.update_collisions()
+        collisions.append(perf_counter() - started)
+
+    pairs = pick_queries(grid, queries, rng)
+    # No cache, every query is a full search
+    pathfinding = Pathfinding(grid, cache_size=0)
+    timings = []
+    found = 0
+    for start, goal in pairs:
+        started = perf_counter()
+        path = pathfinding.find_path(start, goal)
+        timings.append(perf_counter() - started)
+        found += path is not None
+
+    # Measured separately, tracing slows everything down
+    tracemalloc.start()
+    traced = Pathfinding(Grid(world, RADIUS), cache_size=0)
+    for start, goal in pairs:
+        traced.find_path(start, goal)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "generator": generator,
+        "size": size,
+        "bodies": len(world.query(world.boundary)),
+        "grid_construction_s": min(construction),
+        "update_collisions_s": min(collisions),
+        "queries": len(pairs),
+        "paths_found": found,
+        "nodes_expanded": pathfinding.expanded,
+        "nodes_expanded_mean": pathfinding.expanded / len(pairs) if pairs else 0,
+        "find_path_s": {
+            "total": sum(timings),
+            "mean": mean(timings) if timings else 0.0,
+            "p50": percentile(timings, 50),
+            "p95": percentile(timings, 95),
+            "max": max(timings, default=0.0),
+        },
+        "peak_memory_bytes": peak,
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark grid pathfinding")
+    parser.add_argument(
+        "--generators", nargs="+", choices=list(GENERATORS), default=list(GENERATORS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[32, 64, 128])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("bench_pathfinding.json"))
+    args = parser.parse_args(argv)
+
+    results = []
+    for generator in args.generators:
+        for size in args.sizes:
+            result = run_case(generator, size, args.queries, args.seed, args.repeat)
+            results.append(result)
+            print(
+                f"{generator:>6} {size:>4}  "
+                f"grid {result['grid_construction_s'] * 1000:8.2f}ms  "
+                f"collisions {result['update_collisions_s'] * 1000:8.2f}ms  "
+                f"find_path p50 {result['find_path_s']['p50'] * 1000:7.3f}ms "
+                f"p95 {result['find_path_s']['p95'] * 1000:7.3f}ms  "
+                f"expanded {result['nodes_expanded_mean']:8.1f}  "
+                f"peak {result['peak_memory_bytes'] / 1024:8.1f}KiB",
+                file=sys.stderr,
+            )
+
+    report = {
+        "benchmark": "pathfinding",
+        **environment(),
+        "seed": args.seed,
+        "queries": args.queries,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import json
+import sys
+import tracemalloc
+from math import sqrt
+from pathlib import Path
+from random import Random
+from statistics import mean
+from time import perf_counter, perf_counter_ns
+from typing import Callable
+
+from pyglet.math import Vec2
+
+from barfight.physics import Body, BodyKind, PhysicsWorld, Point, Rectangle
+
+from .common import environment, percentile
+
+# Average area per body, keeps density the same at every size
+SPACING = 20
+
+
+def world_size(count: int) -> float:
+    return max(100.0, sqrt(count) * SPACING)
+
+
+def body(kind: BodyKind, position: Vec2, width: float, height: float):
+    return Body(Rectangle.from_dimensions(position, width, height), kind)
+
+
+def random_kind(rng: Random, static: float, sensor: float) -> BodyKind:
+    roll = rng.random()
+    if roll < static:
+        return BodyKind.Static
+    if roll < static + sensor:
+        return BodyKind.Sensor
+    return BodyKind.Dynamic
+
+
+def clamp(position: Vec2, size: float, margin: float) -> Vec2:
+    return Vec2(
+        min(max(position.x, margin), size - margin),
+        min(max(position.y, margin), size - margin),
+    )
+
+
+def scattered(count: int, rng: Random) -> list[Body]:
+    size = world_size(count)
+    return [
+        body(
+            random_kind(rng, 0.1, 0.1),
+            Vec2(rng.uniform(10, size - 10), rng.uniform(10, size - 10)),
+            rng.uniform(2, 8),
+            rng.uniform(2, 8),
+        )
+        for _ in range(count)
+    ]
+
+
+def clustered(count: int, rng: Random) -> list[Body]:
+    size = world_size(count)
+    centres = [
+        Vec2(rng.uniform(0, size), rng.uniform(0, size))
+        for _ in range(max(1, count // 50))
+    ]
+    bodies = []
+    for _ in range(count):
+        centre = rng.choice(centres)
+        position = Vec2(rng.gauss(centre.x, SPACING), rng.gauss(centre.y, SPACING))
+        bodies.append(
+            body(
+                random_kind(rng, 0.1, 0.1),
+                clamp(position, size, 10),
+                rng.uniform(2, 8),
+                rng.uniform(2, 8),
+            )
+        )
+
+    return bodies
+
+
+def walls(count: int, rng: Random) -> list[Body]:
+    size = world_size(count)
+    bodies = []
+    # Half the bodies are long thin static walls
+    for _ in range(count // 2):
+        length = rng.uniform(10, 60)
+        horizontal = rng.random() < 0.5
+        position = clamp(
+            Vec2(rng.uniform(0, size), rng.uniform(0, size)), size, length / 2 + 1
+        )
+        bodies.append(
+            body(
+                BodyKind.Static,
+                position,
+                length if horizontal else 2,
+                2 if horizontal else length,
+            )
+        )
+    for _ in range(count - count // 2):
+        bodies.append(
+            body(
+                random_kind(rng, 0, 0.2),
+                Vec2(rng.uniform(10, size - 10), rng.uniform(10, size - 10)),
+                rng.uniform(2, 8),
+                rng.uniform(2, 8),
+            )
+        )
+
+    return bodies
+
+
+SCENES = {"scattered": scattered, "clustered": clustered, "walls": walls}
+
+
+def unique_pairs(world: PhysicsWorld) -> int:
+    return len({frozenset((id(a), id(b))) for a, b in world.collisions()})
+
+
+def summary(samples: list[float]) -> dict:
+    return {
+        "samples": len(samples),
+        "mean_us": mean(samples) / 1000 if samples else 0.0,
+        "p50_us": percentile(samples, 50) / 1000,
+        "p90_us": percentile(samples, 90) / 1000,
+        "p99_us": percentile(samples, 99) / 1000,
+        "max_us": max(samples, default=0.0) / 1000,
+    }
+
+
+def sample(operation: Callable[[], object], samples: int, budget: float) -> list:
+    timings = []
+    deadline = perf_counter() + budget
+    while len(timings) < samples and (not timings or perf_counter() < deadline):
+        started = perf_counter_ns()
+        operation()
+        timings.append(perf_counter_ns() - started)
+
+    return timings
+
+
+def allocations(operation: Callable[[], object], repeat: int) -> dict:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    for _ in range(repeat):
+        operation()
+    after, peak = tracemalloc.get_traced_memory()
+    allocated = sum(
+        stat.count_diff
+        for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        if stat.count_diff > 0
+    )
+    tracemalloc.stop()
+
+    return {
+        "peak_bytes": (peak - before) // repeat,
+        "retained_bytes": (after - before) // repeat,
+        "retained_blocks": allocated // repeat,
+    }
+
+
+def run_case(scene: str, count: int, seed: int, samples: int, budget: float) -> dict:
+    rng = Random(f"{scene}-{count}-{seed}")
+    bodies = SCENES[scene](count, rng)
+    size = world_size(count)
+    world = PhysicsWorld(Vec2(0, 0), Vec2(size, size))
+
+    inserts = []
+    for item in bodies:
+        started = perf_counter_ns()
+        world.insert(item)
+        inserts.append(perf_counter_ns() - started)
+
+    # Counted before stepping, which pushes overlapping bodies apart
+    pairs = unique_pairs(world)
+    dynamic = [item for item in bodies if item.kind == BodyKind.Dynamic] or bodies
+
+    def query():
+        position = Vec2(rng.uniform(0, size), rng.uniform(0, size))
+        world.query(Rectangle.from_dimensions(position, SPACING, SPACING))
+
+    def nearest():
+        world.nearest(Point(Vec2(rng.uniform(0, size), rng.uniform(0, size))))
+
+    def move():
+        # What PhysicsSystem does when a Position changes
+        item = rng.choice(dynamic)
+        world.remove(item)
+        item.rectangle.center = clamp(
+            item.rectangle.center + Vec2(rng.uniform(-2, 2), rng.uniform(-2, 2)),
+            size,
+            5,
+        )
+        world.insert(item)
+
+    operations = {"query": query, "nearest": nearest, "move": move}
+    results = {"insert": summary(inserts)}
+    for name, operation in operations.items():
+        results[name] = summary(sample(operation, samples, budget))
+    # Steps are far slower, so take fewer of them
+    results["step"] = summary(sample(world.step, max(1, samples // 20), budget))
+
+    memory = {
+        name: allocations(operation, 10) for name, operation in operations.items()
+    }
+    memory["step"] = allocations(world.step, 1)
+
+    return {
+        "scene": scene,
+        "bodies": count,
+        "pairs": pairs,
+        "operations": results,
+        "allocations": memory,
+    }
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    previous = {
+        (result["scene"], result["bodies"]): result for result in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        if not (old := previous.get((result["scene"], result["bodies"]))):
+            continue
+        for name, stats in result["operations"].items():
+            if not (old_stats := old["operations"].get(name)):
+                continue
+            for metric in ("p50_us", "p99_us"):
+                if old_stats[metric] <= 0:
+                    continue
+                ratio = stats[metric] / old_stats[metric]
+                if ratio > 1 + threshold:
+                    regressions.append(
+                        f"{result['scene']} {result['bodies']} {name} {metric}: "
+                        f"{old_stats[metric]:.1f} -> {stats[metric]:.1f} "
+                        f"({ratio:.2f}x)"
+                    )
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the physics world")
+    parser.add_argument(
+        "--scenes", nargs="+", choices=list(SCENES), default=list(SCENES)
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10, 100, 1000, 10000, 50000],
+        help="body counts per scene, a step at 50000 takes several minutes",
+    )
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument(
+        "--budget", type=float, default=2.0, help="seconds per operation"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("bench_physics.json"))
+    parser.add_argument("--baseline", type=Path, help="earlier output to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for scene in args.scenes:
+        for count in args.sizes:
+            result = run_case(scene, count, args.seed, args.samples, args.budget)
+            results.append(result)
+            operations = "  ".join(
+                f"{name} {stats['p50_us']:.1f}/{stats['p99_us']:.1f}us"
+                for name, stats in result["operations"].items()
+            )
+            print(
+                f"{scene:>9} {count:>6}  pairs {result['pairs']:>6}  {operations}",
+                file=sys.stderr,
+            )
+
+    report = {
+        "benchmark": "physics",
+        **environment(),
+        "seed": args.seed,
+        "samples": args.samples,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
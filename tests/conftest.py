@@ -9,3 +9,9 @@ def ecs_world():
     yield
     ecs.switch_world("default")
     ecs.delete_world("pytest")
+
+
+@pytest.fixture
+def tmp_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
@@ -0,0 +1,164 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight import ecs, events
+from barfight.components import (
+    Actor,
+    Enemy,
+    Flow,
+    Path,
+    PhysicsBody,
+    Planner,
+    Position,
+    Velocity,
+)
+from barfight.pathfinding import Grid, PathMode, Pathfinding
+from barfight.physics import Body, BodyKind, PhysicsWorld, Rectangle
+from barfight.systems import (
+    AISystem,
+    ActorSystem,
+    MovementSystem,
+    NavigationSystem,
+    PathRequestSystem,
+    PhysicsSystem,
+)
+
+
+def test_ai_async_needs_path_service():
+    pathfinding = Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5))
+
+    with pytest.raises(ValueError):
+        AISystem(pathfinding, None, PathMode.Async)
+
+
+def test_ai_follows_flow_field(ecs_world):
+    pathfinding = Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5))
+    ai = AISystem(pathfinding, None, PathMode.FlowField)
+    ecs.add_system(ai)
+
+    directions = []
+
+    def on_ai_direction(batch: list[events.AIDirection]):
+        directions.extend(event.direction for event in batch)
+
+    ecs.subscribe(events.AIDirection, on_ai_direction)
+    entity = ecs.create_entity(Enemy(), Actor(max_speed=1), Position(Vec2(0.5, 0.5)))
+    ai.follow_flow_field(Vec2(5.5, 0.5))
+
+    assert ecs.has_component(entity, Flow)
+
+    ecs.update(1 / 60)
+
+    assert [Vec2(1, 0)] == directions
+
+
+def test_ai_directions_are_delivered_in_one_batch(ecs_world):
+    pathfinding = Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5))
+    ai = AISystem(pathfinding, None, PathMode.FlowField)
+    ecs.add_system(ai)
+
+    batches = []
+
+    def on_ai_direction(batch: list[events.AIDirection]):
+        batches.append(batch)
+
+    ecs.subscribe(events.AIDirection, on_ai_direction)
+    entities = [
+        ecs.create_entity(Enemy(), Actor(max_speed=1), Position(Vec2(0.5, y + 0.5)))
+        for y in range(3)
+    ]
+    ai.follow_flow_field(Vec2(5.5, 0.5))
+
+    ecs.update(1 / 60)
+
+    assert 1 == len(batches)
+    assert entities == [event.entity for event in batches[0]]
+
+
+def test_path_request_system_attaches_path(ecs_world):
+    pathfinding = Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5))
+    ai = AISystem(pathfinding, None, PathMode.Queued)
+    ecs.add_system(PathRequestSystem(pathfinding))
+
+    entity = ecs.create_entity(Enemy(), Actor(max_speed=1), Position(Vec2(0.5, 0.5)))
+    ai.request_paths(Vec2(5.5, 0.5))
+
+    assert not ecs.has_component(entity, Path)
+
+    ecs.update(1 / 60)
+
+    path = ecs.get_component(entity, Path)
+    assert Vec2(5.5, 0.5) == path.goal
+    assert Vec2(5.5, 0.5) == path.path[-1]
+
+
+def test_ai_follows_incremental_planner(ecs_world):
+    pathfinding = Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5))
+    ai = AISystem(pathfinding, None, PathMode.Incremental)
+    ecs.add_system(ai)
+
+    directions = []
+
+    def on_ai_direction(batch: list[events.AIDirection]):
+        directions.extend(event.direction for event in batch)
+
+    ecs.subscribe(events.AIDirection, on_ai_direction)
+    entity = ecs.create_entity(Enemy(), Actor(max_speed=1), Position(Vec2(0.5, 0.5)))
+    ai.plan_paths(Vec2(5.5, 0.5))
+
+    assert ecs.has_component(entity, Planner)
+
+    ecs.update(1 / 60)
+
+    assert [Vec2(1, 0)] == directions
+
+
+def test_ai_group_paths_never_share_a_cell(ecs_world):
+    # One cell wide corridors crossing at (4, 4)
+    world = PhysicsWorld(Vec2(), Vec2(10, 10))
+    for wall in (
+        Rectangle(Vec2(0, 0), Vec2(4, 4)),
+        Rectangle(Vec2(5, 0), Vec2(10, 4)),
+        Rectangle(Vec2(0, 5), Vec2(4, 10)),
+        Rectangle(Vec2(5, 5), Vec2(10, 10)),
+    ):
+        world.insert(Body(wall, BodyKind.Static))
+    grid = Grid(world, 0.5)
+    ai = AISystem(Pathfinding(grid), None, PathMode.Cooperative)
+    actor_system = ActorSystem()
+    for system in (MovementSystem(), actor_system, ai):
+        ecs.add_system(system)
+    ecs.add_handlers(actor_system)
+    enemies = [
+        ecs.create_entity(Enemy(), Actor(max_speed=3), Position(start), Velocity())
+        for start in (Vec2(1.5, 4.5), Vec2(4.5, 1.5))
+    ]
+    ai.find_group_paths(Vec2(4.5, 9.5))
+    ecs.update(1 / 60)
+    paths = [ecs.get_component(entity, Path).path for entity in enemies]
+
+    assert any(a == b for path in paths for a, b in zip(path, path[1:]))
+    for _ in range(600):
+        ecs.update(1 / 60)
+        cells = [
+            grid.coord_from_position(ecs.get_component(entity, Position).position)
+            for entity in enemies
+        ]
+        assert cells[0] != cells[1]
+    assert not any(ecs.has_component(entity, Path) for entity in enemies)
+
+
+def test_navigation_updates_grid_for_static_bodies(ecs_world):
+    world = PhysicsWorld(Vec2(), Vec2(10, 10))
+    grid = Grid(world, 0.5)
+    version = grid.version
+    for system in (PhysicsSystem(world), NavigationSystem(grid)):
+        ecs.add_system(system)
+        ecs.add_handlers(system)
+
+    body = Body(Rectangle(Vec2(2, 2), Vec2(4, 4)), BodyKind.Static)
+    ecs.create_entity(PhysicsBody(body))
+    ecs.update(1 / 60)
+
+    assert version + 1 == grid.version
+    assert grid[2][2].colliding
@@ -0,0 +1,77 @@
+from barfight import assets, ecs
+from barfight.assets import AssetCache
+from barfight.bundles import add_enemy
+from barfight.components import Sprite
+from barfight.systems import DrawSystem
+
+
+def test_asset_cache_loads_once():
+    cache = AssetCache()
+    first = cache.acquire("assets/player.png")
+    second = cache.acquire("assets/player.png")
+
+    assert first is second
+    assert 1 == cache.loads
+    assert 2 == cache.assets["assets/player.png"].references
+    assert 64 == first.anchor_x
+
+
+def test_asset_cache_shares_atlas():
+    cache = AssetCache()
+    player = cache.acquire("assets/player.png")
+    wall = cache.acquire("assets/wall.png")
+
+    assert 1 == len(cache.atlases)
+    assert player.owner is wall.owner
+
+
+def test_asset_cache_keeps_unused_by_default():
+    cache = AssetCache()
+    cache.acquire("assets/player.png")
+    cache.release("assets/player.png")
+    cache.acquire("assets/player.png")
+
+    assert 1 == cache.loads
+
+
+def test_asset_cache_evicts_unused():
+    cache = AssetCache(max_unused=1)
+    cache.acquire("assets/player.png")
+    cache.acquire("assets/wall.png")
+    cache.release("assets/player.png")
+
+    assert "assets/player.png" in cache
+    assert 1 == len(cache.atlases)
+
+    cache.release("assets/wall.png")
+
+    assert "assets/player.png" not in cache
+    assert "assets/wall.png" in cache
+
+    cache.acquire("assets/player.png")
+
+    assert 3 == cache.loads
+
+
+def test_asset_cache_drops_empty_atlas():
+    cache = AssetCache(max_unused=0)
+    cache.acquire("assets/player.png")
+    cache.release("assets/player.png")
+
+    assert "assets/player.png" not in cache
+    assert [] == cache.atlases
+
+
+def test_draw_system_releases_sprite_assets(ecs_world):
+    draw_system = DrawSystem()
+    ecs.add_system(draw_system)
+    ecs.add_handlers(draw_system)
+
+    entity = add_enemy(0, 0)
+    sprite = ecs.get_component(entity, Sprite)
+    asset = assets.cache.assets[sprite.asset]
+    references = asset.references
+
+    ecs.delete_entity(entity)
+
+    assert references - 1 == asset.references
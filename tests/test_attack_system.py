@@ -4,9 +4,10 @@ from pyglet.math import Vec2
 
 from barfight import ecs, events
 from barfight.bundles import add_attack
-from barfight.components import Attack, Health
-from barfight.physics import Arbiter, Body, Rectangle
-from barfight.systems import AttackSystem
+from barfight.components import Attack, Health, PhysicsBody, Position
+from barfight.pathfinding import Grid, Pathfinding
+from barfight.physics import Arbiter, Body, PhysicsWorld, Rectangle
+from barfight.systems import AISystem, ActorSystem, AttackSystem, PhysicsSystem
 
 
 def test_attack_process(ecs_world):
@@ -49,7 +50,8 @@ def test_attack_collision_decrements_health(ecs_world):
     ecs.add_handlers(a)
 
     player_entity = randint(100, 1000)
-    attack_entity = add_attack(player_entity, Vec2(0, 0), Vec2(1, 1))
+    add_attack(player_entity, Vec2(0, 0), Vec2(1, 1))
+    [attack_entity] = ecs.apply_commands()
 
     health = Health(10, 10)
     target_entity = ecs.create_entity(health)
@@ -85,3 +87,54 @@ def test_attack_collision_ignores_attacker(ecs_world):
     )
 
     assert 10 == health.current
+
+
+def test_attack_reuses_pooled_entity(ecs_world):
+    world = PhysicsWorld(Vec2(-100, -100), Vec2(100, 100))
+    physics_system = PhysicsSystem(world)
+    ecs.add_system(physics_system)
+    ecs.add_handlers(physics_system)
+    ecs.add_system(AttackSystem())
+
+    add_attack(1, Vec2(0, 0), Vec2(10, 10))
+    [attack_entity] = ecs.apply_commands()
+    body = ecs.get_component(attack_entity, PhysicsBody).body
+    ecs.update(0.0)
+    ecs.update(0.0)
+
+    assert not body.active
+    assert [] == world.query(Rectangle(Vec2(0, 0), Vec2(10, 10)))
+
+    reused = add_attack(2, Vec2(20, 20), Vec2(30, 30))
+    ecs.update(0.0)
+
+    assert attack_entity == reused
+    assert 2 == ecs.get_component(reused, Attack).entity
+    assert Vec2(25, 25) == ecs.get_component(reused, Position).position
+    assert [body] == world.query(Rectangle(Vec2(20, 20), Vec2(30, 30)))
+
+
+def test_new_attacks_are_created_by_commands(ecs_world):
+    world = PhysicsWorld(Vec2(-100, -100), Vec2(100, 100))
+    physics_system = PhysicsSystem(world)
+    ecs.add_handlers(physics_system)
+
+    assert add_attack(1, Vec2(0, 0), Vec2(10, 10)) is None
+    assert [] == list(ecs.view(Attack))
+
+    [attack_entity] = ecs.apply_commands()
+
+    [body] = world.query(Rectangle(Vec2(0, 0), Vec2(10, 10)))
+    assert attack_entity == body.data
+
+
+def test_attacking_systems_do_not_share_a_stage(ecs_world):
+    # AISystem dispatches to the ActorSystem handlers that create attacks
+    attack_system = AttackSystem()
+    ai = AISystem(Pathfinding(Grid(PhysicsWorld(Vec2(), Vec2(10, 10)), 0.5)))
+    for system in (attack_system, ActorSystem(), ai):
+        ecs.add_system(system)
+
+    assert not any(
+        attack_system in stage and ai in stage for stage in ecs.scheduler().build()
+    )
@@ -0,0 +1,91 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight import ecs
+from barfight.components import Actor, Position, Velocity
+from barfight.systems import MovementSystem
+
+pytest.importorskip("numpy")
+
+from barfight.columnar import ColumnarPosition, ColumnarStore  # noqa: E402
+
+
+@pytest.fixture
+def store(ecs_world):
+    store = ColumnarStore(capacity=2)
+    ecs.add_handlers(store)
+    yield store
+    ecs.remove_handlers(store)
+
+
+def test_columnar_movement_matches_plain(store):
+    direction = Vec2(1, 1).normalize()
+    speed = 10
+    dt = 1 / 60
+    ecs.add_system(MovementSystem(store))
+    entity = ecs.create_entity(
+        Position(), Velocity(direction=direction, speed=speed), Actor(10)
+    )
+    still = ecs.create_entity(Position(Vec2(5, 5)), Velocity(), Actor(10))
+    # Attaching swaps the components, which counts as a change
+    store.attach_pending()
+    ecs.apply_commands()
+    tick = ecs.change_tick()
+
+    ecs.update(dt)
+
+    position = ecs.get_component(entity, Position)
+    assert isinstance(position, ColumnarPosition)
+    assert direction * speed * dt == position.position
+    assert Vec2(5, 5) == ecs.get_component(still, Position).position
+    assert [entity] == [entity for entity, _ in ecs.get_changed(Position, since=tick)]
+
+
+def test_columnar_store_grows_and_packs_rows(store):
+    ecs.add_system(MovementSystem(store))
+    entities = [
+        ecs.create_entity(Position(Vec2(i, 0)), Velocity(Vec2(1, 0), 60), Actor(10))
+        for i in range(5)
+    ]
+    ecs.update(1 / 60)
+    removed = ecs.get_component(entities[0], Position)
+    ecs.delete_entity(entities[0])
+    ecs.update(1 / 60)
+
+    assert 4 == len(store)
+    assert entities[0] not in store
+    assert Vec2(1, 0) == removed.position
+    assert [Vec2(i + 2, 0) for i in range(1, 5)] == [
+        ecs.get_component(entity, Position).position for entity in entities[1:]
+    ]
+
+
+def test_proxies_write_through(store):
+    entity = ecs.create_entity(Position(), Velocity(), Actor(10))
+    store.attach_pending()
+    ecs.apply_commands()
+    velocity = ecs.get_component(entity, Velocity)
+    velocity.direction = Vec2(0, 1)
+    velocity.speed = 2
+
+    assert [0, 1] == store.directions[0].tolist()
+    assert 2 == store.speeds[0]
+
+    ecs.remove_component(entity, Actor)
+
+    assert entity not in store
+    assert Vec2(0, 1) == velocity.direction
+
+
+def test_attach_swaps_proxies_by_command(store):
+    entity = ecs.create_entity(Position(), Velocity(), Actor(10))
+    store.attach_pending()
+    velocity = ecs.get_component(entity, Velocity)
+    velocity.direction = Vec2(1, 0)
+
+    assert not isinstance(ecs.get_component(entity, Position), ColumnarPosition)
+
+    ecs.apply_commands()
+
+    assert isinstance(ecs.get_component(entity, Position), ColumnarPosition)
+    assert Vec2(1, 0) == ecs.get_component(entity, Velocity).direction
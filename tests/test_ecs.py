@@ -0,0 +1,393 @@
+from dataclasses import dataclass
+
+from pyglet.math import Vec2
+
+from barfight import ecs, events
+from barfight.components import Actor, PhysicsBody, Position, Velocity
+from barfight.physics import Body, PhysicsWorld, Rectangle
+from barfight.systems import MovementSystem, PhysicsSystem
+
+
+@dataclass
+class Ping:
+    entity: int
+
+
+@dataclass
+class Pong:
+    entity: int
+
+
+def test_event_bus_delivers_batches(ecs_world):
+    batches = []
+
+    def on_ping(pings: list[Ping]):
+        batches.append([ping.entity for ping in pings])
+
+    ecs.subscribe(Ping, on_ping)
+    ecs.publish(Ping(1))
+    ecs.publish(Ping(2))
+
+    assert [] == batches
+
+    ecs.flush_events()
+
+    assert [[1, 2]] == batches
+
+    ecs.flush_events()
+
+    assert [[1, 2]] == batches
+
+
+def test_event_bus_flushes_only_requested_types(ecs_world):
+    received = []
+
+    def on_ping(pings: list[Ping]):
+        received.extend(pings)
+
+    ecs.subscribe(Ping, on_ping)
+    ecs.publish(Ping(1))
+    ecs.flush_events(Pong)
+
+    assert [] == received
+
+    ecs.update()
+
+    assert [Ping(1)] == received
+
+
+def test_event_bus_delivers_events_published_while_flushing(ecs_world):
+    batches = []
+
+    def on_ping(pings: list[Ping]):
+        batches.append(pings)
+        if len(batches) == 1:
+            ecs.publish(Ping(2))
+
+    ecs.subscribe(Ping, on_ping)
+    ecs.publish(Ping(1))
+    ecs.flush_events()
+
+    assert [[Ping(1)], [Ping(2)]] == batches
+
+
+def test_event_bus_unsubscribe(ecs_world):
+    received = []
+
+    def on_ping(pings: list[Ping]):
+        received.extend(pings)
+
+    ecs.subscribe(Ping, on_ping)
+    ecs.unsubscribe(Ping, on_ping)
+    ecs.publish(Ping(1))
+    ecs.flush_events()
+
+    assert [] == received
+
+
+def test_event_bus_is_per_world(ecs_world):
+    received = []
+
+    def on_ping(pings: list[Ping]):
+        received.extend(pings)
+
+    ecs.subscribe(Ping, on_ping)
+    ecs.switch_world("other")
+    ecs.publish(Ping(1))
+    ecs.flush_events()
+    ecs.switch_world("pytest")
+    ecs.delete_world("other")
+
+    assert [] == received
+
+
+def test_moved_body_follows_before_physics_step(ecs_world):
+    world = PhysicsWorld(Vec2(-10, -10), Vec2(10, 10))
+    ecs.add_system(MovementSystem(), 1)
+    physics_system = PhysicsSystem(world)
+    ecs.add_system(physics_system)
+    ecs.add_handlers(physics_system)
+    body = Body(Rectangle.from_dimensions(Vec2(), 1, 1))
+    ecs.create_entity(
+        Actor(10), Position(), Velocity(Vec2(1, 0), 60), PhysicsBody(body)
+    )
+
+    ecs.update(1 / 60)
+
+    assert Vec2(1, 0) == body.rectangle.center
+    assert [body] == world.query(Rectangle.from_dimensions(Vec2(1, 0), 0.5, 0.5))
+
+
+class PositionWatcher(
+    ecs.SystemProtocol,
+    events.ComponentAddedProtocol,
+    events.ComponentRemovedProtocol,
+):
+    component_added_types = (Position,)
+    component_removed_types = (Position,)
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+
+    def process(self, *_): ...
+
+    def on_component_added(self, entity: int, component: Position):
+        self.added.append(component)
+
+    def on_component_removed(self, entity: int, component: Position):
+        self.removed.append(component)
+
+
+def test_component_type_subscriptions(ecs_world):
+    watcher = PositionWatcher()
+    ecs.add_handlers(watcher)
+    everything = []
+
+    def on_component_added(entity: int, component):
+        everything.append(component)
+
+    ecs.set_handler(events.COMPONENT_ADDED_EVENT, on_component_added)
+    position = Position()
+    entity = ecs.create_entity(Actor(10), position, Velocity())
+    ecs.add_component(entity, Position())
+    ecs.remove_component(entity, Velocity)
+
+    assert 2 == len(watcher.added)
+    assert position is watcher.added[0]
+    assert 4 == len(everything)
+    assert [] == watcher.removed
+
+    ecs.delete_entity(entity)
+
+    assert 1 == len(watcher.removed)
+
+
+def test_component_type_subscriptions_removed(ecs_world):
+    watcher = PositionWatcher()
+    ecs.add_handlers(watcher)
+    ecs.remove_handlers(watcher)
+    ecs.create_entity(Position())
+
+    assert [] == watcher.added
+
+
+def test_remove_component_notifies_with_the_removed_component(ecs_world):
+    removed = []
+
+    def on_component_removed(entity: int, component):
+        removed.append((entity, component, ecs.has_component(entity, Position)))
+
+    ecs.set_handler(events.COMPONENT_REMOVED_EVENT, on_component_removed)
+    ecs.create_entity(Position(Vec2(1, 1)))
+    position = Position(Vec2(2, 2))
+    entity = ecs.create_entity(position)
+
+    ecs.remove_component(entity, Position)
+
+    assert [(entity, position, True)] == removed
+    assert not ecs.has_component(entity, Position)
+
+
+def test_component_type_subscriptions_are_per_world(ecs_world):
+    watcher = PositionWatcher()
+    ecs.add_handlers(watcher)
+    world = PhysicsWorld(Vec2(0, 0), Vec2(10, 10))
+    physics_system = PhysicsSystem(world)
+    ecs.add_handlers(physics_system)
+    ecs.switch_world("other")
+    other_world = PhysicsWorld(Vec2(0, 0), Vec2(10, 10))
+    other_system = PhysicsSystem(other_world)
+    ecs.add_handlers(other_system)
+
+    entity = ecs.create_entity(
+        Position(), PhysicsBody(Body(Rectangle(Vec2(1, 1), Vec2(2, 2))))
+    )
+    ecs.remove_component(entity, Position)
+    ecs.switch_world("pytest")
+    ecs.delete_world("other")
+
+    assert [] == watcher.added
+    assert [] == watcher.removed
+    assert [] == world.query(world.boundary)
+    assert 1 == len(other_world.query(other_world.boundary))
+
+
+def test_view_tracks_components(ecs_world):
+    existing = ecs.create_entity(Position(), Velocity())
+    actors = ecs.view(Position, Velocity)
+
+    assert [existing] == [entity for entity, _ in actors]
+    assert actors is ecs.view(Position, Velocity)
+
+    added = ecs.create_entity(Position())
+    ecs.create_entity(Velocity())
+
+    assert added not in actors
+
+    velocity = Velocity()
+    ecs.add_component(added, velocity)
+
+    assert (added, (ecs.get_component(added, Position), velocity)) in list(actors)
+
+    ecs.remove_component(existing, Velocity)
+    ecs.delete_entity(added)
+
+    assert [] == list(actors)
+
+
+def test_view_iterates_snapshot(ecs_world):
+    for _ in range(3):
+        ecs.create_entity(Position(), Velocity())
+
+    seen = []
+    for entity, _ in ecs.view(Position, Velocity):
+        seen.append(entity)
+        ecs.remove_component(entity, Velocity)
+
+    assert 3 == len(seen)
+    assert 0 == len(ecs.view(Position, Velocity))
+
+
+def test_view_is_per_world(ecs_world):
+    ecs.create_entity(Position())
+    positions = ecs.view(Position)
+
+    ecs.switch_world("other")
+    ecs.create_entity(Position(), Velocity())
+    other = ecs.view(Position)
+    ecs.switch_world("pytest")
+    ecs.delete_world("other")
+
+    assert positions is not other
+    assert 1 == len(positions)
+
+
+def test_commands_apply_at_end_of_update(ecs_world):
+    entities = [ecs.create_entity(Position(), Velocity()) for _ in range(3)]
+    for entity, _ in ecs.view(Position, Velocity):
+        ecs.commands().delete(entity)
+    ecs.commands().create(Position())
+
+    assert all(ecs.entity_exists(entity) for entity in entities)
+
+    ecs.update(0)
+
+    assert not any(ecs.entity_exists(entity) for entity in entities)
+    assert 1 == len(ecs.view(Position))
+    assert 0 == len(ecs.commands())
+
+
+def test_commands_coalesce(ecs_world):
+    watcher = PositionWatcher()
+    ecs.add_handlers(watcher)
+    entity = ecs.create_entity(Velocity())
+    buffer = ecs.commands()
+
+    buffer.add(entity, Position())
+    buffer.remove(entity, Position)
+    ecs.apply_commands()
+
+    assert not ecs.has_component(entity, Position)
+    assert [] == watcher.added
+
+    existing = ecs.create_entity(Position())
+    replacement = Position(Vec2(1, 1))
+    buffer.remove(existing, Position)
+    buffer.add(existing, replacement)
+    ecs.apply_commands()
+
+    assert replacement is ecs.get_component(existing, Position)
+    assert 1 == len(watcher.removed)
+
+    buffer.add(existing, Velocity())
+    buffer.delete(existing)
+    buffer.add(existing, Velocity())
+    ecs.apply_commands()
+
+    assert not ecs.entity_exists(existing)
+
+
+class Recorder(ecs.SystemProtocol):
+    def __init__(self, name: str, calls: list, reads=None, writes=None):
+        self.name = name
+        self.calls = calls
+        if writes is not None:
+            self.reads = reads or ()
+            self.writes = writes
+
+    def process(self, *_):
+        self.calls.append(self.name)
+
+
+def test_scheduler_stages(ecs_world):
+    calls = []
+    movement = Recorder("movement", calls, (Velocity,), (Position,))
+    health = Recorder("health", calls, (Actor,), ())
+    steering = Recorder("steering", calls, (), (Velocity,))
+    barrier = Recorder("barrier", calls)
+    late = Recorder("late", calls, (Position,), ())
+    for system in (movement, health, steering, barrier, late):
+        ecs.add_system(system)
+
+    assert [
+        [movement, health],
+        [steering],
+        [barrier],
+        [late],
+    ] == ecs.scheduler().build()
+
+    ecs.update(0)
+
+    assert ["movement", "health", "steering", "barrier", "late"] == calls
+
+
+def test_scheduler_runs_stages_in_parallel(ecs_world):
+    calls = []
+    ecs.add_system(Recorder("first", calls, (), (Position,)))
+    ecs.add_system(Recorder("second", calls, (), (Velocity,)))
+    ecs.add_system(Recorder("last", calls, (Position, Velocity), ()))
+
+    ecs.set_parallel(True, 2)
+    try:
+        ecs.update(0)
+    finally:
+        ecs.set_parallel()
+
+    assert {"first", "second"} == set(calls[:2])
+    assert "last" == calls[2]
+
+
+def test_get_changed_since_tick(ecs_world):
+    first = ecs.create_entity(Position(), Velocity())
+    second = ecs.create_entity(Position())
+    tick = ecs.change_tick()
+
+    assert [] == ecs.get_changed(Position, since=tick)
+
+    ecs.mark_changed(second, Position)
+    ecs.mark_changed(first, Position)
+    ecs.mark_changed(second, Position)
+
+    assert [first, second] == [
+        entity for entity, _ in ecs.get_changed(Position, since=tick)
+    ]
+    assert [first] == [
+        entity for entity, _ in ecs.get_changed(Position, Velocity, since=tick)
+    ]
+
+    ecs.delete_entity(first)
+
+    assert [second] == [entity for entity, _ in ecs.get_changed(Position, since=tick)]
+    assert [] == ecs.get_changed(Position, since=ecs.change_tick())
+
+
+def test_added_components_count_as_changed(ecs_world):
+    tick = ecs.change_tick()
+    entity = ecs.create_entity(Position())
+    velocity = Velocity()
+    ecs.add_component(entity, velocity)
+
+    assert [(entity, (ecs.get_component(entity, Position), velocity))] == (
+        ecs.get_changed(Position, Velocity, since=tick)
+    )
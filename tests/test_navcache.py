@@ -0,0 +1,53 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight import navcache
+from barfight.pathfinding import Grid
+from barfight.physics import Body, BodyKind, PhysicsWorld, Rectangle
+
+
+@pytest.fixture
+def physics_world():
+    p = PhysicsWorld(Vec2(), Vec2(10, 10))
+    p.insert(Body(Rectangle(Vec2(4, 0), Vec2(5, 6)), BodyKind.Static))
+    p.insert(Body(Rectangle(Vec2(0, 8), Vec2(10, 9)), BodyKind.Static))
+    yield p
+
+
+def test_load_or_build_round_trip(physics_world, tmp_path, monkeypatch):
+    built = navcache.load_or_build(physics_world, 0.5, tmp_path)
+    assert 1 == len(list(tmp_path.glob("*.nav")))
+
+    def update_collisions(self):
+        raise AssertionError("navigation data was rebuilt")
+
+    monkeypatch.setattr(Grid, "update_collisions", update_collisions)
+    loaded = navcache.load_or_build(physics_world, 0.5, tmp_path)
+
+    assert built.occupancy() == loaded.occupancy()
+    assert built.clearance == loaded.clearance
+    assert built.labels == loaded.labels
+    assert built.next_label == loaded.next_label
+    assert loaded.reachable((0, 0), (9, 0))
+    assert not loaded.reachable((0, 0), (0, 9))
+
+
+def test_layout_key_changes_with_layout(physics_world):
+    key = navcache.layout_key(physics_world, 0.5)
+
+    assert key == navcache.layout_key(physics_world, 0.5)
+    assert key != navcache.layout_key(physics_world, 1)
+
+    physics_world.insert(Body(Rectangle(Vec2(1, 1), Vec2(2, 2)), BodyKind.Static))
+    assert key != navcache.layout_key(physics_world, 0.5)
+
+
+def test_load_or_build_rebuilds_corrupt_file(physics_world, tmp_path):
+    key = navcache.layout_key(physics_world, 0.5)
+    path = tmp_path / f"{key.hex()}.nav"
+    path.write_bytes(b"BFNV not really navigation data")
+
+    grid = navcache.load_or_build(physics_world, 0.5, tmp_path)
+
+    assert grid.grid[4][0].colliding
+    assert navcache.load(Grid(physics_world, 0.5, build=False), path, key)
@@ -1,7 +1,17 @@
+from random import Random
+
 import pytest
 from pyglet.math import Vec2
 
-from barfight.pathfinding import Grid, Pathfinding
+from barfight.pathfinding import (
+    DStarLite,
+    FlowField,
+    Grid,
+    Pathfinding,
+    ReservationTable,
+    perimeter,
+    search_clearance,
+)
 from barfight.physics import Body, BodyKind, PhysicsWorld, Rectangle
 
 
@@ -45,3 +55,486 @@ def test_pathfinding(physics_world):
     assert Vec2(1.5, 2.5) == path[2].rectangle.center
     assert Vec2(2.5, 1.5) == path[3].rectangle.center
     assert Vec2(2.5, 0.5) == path[4].rectangle.center
+
+
+def test_pathfinding_cache_hit(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    first = p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    second = p.find_path(Vec2(0.2, 0.2), Vec2(2.5, 0.5))
+
+    assert first == second
+    assert first is not second
+    assert 1 == p.cache_hits
+    assert 1 == p.cache_misses
+    assert 0.5 == p.cache_hit_rate
+
+
+def test_pathfinding_cache_reuses_sub_path(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    full = p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    partial = p.find_path(Vec2(1.5, 2.5), Vec2(2.9, 0))
+
+    assert full[2:] == partial
+    assert 1 == p.cache_hits
+
+
+def test_pathfinding_cache_invalidated_by_grid_version(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    g.update_collisions()
+    p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+
+    assert 0 == p.cache_hits
+    assert 2 == p.cache_misses
+
+
+def test_pathfinding_cache_is_bounded(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g, cache_size=1)
+    p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    p.find_path(Vec2(0, 0), Vec2(0.5, 2.5))
+
+    assert 1 == len(p.cache)
+
+
+def test_flow_field_directions(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    field = p.flow_field(Vec2(2.9, 0))
+
+    assert Vec2(0, 1) == field.direction(Vec2(0.5, 0.5))
+    assert Vec2(1, 1).normalize() == field.direction(Vec2(0.5, 1.5))
+    assert Vec2() == field.direction(Vec2(2.5, 0.5))
+    assert field.direction(Vec2(1.5, 0.5)) is None
+
+
+def test_flow_field_unreachable_goal(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+
+    assert p.flow_field(Vec2(1.5, 0.5)) is None
+
+
+def test_flow_field_cached_per_goal_and_version(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    field = p.flow_field(Vec2(2.9, 0))
+
+    assert field is p.flow_field(Vec2(2.5, 0.5))
+
+    g.update_collisions()
+
+    assert field is not p.flow_field(Vec2(2.9, 0))
+
+
+def test_path_requests_are_coalesced(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    first = p.request_path(Vec2(0, 0), Vec2(2.9, 0), 1)
+    second = p.request_path(Vec2(0.2, 0.2), Vec2(2.5, 0.5), 2)
+
+    assert first is second
+    assert {1, 2} == set(first.waiters)
+    assert 1 == len(p.queue)
+
+
+def test_path_request_resumes_across_advances(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    request = p.request_path(Vec2(0, 0), Vec2(2.9, 0), 1)
+
+    assert [] == p.advance(0)
+    assert not request.done
+
+    assert [request] == p.advance(1_000_000)
+    assert request.path == p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    assert 0 == len(p.queue)
+
+
+def test_path_request_served_from_cache(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g)
+    path = p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    request = p.request_path(Vec2(0, 0), Vec2(2.9, 0), 1)
+
+    assert request.done
+    assert path == request.path
+    assert [request] == p.advance(0)
+
+
+def test_search_clearance(physics_world):
+    g = Grid(physics_world, 0.5)
+    path = search_clearance(g.clearance, g.width, g.height, 1, (0, 0), (2, 0))
+
+    assert [(0, 0), (0, 1), (1, 2), (2, 1), (2, 0)] == path
+
+
+def test_search_clearance_matches_path_search(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    p = Pathfinding(g)
+
+    cells = p.search(((1, 1), (8, 7), 1))
+    coords = search_clearance(g.clearance, g.width, g.height, 1, (1, 1), (8, 7), 1)
+
+    assert coords == [g.coord_from_cell(cell) for cell in cells]
+
+
+@pytest.fixture
+def pillar_world():
+    p = PhysicsWorld(Vec2(), Vec2(10, 10))
+    p.insert(Body(Rectangle(Vec2(4, 4), Vec2(6, 6)), BodyKind.Static))
+    yield p
+
+
+@pytest.mark.parametrize(
+    "start,end,clearance,expected",
+    [
+        ((0, 5), (9, 5), 0, False),
+        ((0, 1), (9, 1), 0, True),
+        ((2, 2), (7, 2), 1, True),
+        ((2, 2), (7, 2), 2, False),
+        ((0, 1), (9, 1), 1, False),
+        ((3, 3), (6, 6), 0, False),
+    ],
+)
+def test_line_of_sight(pillar_world, start, end, clearance, expected):
+    g = Grid(pillar_world, 0.5)
+
+    assert expected is g.line_of_sight(start, end, clearance)
+
+
+def test_clearance_for_size():
+    g = Grid(PhysicsWorld(Vec2(), Vec2(100, 100)), 5)
+
+    assert 0 == g.clearance_for_size(0)
+    assert 0 == g.clearance_for_size(10)
+    assert 5 == g.clearance_for_size(100)
+
+
+def test_smooth_path_keeps_corners(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    p = Pathfinding(g)
+    path = p.find_path(Vec2(0.5, 4.5), Vec2(9.5, 5.5))
+    smoothed = p.smooth(path)
+
+    assert len(smoothed) < len(path)
+    assert path[0] == smoothed[0]
+    assert path[-1] == smoothed[-1]
+    for first, second in zip(smoothed, smoothed[1:]):
+        assert g.line_of_sight(g.coord_from_cell(first), g.coord_from_cell(second))
+
+
+def test_smooth_path_open_ground(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    p = Pathfinding(g)
+    path = p.find_path(Vec2(0.5, 0.5), Vec2(9.5, 2.5))
+
+    assert [path[0], path[-1]] == p.smooth(path)
+
+
+def test_waypoints_only_smooth_when_enabled(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    path = Pathfinding(g).find_path(Vec2(0.5, 0.5), Vec2(9.5, 2.5))
+
+    assert len(path) == len(Pathfinding(g).waypoints(path))
+    assert 2 == len(Pathfinding(g, smoothing=True).waypoints(path))
+
+
+def test_grid_clearance(pillar_world):
+    g = Grid(pillar_world, 0.5)
+
+    assert 0 == g.clearance[4 * g.height + 4]
+    assert 1 == g.clearance[3 * g.height + 3]
+    assert 1 == g.clearance[0 * g.height + 5]
+    assert 2 == g.clearance[2 * g.height + 2]
+    assert 2 == g.clearance[2 * g.height + 5]
+
+
+def test_grid_starts_at_world_boundary(pillar_world):
+    # The pillar world moved so that its centre sits on the origin
+    shifted = PhysicsWorld(Vec2(-5, -5), Vec2(5, 5))
+    shifted.insert(Body(Rectangle(Vec2(-1, -1), Vec2(1, 1)), BodyKind.Static))
+    g = Grid(shifted, 0.5)
+    expected = Grid(pillar_world, 0.5)
+
+    assert (0, 0) == g.coord_from_position(Vec2(-5, -5))
+    assert Vec2(-4.5, -4.5) == g[0][0].rectangle.center
+    assert expected.clearance == g.clearance
+    assert expected.labels == g.labels
+
+    path = Pathfinding(g).find_path(Vec2(-4.5, -0.5), Vec2(4.5, 0.5))
+    assert [
+        expected.coord_from_cell(cell)
+        for cell in Pathfinding(expected).find_path(Vec2(0.5, 4.5), Vec2(9.5, 5.5))
+    ] == [g.coord_from_cell(cell) for cell in path]
+    assert all(shifted.boundary.contains_rect(cell.rectangle) for cell in path)
+
+
+def test_grid_update_area_starts_at_world_boundary():
+    world = PhysicsWorld(Vec2(-5, -5), Vec2(5, 5))
+    g = Grid(world, 0.5)
+    body = Body(Rectangle(Vec2(-5, -5), Vec2(-4, -4)), BodyKind.Static)
+    world.insert(body)
+
+    assert [(0, 0)] == g.update_area(body.rectangle)
+    assert 0 == g.clearance[0]
+
+
+def test_grid_update_area_matches_rebuild():
+    rng = Random(4)
+    world = PhysicsWorld(Vec2(), Vec2(20, 20))
+    g = Grid(world, 0.5, max_clearance=4)
+    for _ in range(15):
+        x, y = rng.randint(0, 18), rng.randint(0, 18)
+        rect = Rectangle(Vec2(x, y), Vec2(x + rng.randint(1, 2), y + 1))
+        world.insert(Body(rect, BodyKind.Static))
+        version = g.version
+
+        assert g.update_area(rect)
+        assert version + 1 == g.version
+        assert Grid(world, 0.5, max_clearance=4).clearance == g.clearance
+
+
+def test_grid_update_area_without_change(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    version = g.version
+
+    assert [] == g.update_area(Rectangle(Vec2(0, 0), Vec2(2, 2)))
+    assert version == g.version
+
+
+@pytest.fixture
+def gap_world():
+    p = PhysicsWorld(Vec2(), Vec2(10, 10))
+    p.insert(Body(Rectangle(Vec2(4, 0), Vec2(5, 4)), BodyKind.Static))
+    p.insert(Body(Rectangle(Vec2(4, 5), Vec2(5, 10)), BodyKind.Static))
+    yield p
+
+
+def test_pathfinding_respects_agent_size(gap_world):
+    g = Grid(gap_world, 0.5)
+    p = Pathfinding(g)
+
+    assert (4, 4) in [
+        g.coord_from_cell(cell) for cell in p.find_path(Vec2(1.5, 4.5), Vec2(8.5, 4.5))
+    ]
+    assert p.find_path(Vec2(1.5, 4.5), Vec2(8.5, 4.5), size=3) is None
+
+
+@pytest.fixture
+def walled_world():
+    p = PhysicsWorld(Vec2(), Vec2(10, 10))
+    p.insert(Body(Rectangle(Vec2(5, 5), Vec2(10, 6)), BodyKind.Static))
+    p.insert(Body(Rectangle(Vec2(5, 6), Vec2(6, 10)), BodyKind.Static))
+    yield p
+
+
+def partition(g: Grid) -> set[frozenset]:
+    regions: dict[int, set] = {}
+    for x in range(g.width):
+        for y in range(g.height):
+            if label := g.label(x, y):
+                regions.setdefault(label, set()).add((x, y))
+
+    return {frozenset(region) for region in regions.values()}
+
+
+def test_grid_labels(walled_world):
+    g = Grid(walled_world, 0.5)
+
+    assert 2 == len(partition(g))
+    assert 0 == g.label(5, 5)
+    assert g.reachable((0, 0), (9, 0))
+    assert not g.reachable((0, 0), (8, 8))
+    assert not g.reachable((0, 0), (5, 5))
+
+
+def test_grid_labels_follow_update_area(walled_world):
+    g = Grid(walled_world, 0.5)
+    door = Rectangle(Vec2(0, 3), Vec2(10, 4))
+    walled_world.insert(Body(door, BodyKind.Static))
+    g.update_area(door)
+
+    assert 3 == len(partition(g))
+    assert partition(Grid(walled_world, 0.5)) == partition(g)
+    assert not g.reachable((0, 0), (0, 9))
+
+
+def test_pathfinding_rejects_unreachable_goal(walled_world):
+    g = Grid(walled_world, 0.5)
+    p = Pathfinding(g)
+
+    assert p.find_path(Vec2(1.5, 1.5), Vec2(8.5, 8.5)) is None
+    assert 1 == p.unreachable
+    assert 0 == p.cache_misses
+
+
+def test_pathfinding_snaps_unreachable_goal(walled_world):
+    g = Grid(walled_world, 0.5)
+    p = Pathfinding(g)
+    path = p.find_path(Vec2(1.5, 1.5), Vec2(8.5, 8.5), snap=True)
+
+    assert (4, 8) == g.coord_from_cell(path[-1])
+    assert Vec2(4.5, 8.5) == p.goal_position(path, Vec2(8.5, 8.5))
+
+
+def test_perimeter_visits_ring_once():
+    ring = list(perimeter(5, 5, 2))
+
+    assert 16 == len(ring)
+    assert {
+        (x, y)
+        for x in range(3, 8)
+        for y in range(3, 8)
+        if max(abs(x - 5), abs(y - 5)) == 2
+    } == set(ring)
+
+
+def test_path_request_rejects_unreachable_goal(walled_world):
+    g = Grid(walled_world, 0.5)
+    p = Pathfinding(g)
+    request = p.request_path(Vec2(1.5, 1.5), Vec2(8.5, 8.5), 1)
+
+    assert request.done
+    assert request.path is None
+    assert 0 == len(p.queue)
+
+
+def test_grid_changes_since(walled_world):
+    g = Grid(walled_world, 0.5)
+    version = g.version
+    wall = Rectangle(Vec2(0, 3), Vec2(2, 4))
+    walled_world.insert(Body(wall, BodyKind.Static))
+    changed = g.update_area(wall)
+
+    assert [] == g.changes_since(g.version)
+    assert changed == g.changes_since(version)
+    assert g.changes_since(version - 1) is None
+
+
+def test_dstar_lite_matches_dijkstra(walled_world):
+    g = Grid(walled_world, 0.5)
+    planner = DStarLite(g, (0, 9), (9, 0))
+    planner.compute_shortest_path()
+    field = FlowField(g, (9, 0))
+
+    assert field.costs[9] == pytest.approx(planner.cost_to_goal)
+    assert (9, 0) == g.coord_from_cell(planner.path()[-1])
+
+
+def test_dstar_lite_repairs_after_grid_change(walled_world):
+    g = Grid(walled_world, 0.5)
+    planner = DStarLite(g, (0, 9), (9, 0))
+    planner.compute_shortest_path()
+    initial = planner.expanded
+
+    # The search runs forward from the start, so it keeps the most when the
+    # change is towards the goal
+    wall = Rectangle(Vec2(7, 0), Vec2(8, 3))
+    walled_world.insert(Body(wall, BodyKind.Static))
+    g.update_area(wall)
+    planner.sync()
+    planner.compute_shortest_path()
+
+    fresh = DStarLite(g, (0, 9), (9, 0))
+    fresh.compute_shortest_path()
+
+    assert fresh.cost_to_goal == pytest.approx(planner.cost_to_goal)
+    assert planner.expanded - initial < fresh.expanded
+    for cell in planner.path():
+        assert not cell.colliding
+
+
+def test_dstar_lite_moving_start_is_cheap(walled_world):
+    g = Grid(walled_world, 0.5)
+    planner = DStarLite(g, (0, 9), (9, 0))
+    planner.compute_shortest_path()
+    initial = planner.expanded
+
+    planner.move_to(planner.next_cell())
+    planner.compute_shortest_path()
+
+    assert planner.expanded - initial <= 1
+
+
+def test_dstar_lite_follows_moving_target():
+    world = PhysicsWorld(Vec2(), Vec2(30, 30))
+    world.insert(Body(Rectangle(Vec2(8, 0), Vec2(10, 22)), BodyKind.Static))
+    world.insert(Body(Rectangle(Vec2(16, 8), Vec2(18, 30)), BodyKind.Static))
+    g = Grid(world, 0.5)
+    target = (24, 4)
+    planner = DStarLite(g, (2, 2), target)
+    planner.compute_shortest_path()
+
+    # The target crosses a cell every frame, the agent every other frame
+    for frame in range(20):
+        if frame % 2 == 0:
+            planner.move_to(planner.next_cell())
+        target = (min(29, target[0] + frame % 2), target[1] + 1)
+        expanded = planner.expanded
+        planner.retarget(target)
+        planner.compute_shortest_path()
+
+        fresh = DStarLite(g, planner.start, target)
+        fresh.compute_shortest_path()
+        assert fresh.cost_to_goal == pytest.approx(planner.cost_to_goal)
+        if frame % 2 == 0:
+            assert planner.expanded - expanded < fresh.expanded
+        else:
+            assert planner.expanded - expanded < fresh.expanded / 3
+
+
+def test_spread_goals(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    goals = g.spread_goals((2, 2), 4, 1)
+
+    assert (2, 2) == goals[0]
+    assert 4 == len(goals)
+    for i, a in enumerate(goals):
+        for b in goals[i + 1 :]:
+            assert max(abs(a[0] - b[0]), abs(a[1] - b[1])) > 1
+
+
+def test_reservation_table():
+    table = ReservationTable()
+    table.reserve([(0, 0), (1, 0), (2, 0)])
+
+    assert not table.is_free((1, 0), 1)
+    assert table.is_free((1, 0), 2)
+    assert not table.is_free((2, 0), 10)
+    assert not table.can_move((1, 0), (0, 0), 0)
+    assert not table.can_park((1, 0), 0)
+    assert table.can_park((1, 0), 2)
+
+
+def test_group_paths_are_conflict_free(pillar_world):
+    g = Grid(pillar_world, 0.5)
+    p = Pathfinding(g)
+    starts = [Vec2(0.5, 0.5), Vec2(0.5, 1.5), Vec2(1.5, 0.5), Vec2(9.5, 9.5)]
+    paths = p.find_group_paths(starts, Vec2(8.5, 1.5))
+    coords = [[g.coord_from_cell(cell) for cell in path] for path in paths]
+    length = max(len(path) for path in coords)
+
+    assert len({path[-1] for path in coords}) == len(starts)
+    for time in range(length):
+        positions = [path[min(time, len(path) - 1)] for path in coords]
+        assert len(set(positions)) == len(positions)
+    for path in coords:
+        for cell in path:
+            assert not g[cell[0]][cell[1]].colliding
+
+
+def test_pathfinding_counts_expanded_nodes(physics_world):
+    g = Grid(physics_world, 0.5)
+    p = Pathfinding(g, cache_size=0)
+    p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+    expanded = p.expanded
+
+    assert expanded > 0
+
+    p.find_path(Vec2(0, 0), Vec2(2.9, 0))
+
+    assert 2 * expanded == p.expanded
@@ -0,0 +1,32 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight.pathfinding import Grid
+from barfight.pathservice import PathService
+from barfight.physics import Body, BodyKind, PhysicsWorld, Rectangle
+
+
+@pytest.fixture
+def path_service():
+    world = PhysicsWorld(Vec2(), Vec2(3, 3))
+    world.insert(Body(Rectangle(Vec2(1, 0), Vec2(2, 2)), BodyKind.Static))
+    service = PathService(Grid(world, 0.5), workers=1)
+    yield service
+    service.close()
+
+
+def test_path_service_finds_path(path_service):
+    future = path_service.submit(Vec2(0, 0), Vec2(2.9, 0))
+
+    assert [(0, 0), (0, 1), (1, 2), (2, 1), (2, 0)] == future.result(timeout=10)
+
+
+def test_path_service_publishes_new_grid_version(path_service):
+    first = path_service.publish()
+    path_service.grid.update_collisions()
+    future = path_service.submit(Vec2(0, 0), Vec2(2.9, 0))
+    future.result(timeout=10)
+    path_service.executor.shutdown()
+
+    assert first is not path_service.publish()
+    assert [path_service.grid.version] == list(path_service.segments)
@@ -1,7 +1,7 @@
 import pytest
 from pyglet.math import Vec2
 
-from barfight.physics import Body, Point, QuadTree, Rectangle
+from barfight.physics import Body, PhysicsWorld, Point, QuadTree, Rectangle
 
 
 def test_rectangle_contains_point():
@@ -224,3 +224,50 @@ def test_quadtree_no_collisions_in_different_subdivisions():
     result = q.collisions([])
 
     assert [] == result
+
+
+def test_quadtree_remove_from_subdivision():
+    q = QuadTree(Rectangle(Vec2(0, 0), Vec2(10, 10)), 1)
+    first = Body(Rectangle(Vec2(1, 1), Vec2(2, 2)))
+    second = Body(Rectangle(Vec2(8, 8), Vec2(9, 9)))
+    q.insert(first)
+    q.insert(second)
+
+    assert True is q.remove(first)
+    assert first not in q.query(Rectangle(Vec2(0, 0), Vec2(10, 10)))
+    assert q.is_divided
+
+    assert True is q.remove(second)
+    assert not q.is_divided
+    assert False is q.remove(second)
+
+
+def test_quadtree_remove_moved_body():
+    q = QuadTree(Rectangle(Vec2(0, 0), Vec2(10, 10)), 1)
+    q.insert(Body(Rectangle(Vec2(8, 8), Vec2(9, 9))))
+    body = Body(Rectangle(Vec2(1, 1), Vec2(2, 2)))
+    q.insert(body)
+    body.rectangle.center = Vec2(8.5, 1.5)
+
+    assert True is q.remove(body)
+
+
+def test_physics_world_remove_twice():
+    world = PhysicsWorld(Vec2(0, 0), Vec2(10, 10))
+    body = Body(Rectangle(Vec2(1, 1), Vec2(2, 2)))
+    world.insert(body)
+
+    assert True is world.remove(body)
+    assert False is world.remove(body)
+
+
+def test_quadtree_skips_inactive_bodies():
+    q = QuadTree(Rectangle(Vec2(0, 0), Vec2(10, 10)), 4)
+    active = Body(Rectangle(Vec2(1, 1), Vec2(2, 2)))
+    inactive = Body(Rectangle(Vec2(1.5, 1.5), Vec2(2.5, 2.5)), active=False)
+    q.insert(active)
+    q.insert(inactive)
+
+    assert [active] == q.query(Rectangle(Vec2(0, 0), Vec2(10, 10)))
+    assert [] == q.collisions([])
+    assert active is q.nearest(Point(Vec2(2.5, 2.5)))[1]
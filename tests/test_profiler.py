@@ -0,0 +1,72 @@
+import csv
+import json
+
+import pytest
+
+from barfight import ecs
+from barfight.profiler import FRAME, Histogram, Profiler
+
+
+@pytest.fixture
+def profiler(ecs_world):
+    profiler = Profiler()
+    ecs.set_profiler(profiler)
+    yield profiler
+    ecs.set_profiler(None)
+
+
+class CountingSystem(ecs.SystemProtocol):
+    def __init__(self):
+        self.calls = 0
+
+    def process(self, *_):
+        self.calls += 1
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(window=100)
+    for ns in range(1, 201):
+        histogram.add(ns * 1_000_000)
+
+    assert 200 == histogram.count
+    assert 100 == len(histogram.samples)
+    assert 151_000_000 == histogram.percentile(50)
+    assert 200_000_000 == histogram.percentile(99)
+    assert 200.0 == histogram.summary()["max_ms"]
+
+
+def test_profiler_times_systems_and_handlers(profiler):
+    system = CountingSystem()
+    ecs.add_system(system)
+    received = []
+
+    def on_ping(value: int):
+        received.append(value)
+
+    ecs.set_handler("ping", on_ping)
+    ecs.update(1 / 60)
+    ecs.update(1 / 60)
+    ecs.dispatch_event("ping", 1)
+
+    stats = profiler.stats()
+    assert 2 == system.calls
+    assert [1] == received
+    assert 2 == stats["CountingSystem"]["count"]
+    assert 2 == stats[FRAME]["count"]
+    assert 1 == stats[f"ping:{on_ping.__qualname__}"]["count"]
+    assert FRAME not in dict(profiler.slowest())
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".json"])
+def test_profiler_dump(tmp_path, suffix):
+    profiler = Profiler()
+    profiler.record("PhysicsSystem", 2_000_000)
+    path = tmp_path / f"profile{suffix}"
+    profiler.dump(path)
+
+    if suffix == ".csv":
+        rows = list(csv.DictReader(path.open()))
+        assert "PhysicsSystem" == rows[0]["name"]
+        assert 2.0 == float(rows[0]["p99_ms"])
+    else:
+        assert 2.0 == json.loads(path.read_text())["PhysicsSystem"]["p50_ms"]
@@ -0,0 +1,145 @@
+import json
+
+import pytest
+from pyglet.math import Vec2
+from pyglet.window import key
+
+from barfight import ecs, events, pathfinding, replay
+from barfight.cli import main
+from barfight.components import Attack, Enemy, Player, Position
+from barfight.simulation import build_headless
+
+
+def record_session(path, ticks: int = 20) -> list[Vec2]:
+    # Recorded in a world of its own, deleted after so its systems stop
+    # handling input and collision events, which esper shares between worlds
+    ecs.switch_world("recording")
+    build_headless(replay.SCENARIOS["bar"])
+    recorder = replay.Recorder.open(path, "bar")
+    ecs.add_system(recorder, -100)
+    ecs.add_handlers(recorder)
+
+    positions = []
+    for tick in range(ticks):
+        if tick == 5:
+            ecs.dispatch_event(events.KEY_DOWN_EVENT, key.D, 0)
+            ecs.dispatch_event(events.MOUSE_DOWN_EVENT, 10, 20, 1, 0)
+        direction = Vec2(1, 0) if tick >= 5 else Vec2()
+        ecs.dispatch_event(events.PLAYER_DIRECTION_EVENT, direction)
+        ecs.update(1 / 60)
+        [(_, (_, position))] = ecs.get_components(Player, Position)
+        positions.append(position.position)
+
+    recorder.close()
+    ecs.switch_world("pytest")
+    ecs.delete_world("recording")
+    return positions
+
+
+def test_recording_round_trip(ecs_world, tmp_cwd):
+    path = tmp_cwd / "session.bfr"
+    record_session(path)
+
+    recording = replay.load(path)
+
+    assert "bar" == recording.scenario
+    assert 20 == recording.ticks
+    assert [
+        (replay.KEY_DOWN, (key.D, 0)),
+        (replay.MOUSE_DOWN, (10, 20, 1, 0)),
+        (replay.DIRECTION, (1.0, 0.0)),
+        (replay.TICK, (1 / 60,)),
+    ] == recording.records[5:9]
+
+
+def test_replay_reproduces_session(ecs_world, tmp_cwd):
+    path = tmp_cwd / "session.bfr"
+    recorded = record_session(path)
+
+    timings = replay.run_replay(replay.load(path))
+
+    assert 20 == len(timings)
+    [(_, (_, position))] = ecs.get_components(Player, Position)
+    assert recorded[4] != recorded[-1]
+    assert recorded[-1] == position.position
+
+
+def crowd_positions(recording: replay.Recording, **kwargs) -> list[Vec2]:
+    ecs.switch_world("replay")
+    replay.run_replay(recording, **kwargs)
+    positions = [
+        position.position for _, (_, position) in ecs.get_components(Enemy, Position)
+    ]
+    ecs.switch_world("pytest")
+    ecs.delete_world("replay")
+    return positions
+
+
+def test_replay_paths_do_not_depend_on_time(ecs_world, tmp_cwd, monkeypatch):
+    path = tmp_cwd / "session.bfr"
+    recorder = replay.Recorder.open(path, "crowd")
+    recorder.on_mouse_down(200, 200, 1, 0)
+    for _ in range(30):
+        recorder.process(1 / 60)
+    recorder.close()
+    recording = replay.load(path)
+
+    fast = crowd_positions(recording)
+    # Each look at the clock takes a millisecond, so a time budget would run
+    # out before the first search finished
+    clock = iter(range(0, 10**15, 1_000_000))
+    monkeypatch.setattr(pathfinding, "perf_counter_ns", lambda: next(clock))
+    slow = crowd_positions(recording)
+
+    assert fast == slow
+
+
+def test_replay_attacks_on_key(ecs_world, tmp_cwd):
+    path = tmp_cwd / "session.bfr"
+    recorder = replay.Recorder.open(path, "bar")
+    recorder.on_key_down(key.N, 0)
+    recorder.process(1 / 60)
+    recorder.close()
+
+    replay.run_replay(replay.load(path))
+
+    assert 1 == len(list(ecs.view(Attack)))
+
+
+def test_load_rejects_other_files(tmp_cwd):
+    path = tmp_cwd / "session.bfr"
+    path.write_bytes(b"BFSN" + bytes(8))
+
+    with pytest.raises(ValueError):
+        replay.load(path)
+
+
+@pytest.mark.parametrize("tail", [b"\x00\x01", b"\xff"])
+def test_load_rejects_damaged_recordings(tmp_cwd, tail: bytes):
+    path = tmp_cwd / "session.bfr"
+    recorder = replay.Recorder.open(path, "bar")
+    recorder.process(1 / 60)
+    recorder.file.write(tail)
+    recorder.close()
+
+    with pytest.raises(ValueError):
+        replay.load(path)
+    with pytest.raises(SystemExit):
+        main(["replay", str(path)])
+
+
+def test_cli_replay_compares_baseline(ecs_world, tmp_cwd):
+    path = tmp_cwd / "session.bfr"
+    record_session(path, 5)
+    ecs.switch_world("baseline")
+    main(["replay", str(path), "--output", "baseline.json"])
+    ecs.switch_world("pytest")
+    ecs.delete_world("baseline")
+
+    main(["replay", str(path), "--baseline", "baseline.json", "--output", "new.json"])
+
+    baseline = json.loads((tmp_cwd / "baseline.json").read_text())
+    assert 5 == baseline["count"]
+    assert {"p50_ms", "p95_ms", "p99_ms"} <= json.loads(
+        (tmp_cwd / "new.json").read_text()
+    ).keys()
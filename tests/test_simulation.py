@@ -0,0 +1,52 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight import ecs
+from barfight.cli import main
+from barfight.components import Enemy, Player, Position, Sprite
+from barfight.scenarios import SCENARIOS, Scenario, add_bar
+from barfight.simulation import run_headless
+
+
+def test_run_headless_without_sprites(ecs_world, tmp_cwd):
+    run_headless(SCENARIOS["bar"], 10)
+
+    assert [] == ecs.get_components(Sprite)
+    assert 1 == len(ecs.get_components(Player, Position))
+    assert 1 == len(ecs.get_components(Enemy, Position))
+    assert list(tmp_cwd.glob(".navcache/*.nav"))
+
+
+def test_run_headless_ticks_scenario(ecs_world, tmp_cwd):
+    ticks = []
+
+    def tick(tick: int):
+        ticks.append(tick)
+
+    run_headless(Scenario(Vec2(-200, -200), Vec2(1000, 800), add_bar, tick), 5)
+
+    assert [0, 1, 2, 3, 4] == ticks
+
+
+def test_cli_headless(ecs_world, tmp_cwd):
+    main(["headless", "--ticks", "3", "--scenario", "bar"])
+
+    assert 1 == len(ecs.get_components(Player))
+
+
+def test_cli_unknown_scenario(ecs_world):
+    with pytest.raises(SystemExit):
+        main(["headless", "--scenario", "missing"])
+
+
+def test_cli_headless_crowd_stays_in_world(ecs_world, tmp_cwd):
+    # The default tick count, enemies used to be sent outside the world by
+    # tick 322
+    main(["headless", "--scenario", "crowd"])
+
+    scenario = SCENARIOS["crowd"]
+    positions = ecs.get_components(Enemy, Position)
+    assert 41 == len(positions)
+    for _, (_, position) in positions:
+        assert scenario.min.x <= position.position.x <= scenario.max.x
+        assert scenario.min.y <= position.position.y <= scenario.max.y
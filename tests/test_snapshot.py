@@ -0,0 +1,129 @@
+import pytest
+from pyglet.math import Vec2
+
+from barfight import ecs, snapshot
+from barfight.bundles import add_attack, add_enemy, add_player, add_wall
+from barfight.components import (
+    Actor,
+    ActorState,
+    Attack,
+    Health,
+    Path,
+    PhysicsBody,
+    Player,
+    Position,
+)
+from barfight.physics import PhysicsWorld, Rectangle
+from barfight.systems import PhysicsSystem
+
+
+@pytest.fixture
+def world(ecs_world):
+    world = PhysicsWorld(Vec2(-200, -200), Vec2(1000, 800))
+    physics_system = PhysicsSystem(world)
+    ecs.add_system(physics_system)
+    ecs.add_handlers(physics_system)
+    yield world
+    ecs.remove_handlers(physics_system)
+
+
+def populate() -> tuple[int, int]:
+    player = add_player(Vec2(200, 200), sprites=False)
+    enemy = add_enemy(200, 300, sprites=False)
+    add_wall(400, 200, 100, 100, sprites=False)
+    add_attack(player, Vec2(250, 190), Vec2(270, 210))
+    ecs.apply_commands()
+    ecs.add_component(
+        enemy, Path(Vec2(5, 5), [Vec2(1, 1), Vec2(5, 5)], [0.0, 0.25], 0.1)
+    )
+    ecs.get_component(player, Actor).state = ActorState.Attacking
+
+    return player, enemy
+
+
+def test_snapshot_round_trip(world):
+    populate()
+    captured = snapshot.capture()
+
+    decoded = snapshot.decode(snapshot.encode(captured))
+
+    assert captured.tick == decoded.tick
+    assert captured.entities == decoded.entities
+
+
+def test_restore_rebuilds_world(world):
+    player, enemy = populate()
+    captured = snapshot.capture()
+    ecs.get_component(player, Position).position = Vec2(0, 0)
+    ecs.delete_entity(enemy)
+
+    entities = snapshot.restore(snapshot.decode(snapshot.encode(captured)))
+
+    restored_player = entities[player]
+    assert Vec2(200, 200) == ecs.get_component(restored_player, Position).position
+    assert ActorState.Attacking == ecs.get_component(restored_player, Actor).state
+    assert ecs.has_component(restored_player, Player)
+    assert Path(Vec2(5, 5), [Vec2(1, 1), Vec2(5, 5)], [0.0, 0.25], 0.1) == (
+        ecs.get_component(entities[enemy], Path)
+    )
+    assert 100 == ecs.get_component(entities[enemy], Health).current
+    [(_, (attack,))] = list(ecs.view(Attack))
+    assert restored_player == attack.entity
+
+    bodies = world.query(world.boundary)
+    assert 4 == len(bodies)
+    assert {entities[entity] for entity in captured.entities} == {
+        body.data for body in bodies
+    }
+
+
+def test_delta_encodes_only_changes(world):
+    player, enemy = populate()
+    base = snapshot.capture()
+    ecs.get_component(enemy, Health).current = 50
+    ecs.remove_component(enemy, Path)
+    added = ecs.create_entity(Position(Vec2(1, 2)))
+    ecs.delete_entity(player)
+    current = snapshot.capture()
+
+    delta = snapshot.encode_delta(base, current)
+
+    assert len(delta) < len(snapshot.encode(current)) / 2
+    assert current.entities == snapshot.apply_delta(base, delta).entities
+    assert added in current.entities
+
+
+def test_delta_needs_its_base(world):
+    populate()
+    base = snapshot.capture()
+    other = snapshot.capture()
+    delta = snapshot.encode_delta(base, snapshot.capture())
+
+    with pytest.raises(ValueError):
+        snapshot.apply_delta(other, delta)
+    with pytest.raises(ValueError):
+        snapshot.decode(delta)
+
+
+def test_restored_bodies_match(world):
+    player, _ = populate()
+    body = ecs.get_component(player, PhysicsBody).body
+
+    entities = snapshot.restore(snapshot.capture())
+
+    restored = ecs.get_component(entities[player], PhysicsBody).body
+    assert body is not restored
+    assert body.rectangle == restored.rectangle
+    assert entities[player] == restored.data
+    assert [restored] == world.query(Rectangle.from_dimensions(Vec2(150, 200), 1, 1))
+
+
+def test_snapshot_encodes_long_paths(world):
+    _, enemy = populate()
+    points = [Vec2(i, i) for i in range(5000)]
+    ecs.add_component(enemy, Path(points[-1], points))
+
+    decoded = snapshot.decode(snapshot.encode(snapshot.capture()))
+
+    entities = snapshot.restore(decoded)
+    assert points == ecs.get_component(entities[enemy], Path).path